@@ -0,0 +1,416 @@
+"""
+Performance benchmarks for the solver and the recognition pipeline.
+
+    python benchmarks/run.py                # run every case, compare to baselines
+    python benchmarks/run.py --quick        # smaller workloads (partial DP builds)
+    python benchmarks/run.py dp_numpy lookup
+    python benchmarks/run.py --update       # store the results as the new baselines
+
+Every case runs in its own subprocess, so imports, JIT compilation and
+peak RSS are measured per case. Metrics ending in `_s`, `_ms` or `_mb`
+are lower-is-better, metrics ending in `_per_s` or `_per_hour` higher-is-better. A
+metric that is worse than its stored baseline by more than the tolerance
+is reported as a REGRESSION and the run exits with status 1.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'core'))
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+RESULT_MARKER = "BENCH_RESULT "
+DEFAULT_TOLERANCE = 0.25
+
+# Absolute slack per unit, so timer noise on tiny values is not a regression
+ABSOLUTE_SLACK = {"_ms": 0.5, "_s": 0.05, "_mb": 16.0}
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0 if unavailable)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform != 'darwin' else peak / (1024 * 1024)
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return 0.0
+
+
+def _layer_report(name: str, height_times):
+    print(f"  {name} per-height seconds: " + " ".join(f"{t:.3f}" for t in height_times))
+
+
+# --- CASES ---
+# Each case returns a flat {metric: value} dict.
+
+def case_dp_numba(quick: bool) -> dict:
+    """Numba build: per-height time and thread scaling."""
+    import numba
+    from deterministic import Deterministic, TOTAL_CELLS
+
+    max_height = 14 if quick else TOTAL_CELLS
+    Deterministic().build("numba", max_height=2)  # JIT warm-up
+
+    metrics = {}
+    threads = 1
+    while threads <= numba.config.NUMBA_NUM_THREADS:
+        numba.set_num_threads(threads)
+        solver = Deterministic()
+        solver.build("numba", max_height=max_height)
+        _layer_report(f"numba x{threads}", solver.height_times)
+        metrics[f"dp_numba_t{threads}_s"] = sum(solver.height_times)
+        threads *= 2
+
+    base = metrics["dp_numba_t1_s"]
+    for key, value in list(metrics.items()):
+        if key != "dp_numba_t1_s":
+            print(f"  speedup {key}: {base / value:.2f}x")
+    return metrics
+
+
+def case_dp_serial(quick: bool) -> dict:
+    """Numba build with the serial kernel only."""
+    from deterministic import Deterministic, TOTAL_CELLS
+
+    Deterministic(parallel=False).build("numba", max_height=2)  # JIT warm-up
+    solver = Deterministic(parallel=False)
+    solver.build("numba", max_height=14 if quick else TOTAL_CELLS)
+    _layer_report("serial", solver.height_times)
+    return {"dp_serial_s": sum(solver.height_times)}
+
+
+def case_dp_numpy(quick: bool) -> dict:
+    """Vectorized NumPy build."""
+    from deterministic import Deterministic, TOTAL_CELLS
+
+    solver = Deterministic()
+    solver.build("numpy", max_height=12 if quick else TOTAL_CELLS)
+    _layer_report("numpy", solver.height_times)
+    return {"dp_numpy_s": sum(solver.height_times)}
+
+
+def case_dp_python(quick: bool) -> dict:
+    """Pure-Python build; only the first heights, reported as states/sec."""
+    from deterministic import Deterministic, TOTAL_CELLS, filled_counts
+
+    max_height = 4 if quick else 5
+    solver = Deterministic()
+    solver.build("python", max_height=max_height)
+    _layer_report("python", solver.height_times)
+    # in_stack also marks the boards pushed to beyond max_height, never processed
+    heights = TOTAL_CELLS - filled_counts()[solver.in_stack]
+    states = int(((heights >= 1) & (heights <= max_height)).sum())
+    return {"dp_python_states_per_s": states / sum(solver.height_times)}
+
+
+def case_startup(quick: bool) -> dict:
+    """Cold (fresh process, mapped artifact) and warm get_solver()."""
+    start = time.perf_counter()
+    import deterministic
+    if not os.path.exists(os.path.join(os.path.dirname(deterministic.__file__),
+                                       deterministic.Deterministic.POLICY_FILE)):
+        print("  note: no policy artifact yet, cold start includes building it")
+    deterministic.get_solver()
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    deterministic.get_solver()
+    warm = time.perf_counter() - start
+    return {"get_solver_cold_s": cold, "get_solver_warm_ms": warm * 1000}
+
+
+def case_cache_io(quick: bool) -> dict:
+    """save_cache/load_cache (npz) and save_policy/load_policy throughput."""
+    from deterministic import Deterministic
+
+    solver = Deterministic()
+    if not solver.load_cache():
+        solver.build()
+    dense_mb = (solver.dsts.nbytes + solver.actions.nbytes) / (1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        npz_path = os.path.join(tmp, "cache.npz")
+        policy_path = os.path.join(tmp, "policy.bin")
+
+        start = time.perf_counter()
+        solver.save_cache(npz_path)
+        save_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        solver.load_cache(npz_path)
+        load_s = time.perf_counter() - start
+
+        solver.compact()
+        policy_mb = solver.policy.nbytes / (1024 * 1024)
+        start = time.perf_counter()
+        solver.save_policy(policy_path)
+        save_policy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        solver.load_policy(policy_path)
+        map_s = time.perf_counter() - start
+        solver.policy = None
+
+    return {
+        "save_cache_mb_per_s": dense_mb / save_s,
+        "load_cache_mb_per_s": dense_mb / load_s,
+        "save_policy_mb_per_s": policy_mb / save_policy_s,
+        "load_policy_ms": map_s * 1000,
+    }
+
+
+def case_lookup(quick: bool) -> dict:
+    """solve() and solve_many() throughput on random states."""
+    import numpy as np
+    from deterministic import get_solver
+    from jigsaw import Jigsaw, TOTAL_CELLS, TOTAL_FIGURES
+
+    solver = get_solver()
+    n = 20_000 if quick else 200_000
+    rng = random.Random(0)
+    games = [Jigsaw(rng.getrandbits(TOTAL_CELLS), rng.randrange(TOTAL_FIGURES)) for _ in range(n)]
+
+    start = time.perf_counter()
+    for game in games:
+        solver.solve(game)
+    scalar = n / (time.perf_counter() - start)
+
+    np_rng = np.random.default_rng(0)
+    boards = np_rng.integers(0, 1 << TOTAL_CELLS, n * 10, dtype=np.uint32)
+    figures = np_rng.integers(0, TOTAL_FIGURES, n * 10)
+    start = time.perf_counter()
+    solver.solve_many(boards, figures)
+    batched = len(boards) / (time.perf_counter() - start)
+    return {"solve_per_s": scalar, "solve_many_per_s": batched}
+
+
+def case_recognition(quick: bool) -> dict:
+    """
+    Recognition pipeline on replayed frames: grab the cursor crop and the
+    board from a ReplayFrameSource, classify the piece and read the board.
+    """
+    try:
+        import cv2
+        import numpy as np
+    except ImportError:
+        print("  skipped: opencv not installed")
+        return {}
+    sys.path.insert(0, os.path.join(ROOT, 'utils'))
+    from frames import ReplayFrameSource
+    from recognition import COLS, PIECE_TEMPLATES, ROWS, BoardReader, PieceClassifier
+
+    asset_path = os.path.join(ROOT, 'assets')
+    classifier = PieceClassifier(asset_path)
+    templates = [cv2.imread(os.path.join(asset_path, name)) for name in PIECE_TEMPLATES]
+    cell = templates[0].shape[0]
+    rng = np.random.default_rng(0)
+
+    # Recorded-session stand-in: noisy board with random filled cells,
+    # the piece on the cursor drawn over cell (0, 0)
+    def frame(piece: int, board_cells: np.ndarray) -> np.ndarray:
+        image = rng.normal((70, 45, 30), 8, (ROWS * cell, COLS * cell, 3))
+        for y, x in zip(*np.nonzero(board_cells)):
+            image[y * cell:(y + 1) * cell, x * cell:(x + 1) * cell] = templates[rng.integers(6)]
+        image[:cell, :cell] = templates[piece] + rng.integers(-12, 13, templates[piece].shape)
+        return np.clip(image, 0, 255).astype(np.uint8)
+
+    empty = frame(0, np.zeros((ROWS, COLS), dtype=bool))
+    frames = [frame(i % len(templates), rng.random((ROWS, COLS)) < 0.5) for i in range(60)]
+    source = ReplayFrameSource(frames, loop=True)
+    reader = BoardReader(cell)
+    reader.calibrate(empty)
+    piece_region = (0, 0, cell, cell)
+    board_region = (0, 0, COLS * cell, ROWS * cell)
+
+    rounds = 300 if quick else 3000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        classifier.classify(source.grab(piece_region))
+        source.advance()
+    classify_s = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        reader.read(source.grab(board_region))
+        source.advance()
+    board_s = (time.perf_counter() - start) / rounds
+    return {"recognition_ms": classify_s * 1000, "board_read_ms": board_s * 1000}
+
+
+def case_e2e(quick: bool) -> dict:
+    """
+    Full bot loop (capture, recognize, solve, click) against the game
+    simulator: the sequential and the pipelined bot, and the pipelined
+    bot with injected faults. Throughput is in simulated time;
+    `*_ms_per_move` is the real time the bot spends.
+    """
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        print("  skipped: opencv not installed")
+        return {}
+    sys.path.insert(0, os.path.join(ROOT, 'utils'))
+    from deterministic import get_solver
+    from simulator import Faults, GameSimulator, make_bot, run
+
+    solver = get_solver()
+    moves = 100 if quick else 500
+    scenarios = {"e2e_sequential": (False, Faults()),
+                 "e2e": (True, Faults()),
+                 "e2e_faults": (True, Faults(spike_rate=0.02, misclick_rate=0.01, drop_rate=0.01))}
+    metrics = {}
+    for name, (pipelined, faults) in scenarios.items():
+        simulator = GameSimulator(faults=faults, seed=1)
+        bot = make_bot(simulator, pipelined=pipelined)
+        report = run(bot, solver, simulator, moves)
+        bot.close()
+        print(f"  {name}: {report['moves']} moves, {report['rounds']} rounds, "
+              f"{report['bot_resyncs']} resyncs, {report['bot_timeouts']} timeouts"
+              + (", STALLED" if report['stalled'] else ""))
+        metrics[f"{name}_moves_per_hour"] = report["moves_per_hour"]
+        metrics[f"{name}_ms_per_move"] = report["real_seconds"] / max(report["moves"], 1) * 1000
+    return metrics
+
+
+def case_distribution(quick: bool) -> dict:
+    """Move-count distribution of the stored policy (layer by layer, truncated horizon)."""
+    from deterministic import get_solver
+    from distribution import dp_expectation, evaluate_distribution
+
+    solver = get_solver(values=True)
+    table = evaluate_distribution(solver, horizon=32 if quick else 64,
+                                  symmetric=solver.policy.symmetric)
+    root = table.distribution()
+    print(f"  empty board: mean {root.mean:.3f} (DP {dp_expectation(solver):.3f}), std {root.std:.3f}, "
+          f"p95 {root.quantile(0.95)}, tail {root.tail:.2e}")
+    return {"distribution_s": table.seconds}
+
+
+CASES = {
+    "dp_numba": case_dp_numba,
+    "dp_serial": case_dp_serial,
+    "dp_numpy": case_dp_numpy,
+    "dp_python": case_dp_python,
+    "startup": case_startup,
+    "cache_io": case_cache_io,
+    "lookup": case_lookup,
+    "recognition": case_recognition,
+    "e2e": case_e2e,
+    "distribution": case_distribution,
+}
+
+
+# --- DRIVER ---
+
+def run_case_in_subprocess(name: str, quick: bool) -> dict:
+    """Run one case in a fresh interpreter and return its metrics."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", name]
+    if quick:
+        cmd.append("--quick")
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+        elif line.startswith("  ") and not line.startswith("  Height"):
+            print(line)
+    if proc.returncode != 0 or result is None:
+        print(proc.stderr[-2000:])
+        raise RuntimeError(f"benchmark case {name} failed")
+    return result
+
+
+def is_lower_better(metric: str) -> bool:
+    return not metric.endswith(("_per_s", "_per_hour"))
+
+
+def compare(results: dict, baselines: dict) -> list:
+    """Metrics that regressed beyond the tolerance."""
+    tolerance = baselines.get("tolerance", DEFAULT_TOLERANCE)
+    regressions = []
+    for metric, value in results.items():
+        base = baselines.get("metrics", {}).get(metric)
+        if base is None or base == 0:
+            continue
+        if is_lower_better(metric):
+            slack = next((v for suffix, v in ABSOLUTE_SLACK.items() if metric.endswith(suffix)), 0.0)
+            worse = value > base * (1 + tolerance) + slack
+        else:
+            worse = value < base * (1 - tolerance)
+        if worse:
+            regressions.append((metric, value, base))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--update", action="store_true", help="write results as the new baselines")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        metrics = CASES[args.child](args.quick)
+        metrics[f"{args.child}_peak_rss_mb"] = peak_rss_mb()
+        print(RESULT_MARKER + json.dumps(metrics))
+        return
+
+    names = args.cases or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        print(f"[{name}]")
+        try:
+            results.update(run_case_in_subprocess(name, args.quick))
+        except RuntimeError as e:
+            print(f"  FAILED: {e}")
+
+    baselines = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE) as f:
+            baselines = json.load(f)
+    key = "quick" if args.quick else "full"
+    stored = baselines.get(key, {})
+
+    print()
+    for metric, value in sorted(results.items()):
+        base = stored.get("metrics", {}).get(metric)
+        base_text = f"(baseline {base:.4g})" if base is not None else "(no baseline)"
+        print(f"{metric:>32}: {value:12.4f} {base_text}")
+
+    if args.update:
+        stored.setdefault("tolerance", DEFAULT_TOLERANCE)
+        stored.setdefault("metrics", {}).update(results)
+        baselines[key] = stored
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaselines updated: {BASELINE_FILE}")
+        return
+
+    regressions = compare(results, stored)
+    for metric, value, base in regressions:
+        print(f"REGRESSION {metric}: {value:.4g} vs baseline {base:.4g}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
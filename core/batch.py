@@ -0,0 +1,160 @@
+"""
+Vectorized batch environment for the jigsaw game.
+Holds thousands of games as NumPy arrays and steps them all at once,
+which makes Monte Carlo evaluation of a policy table cheap.
+"""
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+from jigsaw import FIGURES, INIT_STATE, PLACEMENT_MASKS, SKIP_ACTION, TERMINAL_STATE
+
+# _PLACEMENT_MASKS[f, a]: cells covered by figure f placed at action a
+# _LEGAL_PLACEMENT[f, a]: placement is inside the board (skip is always legal)
+_PLACEMENT_MASKS = np.array(PLACEMENT_MASKS, dtype=np.uint32)
+_LEGAL_PLACEMENT = _PLACEMENT_MASKS != 0
+_LEGAL_PLACEMENT[:, SKIP_ACTION] = True
+
+
+class BatchJigsaw:
+    """
+    N independent games stored as arrays (the batched counterpart of `Jigsaw`).
+    boards are uint32 bitboards, figures the index of the figure in hand.
+    """
+
+    def __init__(self, n_games: int, rng: np.random.Generator = None, board: int = INIT_STATE):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.boards = np.full(n_games, board, dtype=np.uint32)
+        self.figures = np.zeros(n_games, dtype=np.uint8)
+        self.rounds = np.zeros(n_games, dtype=np.int32)
+        self.skips = np.zeros(n_games, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.boards)
+
+    def set_random_figures(self):
+        """Draw the next figure for every game."""
+        self.figures = self.rng.integers(0, len(FIGURES), len(self), dtype=np.uint8)
+
+    def has_finished(self) -> np.ndarray:
+        """Boolean mask of games whose board is full."""
+        return self.boards == TERMINAL_STATE
+
+    def is_legal(self, actions: np.ndarray) -> np.ndarray:
+        """Boolean mask of legal actions for the current figures."""
+        masks = _PLACEMENT_MASKS[self.figures, actions]
+        return _LEGAL_PLACEMENT[self.figures, actions] & ((self.boards & masks) == 0)
+
+    def perform_actions(self, actions: np.ndarray):
+        """Apply one action per game; raises if any placement is illegal."""
+        actions = np.asarray(actions, dtype=np.intp)
+        if not self.is_legal(actions).all():
+            raise ValueError("Illegal action in batch")
+        self.boards |= _PLACEMENT_MASKS[self.figures, actions]
+        self.skips += actions == SKIP_ACTION
+        self.rounds += 1
+
+    def select(self, mask: np.ndarray):
+        """Keep only the games selected by `mask`."""
+        self.boards = self.boards[mask]
+        self.figures = self.figures[mask]
+        self.rounds = self.rounds[mask]
+        self.skips = self.skips[mask]
+
+
+@dataclass
+class EvaluationReport:
+    """Result of a Monte Carlo policy evaluation."""
+    n_games: int
+    moves_histogram: np.ndarray  # moves_histogram[k]: games finished in k moves
+    unfinished: int              # games still running at max_moves
+    total_moves: int
+    total_skips: int
+    seconds: float
+
+    @property
+    def mean_moves(self) -> float:
+        counts = self.moves_histogram
+        return float((np.arange(len(counts)) * counts).sum() / max(counts.sum(), 1))
+
+    @property
+    def std_moves(self) -> float:
+        counts = self.moves_histogram
+        moves = np.arange(len(counts))
+        mean = self.mean_moves
+        return float(np.sqrt(((moves - mean) ** 2 * counts).sum() / max(counts.sum(), 1)))
+
+    @property
+    def skip_rate(self) -> float:
+        return self.total_skips / max(self.total_moves, 1)
+
+    @property
+    def games_per_sec(self) -> float:
+        return self.n_games / max(self.seconds, 1e-9)
+
+    def quantile(self, q: float) -> int:
+        """Smallest move count k with P(moves <= k) >= q among finished games."""
+        cdf = np.cumsum(self.moves_histogram) / max(self.moves_histogram.sum(), 1)
+        return int(np.searchsorted(cdf, q))
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "games": self.n_games,
+            "mean_moves": self.mean_moves,
+            "std_moves": self.std_moves,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "skip_rate": self.skip_rate,
+            "unfinished": self.unfinished,
+            "games_per_sec": self.games_per_sec,
+        }
+
+
+def evaluate_policy(policy, n_games: int, batch_size: int = 1 << 20,
+                    max_moves: int = 500, seed: int = None,
+                    board: int = INIT_STATE) -> EvaluationReport:
+    """
+    Play `n_games` full games against `policy` (anything with a
+    `solve_many(boards, figures)` method) and collect the move statistics.
+    The games start from `board`, the empty board unless given.
+    """
+    rng = np.random.default_rng(seed)
+    histogram = np.zeros(max_moves + 1, dtype=np.int64)
+    total_moves = total_skips = unfinished = 0
+    start = time.perf_counter()
+
+    for offset in range(0, n_games, batch_size):
+        env = BatchJigsaw(min(batch_size, n_games - offset), rng, board)
+        for _ in range(max_moves):
+            env.set_random_figures()
+            env.perform_actions(policy.solve_many(env.boards, env.figures))
+
+            # Retire finished games so later steps only touch live ones
+            done = env.has_finished()
+            if done.any():
+                histogram += np.bincount(env.rounds[done], minlength=max_moves + 1)
+                total_moves += int(env.rounds[done].sum())
+                total_skips += int(env.skips[done].sum())
+                env.select(~done)
+            if len(env) == 0:
+                break
+
+        unfinished += len(env)
+        total_moves += int(env.rounds.sum())
+        total_skips += int(env.skips.sum())
+
+    return EvaluationReport(n_games, histogram, unfinished, total_moves, total_skips,
+                            time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    from deterministic import get_solver
+
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    report = evaluate_policy(get_solver(), games, seed=0)
+    for key, value in report.summary().items():
+        print(f"{key:>14}: {value:.4f}" if isinstance(value, float) else f"{key:>14}: {value}")
@@ -4,23 +4,29 @@ Computes optimal actions for all possible game states.
 
 Optimized with NumPy and Numba for fast computation.
 """
+import hashlib
 import os
-import pickle
+import re
+import time
 import numpy as np
-from typing import Iterator, Tuple
+from math import comb
+from typing import Callable, Dict, Iterator, List, NamedTuple, Sequence, Tuple
 
 try:
     from numba import njit, prange
     HAS_NUMBA = True
 except ImportError:
     HAS_NUMBA = False
-    print("Warning: numba not installed. Install with 'pip install numba' for 10-50x speedup.")
+    print("Warning: numba not installed, using the vectorized NumPy backend. "
+          "Install with 'pip install numba' for parallel builds.")
 
 from jigsaw import (
     Jigsaw, FIGURES, N, M, SKIP_ACTION, 
-    TERMINAL_STATE, TOTAL_CELLS, TOTAL_FIGURES
+    TERMINAL_STATE, TOTAL_CELLS, TOTAL_FIGURES,
+    ROTATED_FIGURES, rotate_action, rotate_board
 )
 from solver import Solver
+from policy import ArtifactError, CompactPolicy, REVERSED_BYTES, rotate_boards
 
 # Pre-compute figure data as numpy arrays
 _FIG_VALUES = np.array([f.value for f in FIGURES], dtype=np.uint32)
@@ -28,194 +34,360 @@ _FIG_SIZES = np.array([f.size for f in FIGURES], dtype=np.uint8)
 _FIG_MAX_X = np.array([f.max_offset[0] for f in FIGURES], dtype=np.uint8)
 _FIG_MAX_Y = np.array([f.max_offset[1] for f in FIGURES], dtype=np.uint8)
 
-# Pre-compute all subsets as a 2D array (63 subsets, padded to max length 6)
-# Each row: [length, idx0, idx1, idx2, idx3, idx4, idx5]
-_SUBSETS_ARR = []
-from itertools import combinations
-for r in range(1, TOTAL_FIGURES + 1):
-    for combo in combinations(range(TOTAL_FIGURES), r):
-        row = [len(combo)] + list(combo) + [0] * (TOTAL_FIGURES - len(combo))
-        _SUBSETS_ARR.append(row)
-_SUBSETS_NP = np.array(_SUBSETS_ARR, dtype=np.int32)
+# Bump when the checkpoint layout or the DP step (pull, tie-break, skip operator) changes
+CHECKPOINT_VERSION = 2
+# Checkpoints of another board, piece set or DP version are never resumed
+CHECKPOINT_FINGERPRINT = hashlib.sha1(repr(
+    (CHECKPOINT_VERSION, N, M, TOTAL_CELLS, [f.value for f in FIGURES])).encode()).hexdigest()
 
 INF = np.float32(1e9)
 
 
 if HAS_NUMBA:
     @njit(cache=True)
-    def _compute_skip_dst_numba(dsts, subsets):
-        """Compute optimal skip distance using numba."""
-        skp_dst = INF
-        n_subsets = subsets.shape[0]
+    def _compute_skip_dst_numba(dsts):
+        """
+        Compute optimal skip distance using numba (see `skip_dst`).
+        The prefixes of the sorted distances are walked by picking the
+        next smallest distance each step, which needs no scratch array.
+        """
+        n_figures = len(dsts)
+        skp_dst = np.float64(INF)
+        sum_dst = np.float32(0.0)
+        used = 0
         
-        for s in range(n_subsets):
-            length = subsets[s, 0]
-            sum_dst = np.float32(0.0)
-            for i in range(length):
-                sum_dst += dsts[subsets[s, 1 + i]]
-            expected = (TOTAL_FIGURES + sum_dst) / length
+        for length in range(1, n_figures + 1):
+            smallest = -1
+            for i in range(n_figures):
+                if not (used >> i) & 1 and (smallest < 0 or dsts[i] < dsts[smallest]):
+                    smallest = i
+            used |= 1 << smallest
+            sum_dst += dsts[smallest]
+            expected = (n_figures + sum_dst) / length
             if expected < skp_dst:
                 skp_dst = expected
         
         return skp_dst
 
-    @njit(cache=True, parallel=True)
-    def _process_height_numba(
-        height, stack_boards, stack_size,
+    @njit(cache=True)
+    def _rotate_numba(board):
+        """Rotate a 24-bit board by 180 degrees."""
+        return ((REVERSED_BYTES[board & 0xFF] << 16)
+                | (REVERSED_BYTES[(board >> 8) & 0xFF] << 8)
+                | REVERSED_BYTES[board >> 16])
+
+    @njit(cache=True)
+    def _layer_boards_numba(n_filled, symmetric, out):
+        """
+        Enumerate all boards with exactly `n_filled` set bits into `out`,
+        in increasing order, using Gosper's hack. Returns the count.
+        With `symmetric`, only orbit representatives (board <= rotated) are kept.
+        """
+        if n_filled == 0:
+            out[0] = 0
+            return 1
+        
+        count = 0
+        limit = np.int64(1) << TOTAL_CELLS
+        v = (np.int64(1) << n_filled) - 1
+        while v < limit:
+            if not symmetric or v <= _rotate_numba(v):
+                out[count] = v
+                count += 1
+            c = v & -v
+            r = v + c
+            v = (((r ^ v) >> 2) // c) | r
+        return count
+
+    @njit(cache=True)
+    def _pull_board_numba(
+        board, height,
         dsts, actions, in_stack,
         fig_values, fig_sizes, fig_max_x, fig_max_y,
-        subsets, next_stacks, next_sizes
+        symmetric
     ):
-        """Process all boards at a given height level using numba with parallelization."""
+        """
+        Evaluate one board from the already finished lower layers.
+        Only the board's own dsts/actions/in_stack entries are written, so
+        any number of boards of the same layer can be evaluated in parallel.
+        With `symmetric`, targets are read through their orbit representative.
+        """
         n_figures = len(fig_values)
+        base_idx = board * n_figures
+        reachable = False
         
-        for board_idx in prange(stack_size):
-            board = stack_boards[board_idx]
-            base_idx = board * n_figures
-            
-            # Compute skip distance
-            board_dsts = dsts[base_idx:base_idx + n_figures]
-            skp_dst = _compute_skip_dst_numba(board_dsts, subsets)
-            
-            # Update where skipping is better
-            for i in range(n_figures):
-                if dsts[base_idx + i] > skp_dst:
-                    actions[base_idx + i] = SKIP_ACTION
-                    dsts[base_idx + i] = skp_dst
+        # Best placement per figure: min over the boards it leads to.
+        # Actions are tried from the highest down, i.e. in increasing target
+        # board order, and the first of equally good ones is kept. The old
+        # push-style sweep kept the first in stack (discovery) order, so on
+        # such ties the two may pick different, equally good actions.
+        for f_idx in range(n_figures):
+            if fig_sizes[f_idx] > height:
+                continue
             
-            # Compute average distance
-            avg = np.float32(0.0)
-            for i in range(n_figures):
-                avg += dsts[base_idx + i]
-            dst = 1.0 + avg / n_figures
+            f_value = fig_values[f_idx]
+            max_x = fig_max_x[f_idx]
+            max_y = fig_max_y[f_idx]
             
-            # Try all figures and placements
-            for f_idx in range(n_figures):
-                if height + fig_sizes[f_idx] > TOTAL_CELLS:
+            for action in range(TOTAL_CELLS - 1, -1, -1):
+                x = action >> 2
+                y = action & 0b11
+                
+                if x > max_x or y > max_y:
                     continue
                 
-                f_value = fig_values[f_idx]
-                f_size = fig_sizes[f_idx]
-                max_x = fig_max_x[f_idx]
-                max_y = fig_max_y[f_idx]
+                shifted = f_value >> (x * N + y)
                 
-                for action in range(TOTAL_CELLS):
-                    x = action >> 2
-                    y = action & 0b11
-                    
-                    if x > max_x or y > max_y:
-                        continue
-                    
-                    shift = x * N + y
-                    shifted = f_value >> shift
-                    
-                    # Check if valid (figure fits on filled cells)
-                    if (board | shifted) != board:
-                        continue
-                    
-                    # New board by removing figure
-                    new_board = board & (~shifted)
-                    new_idx = new_board * n_figures + f_idx
-                    
-                    if dst < dsts[new_idx]:
-                        dsts[new_idx] = dst
-                        actions[new_idx] = (x << 2) | y
-                    
-                    if not in_stack[new_board]:
-                        in_stack[new_board] = True
-                        # Add to appropriate next stack
-                        next_idx = height + f_size
-                        pos = next_sizes[next_idx]
-                        next_stacks[next_idx, pos] = new_board
-                        next_sizes[next_idx] += 1
+                # Figure must land on empty cells only
+                if (board & shifted) != 0:
+                    continue
+                
+                target = board | shifted
+                if symmetric:
+                    target = min(target, _rotate_numba(target))
+                if not in_stack[target]:
+                    continue
+                reachable = True
+                
+                # Expected distance after placing (average over next figures)
+                t_base = target * n_figures
+                avg = np.float32(0.0)
+                for i in range(n_figures):
+                    avg += dsts[t_base + i]
+                dst = 1.0 + avg / n_figures
+                
+                if dst < dsts[base_idx + f_idx]:
+                    dsts[base_idx + f_idx] = dst
+                    actions[base_idx + f_idx] = action
+        
+        if not reachable:
+            return
+        in_stack[board] = True
+        
+        # Compute skip distance and update where skipping is better
+        board_dsts = dsts[base_idx:base_idx + n_figures]
+        skp_dst = _compute_skip_dst_numba(board_dsts)
+        for i in range(n_figures):
+            if dsts[base_idx + i] > skp_dst:
+                actions[base_idx + i] = SKIP_ACTION
+                dsts[base_idx + i] = skp_dst
+
+    @njit(cache=True, parallel=True)
+    def _process_height_numba(
+        height, layer_boards, layer_size,
+        dsts, actions, in_stack,
+        fig_values, fig_sizes, fig_max_x, fig_max_y,
+        symmetric
+    ):
+        """Process all boards at a given height level using numba with parallelization."""
+        for board_idx in prange(layer_size):
+            _pull_board_numba(
+                layer_boards[board_idx], height,
+                dsts, actions, in_stack,
+                fig_values, fig_sizes, fig_max_x, fig_max_y,
+                symmetric
+            )
 
     @njit(cache=True)
     def _process_height_serial(
-        height, stack_boards, stack_size,
+        height, layer_boards, layer_size,
         dsts, actions, in_stack,
         fig_values, fig_sizes, fig_max_x, fig_max_y,
-        subsets, next_stacks, next_sizes
+        symmetric
     ):
         """Serial version for when parallel doesn't work well."""
-        n_figures = len(fig_values)
-        
-        for board_idx in range(stack_size):
-            board = stack_boards[board_idx]
-            base_idx = board * n_figures
-            
-            # Compute skip distance
-            board_dsts = dsts[base_idx:base_idx + n_figures]
-            skp_dst = _compute_skip_dst_numba(board_dsts, subsets)
-            
-            # Update where skipping is better
-            for i in range(n_figures):
-                if dsts[base_idx + i] > skp_dst:
-                    actions[base_idx + i] = SKIP_ACTION
-                    dsts[base_idx + i] = skp_dst
-            
-            # Compute average distance
-            avg = np.float32(0.0)
-            for i in range(n_figures):
-                avg += dsts[base_idx + i]
-            dst = 1.0 + avg / n_figures
-            
-            # Try all figures and placements
-            for f_idx in range(n_figures):
-                if height + fig_sizes[f_idx] > TOTAL_CELLS:
-                    continue
-                
-                f_value = fig_values[f_idx]
-                f_size = fig_sizes[f_idx]
-                max_x = fig_max_x[f_idx]
-                max_y = fig_max_y[f_idx]
-                
-                for action in range(TOTAL_CELLS):
-                    x = action >> 2
-                    y = action & 0b11
-                    
-                    if x > max_x or y > max_y:
-                        continue
-                    
-                    shift = x * N + y
-                    shifted = f_value >> shift
-                    
-                    if (board | shifted) != board:
-                        continue
-                    
-                    new_board = board & (~shifted)
-                    new_idx = new_board * n_figures + f_idx
-                    
-                    if dst < dsts[new_idx]:
-                        dsts[new_idx] = dst
-                        actions[new_idx] = (x << 2) | y
-                    
-                    if not in_stack[new_board]:
-                        in_stack[new_board] = True
-                        next_idx = height + f_size
-                        pos = next_sizes[next_idx]
-                        next_stacks[next_idx, pos] = new_board
-                        next_sizes[next_idx] += 1
+        for board_idx in range(layer_size):
+            _pull_board_numba(
+                layer_boards[board_idx], height,
+                dsts, actions, in_stack,
+                fig_values, fig_sizes, fig_max_x, fig_max_y,
+                symmetric
+            )
+
+
+def filled_counts() -> np.ndarray:
+    """Number of filled cells of every board (popcount of 0 .. 2^24-1)."""
+    counts = np.zeros(1 << TOTAL_CELLS, dtype=np.uint8)
+    for bit in range(TOTAL_CELLS):
+        counts[1 << bit:2 << bit] = counts[:1 << bit] + 1
+    return counts
+
+
+def placements(f_idx: int) -> list:
+    """(action, shifted figure) pairs of a figure, highest action first."""
+    max_x, max_y = FIGURES[f_idx].max_offset
+    result = []
+    for action in range(TOTAL_CELLS - 1, -1, -1):
+        x, y = action >> 2, action & 0b11
+        if x <= max_x and y <= max_y:
+            result.append((action, np.uint32(FIGURES[f_idx].value >> (x * N + y))))
+    return result
+
+
+def board_values_numpy(dsts: np.ndarray) -> np.ndarray:
+    """1 + mean distance per (boards x figures) row, summed like the numba kernel."""
+    n_figures = dsts.shape[1]
+    avg = np.zeros(len(dsts), dtype=np.float32)
+    for i in range(n_figures):
+        avg += dsts[:, i]
+    return 1.0 + avg.astype(np.float64) / n_figures
+
+
+def skip_dst(dsts) -> float:
+    """
+    Expected distance of skipping: the best over figure subsets S of
+    (n_figures + sum of S's distances) / |S|, i.e. keep skipping until a
+    figure of S comes up, then play it.
+    For a fixed |S| the smallest distances are best, so the optimum is one
+    of the n_figures prefixes of the sorted distances: O(n log n) instead
+    of checking all 2^n - 1 subsets.
+    """
+    n_figures = len(dsts)
+    skp = float(INF)
+    sum_dst = np.float32(0.0)
+    for length, dst in enumerate(sorted(dsts), 1):
+        sum_dst += np.float32(dst)
+        skp = min(skp, (n_figures + float(sum_dst)) / length)
+    return skp
+
+
+def skip_dsts_numpy(dsts: np.ndarray) -> np.ndarray:
+    """Vectorized `skip_dst` per (boards x figures) row."""
+    n_figures = dsts.shape[1]
+    # cumsum accumulates sequentially in float32, like the numba kernel
+    prefix = np.cumsum(np.sort(dsts, axis=1), axis=1, dtype=np.float32)
+    lengths = np.arange(1, n_figures + 1, dtype=np.float64)
+    return ((n_figures + prefix.astype(np.float64)) / lengths).min(axis=1, initial=float(INF))
+
+
+class PulledLayer(NamedTuple):
+    """Result of `pull_layer`, one row per board of the layer."""
+    best: np.ndarray       # (boards x figures) float32 distance of the chosen action
+    actions: np.ndarray    # (boards x figures) uint8 chosen action
+    reachable: np.ndarray  # some figure lands on a known board
+
+
+def pull_layer(boards: np.ndarray, layer_placements: Sequence[list],
+               lookup: Callable[[int, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+               symmetric: bool = False, skips: bool = True, skip_action: int = SKIP_ACTION,
+               fill: float = INF) -> PulledLayer:
+    """
+    One pull step of the layered DP: for every board and figure, the
+    placement whose landing board has the smallest value, then (with
+    `skips`) skipping where `skip_dsts_numpy` beats it.
+
+    `layer_placements[f]` are figure f's (action, shifted figure) pairs,
+    highest action first (empty when the figure does not fit this layer).
+    `lookup(f, targets)` returns which landing boards are known and the
+    values of those. Sequential strict-less updates in placement order
+    resolve ties exactly like the numba kernel, so every backend built on
+    this produces the same tables.
+    """
+    n_figures = len(layer_placements)
+    best = np.full((len(boards), n_figures), fill, dtype=np.float32)
+    best_actions = np.full((len(boards), n_figures), skip_action, dtype=np.uint8)
+    reachable = np.zeros(len(boards), dtype=np.bool_)
+
+    for f_idx, pairs in enumerate(layer_placements):
+        column = best[:, f_idx]
+        for action, shifted in pairs:
+            idx = np.flatnonzero((boards & shifted) == 0)
+            targets = boards[idx] | shifted
+            if symmetric:
+                targets = np.minimum(targets, rotate_boards(targets))
+            found, cand = lookup(f_idx, targets)
+            idx = idx[found]
+            reachable[idx] = True
+
+            better = cand < column[idx]
+            idx = idx[better]
+            column[idx] = cand[better]
+            best_actions[idx, f_idx] = action
+
+    if skips and len(boards):
+        skp = skip_dsts_numpy(best)[:, None]
+        use_skip = best > skp
+        best = np.where(use_skip, skp.astype(np.float32), best)
+        best_actions[use_skip] = skip_action
+    return PulledLayer(best, best_actions, reachable)
+
+
+def sorted_lookup(boards: np.ndarray, values: np.ndarray, targets: np.ndarray):
+    """`pull_layer` lookup in a sorted layer: which targets it holds, and their values."""
+    pos = np.searchsorted(boards, targets)
+    pos[pos == len(boards)] = 0
+    found = boards[pos] == targets
+    return found, values[pos[found]]
 
 
 class Deterministic(Solver):
     """
     Deterministic optimal solver using dynamic programming.
     Precomputes the best action for every possible (board, figure) state.
+
+    The dense `dsts`/`actions`/`in_stack` arrays only exist while building
+    (or after loading the cache); `solve()` runs against the compact
+    reachable-only `policy` table once `compact()` has been called.
+
+    The policy is persisted as a memory-mapped artifact (`POLICY_FILE`);
+    the compressed npz cache stays available as an import/export format.
+
+    With `symmetric` (the default) only one board per 180 degree rotation
+    orbit is solved and stored; queries for the other board are rotated in
+    and the action is rotated back out.
     """
     
     CACHE_FILE = "solver_cache.npz"
+    POLICY_FILE = "solver_policy.bin"
+    CHECKPOINT_DIR = "solver_checkpoints"
+    
+    BACKENDS = ("numba", "numpy", "python")
     
-    def __init__(self):
+    def __init__(self, symmetric: bool = True, parallel: bool = True,
+                 on_height: Callable[[int, float], None] = None):
+        self.symmetric = symmetric
+        self.parallel = parallel
+        self.on_height = on_height
+        self.height_times: List[float] = []
+        self.dsts = None
+        self.actions = None
+        self.in_stack = None
+        self.checkpoint_dir: str = None
+        self.policy: CompactPolicy = None
+    
+    def _height_done(self, height: int, seconds: float):
+        self.height_times.append(seconds)
+        if self.on_height is not None:
+            self.on_height(height, seconds)
+
+    def _allocate(self):
+        """Allocate the dense DP arrays."""
         total_states = 1 << TOTAL_CELLS
         self.dsts = np.full(total_states * TOTAL_FIGURES, INF, dtype=np.float32)
         self.actions = np.full(total_states * TOTAL_FIGURES, SKIP_ACTION, dtype=np.uint8)
         self.in_stack = np.zeros(total_states, dtype=np.bool_)
     
+    def compact(self, values: bool = False):
+        """
+        Build the compact policy table and release the dense arrays.
+        The expected distances (`values_many`, `distances`) are only kept
+        with `values`: they make the table about six times larger.
+        """
+        if self.in_stack is None:
+            # Not saved in the cache: every processed board has finite distances
+            self.in_stack = self.dsts[::TOTAL_FIGURES] < INF
+        self.policy = CompactPolicy.from_dense(self.actions, self.in_stack, self.symmetric,
+                                               self.dsts if values else None)
+        self.dsts = None
+        self.actions = None
+        self.in_stack = None
+    
     def save_cache(self, filepath: str = None):
         """Save computed data to cache file."""
         if filepath is None:
             filepath = os.path.join(os.path.dirname(__file__), self.CACHE_FILE)
-        np.savez_compressed(filepath, dsts=self.dsts, actions=self.actions)
+        np.savez_compressed(filepath, dsts=self.dsts, actions=self.actions,
+                            symmetric=self.symmetric)
         print(f"Saved cache to {filepath}")
     
     def load_cache(self, filepath: str = None) -> bool:
@@ -227,6 +399,9 @@ class Deterministic(Solver):
                 data = np.load(filepath)
                 self.dsts = data['dsts'].copy()
                 self.actions = data['actions'].copy()
+                # Caches written before symmetry reduction hold full tables
+                self.symmetric = 'symmetric' in data.files and bool(data['symmetric'])
+                self.in_stack = None
                 data.close()
                 print(f"Loaded cache from {filepath}")
                 return True
@@ -238,77 +413,236 @@ class Deterministic(Solver):
                     pass
         return False
     
-    def run(self):
-        """Run the DP algorithm to compute optimal actions."""
-        if self.load_cache():
+    def save_policy(self, filepath: str = None):
+        """Save the compact policy as a memory-mappable artifact."""
+        if filepath is None:
+            filepath = os.path.join(os.path.dirname(__file__), self.POLICY_FILE)
+        self.policy.save(filepath)
+        print(f"Saved policy to {filepath}")
+    
+    def load_policy(self, filepath: str = None) -> bool:
+        """Map the compact policy artifact; returns almost instantly."""
+        if filepath is None:
+            filepath = os.path.join(os.path.dirname(__file__), self.POLICY_FILE)
+        if os.path.exists(filepath):
+            try:
+                self.policy = CompactPolicy.load(filepath)
+                print(f"Mapped policy from {filepath}")
+                return True
+            except (ArtifactError, OSError, ValueError) as e:
+                print(f"Failed to load policy: {e}, rebuilding...")
+        return False
+    
+    def run(self, values: bool = False):
+        """
+        Run the DP algorithm to compute optimal actions. With `values` the
+        policy artifact is (re)built with the expected distances as well.
+        """
+        if self.load_policy() and (not values or self.policy.values is not None):
             return
+        self.policy = None  # unmap an artifact without values before it is replaced
+        
+        if not self.load_cache():
+            checkpoint_dir = os.path.join(os.path.dirname(__file__), self.CHECKPOINT_DIR)
+            self.build(checkpoint_dir=checkpoint_dir)
+            self.save_cache()
+            clear_checkpoints(checkpoint_dir)
+        
+        self.compact(values)
+        self.save_policy()
+    
+    def build(self, backend: str = None, max_height: int = TOTAL_CELLS,
+              checkpoint_dir: str = None):
+        """
+        Allocate the dense arrays and run the DP up to `max_height`.
+        `backend` is one of BACKENDS (default: numba if installed, else numpy);
+        the seconds spent on each height end up in `height_times` and are
+        passed to `on_height(height, seconds)` as soon as the height is done.
+
+        With `checkpoint_dir` every finished height is written there, and a
+        later build resumes after the last height found (numba and numpy
+        backends; the pure Python fallback always starts over).
+        """
+        if backend is None:
+            backend = "numba" if HAS_NUMBA else "numpy"
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if backend == "numba" and not HAS_NUMBA:
+            raise RuntimeError("numba is not installed")
+        
+        self._allocate()
+        self.height_times = []
+        self.checkpoint_dir = checkpoint_dir if backend != "python" else None
+        start_height = 1
+        if self.checkpoint_dir is not None:
+            start_height = self._resume() + 1
         
-        if HAS_NUMBA:
-            self._run_numba()
+        if backend == "numba":
+            self._run_numba(max_height, start_height)
+        elif backend == "numpy":
+            self._run_numpy(max_height, start_height)
         else:
-            self._run_pure_python()
+            self._run_pure_python(max_height)
     
-    def _run_numba(self):
+    def _checkpoint(self, height: int, boards: np.ndarray):
+        """Persist a finished height (its boards and their dsts/actions rows)."""
+        if self.checkpoint_dir is None:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        rows = boards.astype(np.int64) * TOTAL_FIGURES
+        index = (rows[:, None] + np.arange(TOTAL_FIGURES)).ravel()
+        path = checkpoint_path(self.checkpoint_dir, height)
+        # Write to a temporary file and rename, so a killed build never
+        # leaves a half-written checkpoint behind
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, boards=boards,
+                     dsts=self.dsts[index].reshape(-1, TOTAL_FIGURES),
+                     actions=self.actions[index].reshape(-1, TOTAL_FIGURES),
+                     symmetric=self.symmetric, fingerprint=CHECKPOINT_FINGERPRINT)
+        os.replace(tmp_path, path)
+    
+    def _resume(self) -> int:
+        """
+        Load the checkpointed heights 1..k into the dense arrays and return k
+        (0 if there is nothing to resume). Lower heights are all the pull
+        DP needs to continue: they hold the values and the reachable set.
+        """
+        height = 0
+        kept = discard_stale_checkpoints(self.checkpoint_dir, self.symmetric)
+        while height < kept:
+            path = checkpoint_path(self.checkpoint_dir, height + 1)
+            try:
+                with np.load(path) as data:
+                    boards = data['boards']
+                    rows = boards.astype(np.int64) * TOTAL_FIGURES
+                    index = (rows[:, None] + np.arange(TOTAL_FIGURES)).ravel()
+                    self.dsts[index] = data['dsts'].reshape(-1)
+                    self.actions[index] = data['actions'].reshape(-1)
+                    self.in_stack[boards] = True
+            except Exception as e:
+                print(f"Failed to load checkpoint {path}: {e}")
+                break
+            height += 1
+        
+        if height:
+            print(f"Resuming from checkpoint after height {height}/{TOTAL_CELLS}")
+        return height
+    
+    def _run_numba(self, max_height: int = TOTAL_CELLS, start_height: int = 1):
         """Numba-accelerated version."""
         print("Computing optimal strategy with Numba acceleration...")
         print("First run compiles JIT - subsequent runs will be faster.")
         
-        total_states = 1 << TOTAL_CELLS
-        
         # Initialize terminal state
         term_base = TERMINAL_STATE * TOTAL_FIGURES
         self.dsts[term_base:term_base + TOTAL_FIGURES] = 0.0
         self.in_stack[TERMINAL_STATE] = True
         
-        # Stacks for each height (pre-allocate max possible size)
-        max_stack = total_states
-        stacks = np.zeros((TOTAL_CELLS + 1, max_stack), dtype=np.uint32)
-        stack_sizes = np.zeros(TOTAL_CELLS + 1, dtype=np.int32)
+        # Boards at height h are exactly the boards with 24 - h filled
+        # cells, so each layer is enumerated directly into one buffer sized
+        # for the widest layer. Every board pulls its values from the lower,
+        # already finished layers (pull-style DP): threads never write the
+        # same entry, so the result is identical for any thread count.
+        # Against the old push-style stack build (kept as the "python"
+        # backend) the dsts are bit-identical; the actions are too, except
+        # where several placements reach the same float32 value, where
+        # either may be kept (see _pull_board_numba).
+        layer = np.zeros(comb(TOTAL_CELLS, TOTAL_CELLS // 2), dtype=np.uint32)
         
-        stacks[0, 0] = TERMINAL_STATE
-        stack_sizes[0] = 1
-        
-        for height in range(TOTAL_CELLS):
-            size = stack_sizes[height]
-            if size == 0:
-                continue
+        for height in range(start_height, max_height + 1):
+            start = time.perf_counter()
+            size = _layer_boards_numba(np.int64(TOTAL_CELLS - height), self.symmetric, layer)
             
-            # Use serial for small stacks, parallel for large
-            if size > 1000:
-                _process_height_numba(
-                    np.int32(height),
-                    stacks[height], np.int32(size),
-                    self.dsts, self.actions, self.in_stack,
-                    _FIG_VALUES, _FIG_SIZES, _FIG_MAX_X, _FIG_MAX_Y,
-                    _SUBSETS_NP, stacks, stack_sizes
-                )
-            else:
-                _process_height_serial(
-                    np.int32(height),
-                    stacks[height], np.int32(size),
-                    self.dsts, self.actions, self.in_stack,
-                    _FIG_VALUES, _FIG_SIZES, _FIG_MAX_X, _FIG_MAX_Y,
-                    _SUBSETS_NP, stacks, stack_sizes
-                )
+            # Use serial for small layers, parallel for large
+            parallel = self.parallel and size > 1000
+            kernel = _process_height_numba if parallel else _process_height_serial
+            kernel(
+                np.int32(height),
+                layer, np.int32(size),
+                self.dsts, self.actions, self.in_stack,
+                _FIG_VALUES, _FIG_SIZES, _FIG_MAX_X, _FIG_MAX_Y,
+                self.symmetric
+            )
             
+            self._height_done(height, time.perf_counter() - start)
             print(f"  Height {height}/{TOTAL_CELLS}: processed {size} states")
+            
+            if self.checkpoint_dir is not None:
+                boards = layer[:size]
+                self._checkpoint(height, boards[self.in_stack[boards]])
         
         print("Strategy computation complete!")
-        self.save_cache()
     
-    def _run_pure_python(self):
+    def _run_numpy(self, max_height: int = TOTAL_CELLS, start_height: int = 1):
+        """
+        Vectorized NumPy version for hosts without numba.
+        Evaluates a whole layer per array operation (pull-style, like the
+        numba kernel) and produces the same dsts/actions tables.
+        """
+        print("Computing optimal strategy with NumPy vectorization...")
+        
+        dsts = self.dsts.reshape(-1, TOTAL_FIGURES)
+        actions = self.actions.reshape(-1, TOTAL_FIGURES)
+        
+        # Initialize terminal state
+        dsts[TERMINAL_STATE] = 0.0
+        self.in_stack[TERMINAL_STATE] = True
+        
+        # Expected distance after landing on a board (finished layers only)
+        values = np.full(1 << TOTAL_CELLS, INF, dtype=np.float64)
+        done = np.flatnonzero(self.in_stack)
+        values[done] = board_values_numpy(dsts[done])
+        
+        filled = filled_counts()
+        all_placements = [placements(f_idx) for f_idx in range(TOTAL_FIGURES)]
+        
+        def lookup(f_idx, targets):
+            found = self.in_stack[targets]
+            return found, values[targets[found]]
+        
+        for height in range(start_height, max_height + 1):
+            start = time.perf_counter()
+            boards = np.flatnonzero(filled == TOTAL_CELLS - height).astype(np.uint32)
+            if self.symmetric:
+                boards = boards[boards <= rotate_boards(boards)]
+            layer_placements = [pairs if _FIG_SIZES[f_idx] <= height else []
+                                for f_idx, pairs in enumerate(all_placements)]
+            best, best_actions, reachable = pull_layer(boards, layer_placements, lookup,
+                                                       self.symmetric)
+            boards = boards[reachable]
+            best = best[reachable]
+            best_actions = best_actions[reachable]
+            
+            dsts[boards] = best
+            actions[boards] = best_actions
+            self.in_stack[boards] = True
+            values[boards] = board_values_numpy(best)
+            
+            self._height_done(height, time.perf_counter() - start)
+            print(f"  Height {height}/{TOTAL_CELLS}: processed {len(boards)} states")
+            self._checkpoint(height, boards)
+        
+        print("Strategy computation complete!")
+    
+    def _run_pure_python(self, max_height: int = TOTAL_CELLS):
         """Pure Python fallback (slower)."""
         print("Computing optimal strategy (pure Python - this will be slow)...")
         print("Install numba for 10-50x speedup: pip install numba")
         
+        # The simple implementation always solves the full table
+        self.symmetric = False
+        
         # ... simplified version for fallback
-        self._run_simple()
+        self._run_simple(max_height)
     
-    def _run_simple(self):
-        """Simple pure-python implementation."""
-        from itertools import combinations
-        
-        subsets = [list(c) for r in range(1, 7) for c in combinations(range(6), r)]
+    def _run_simple(self, max_height: int = TOTAL_CELLS):
+        """
+        Simple pure-python implementation, push-style: the boards of a
+        height get their skip update and then push their value to the
+        boards one placement below. Height 0 is the terminal board alone,
+        so heights 1 .. max_height end up solved, as in the other backends.
+        """
         stacks = [[] for _ in range(25)]
         stacks[0].append(TERMINAL_STATE)
         
@@ -316,7 +650,8 @@ class Deterministic(Solver):
         self.dsts[term_base:term_base + TOTAL_FIGURES] = 0.0
         self.in_stack[TERMINAL_STATE] = True
         
-        for height in range(TOTAL_CELLS):
+        for height in range(max_height + 1):
+            start = time.perf_counter()
             stack = stacks[height]
             print(f"  Height {height}: {len(stack)} states")
             
@@ -324,7 +659,7 @@ class Deterministic(Solver):
                 base = board * TOTAL_FIGURES
                 
                 # Skip distance
-                skp = min((6 + sum(self.dsts[base + i] for i in s)) / len(s) for s in subsets)
+                skp = skip_dst(self.dsts[base:base + 6])
                 for i in range(6):
                     if self.dsts[base + i] > skp:
                         self.dsts[base + i] = skp
@@ -356,42 +691,138 @@ class Deterministic(Solver):
                         if not self.in_stack[nb]:
                             self.in_stack[nb] = True
                             stacks[height + fs].append(nb)
+            
+            if height:
+                self._height_done(height, time.perf_counter() - start)
         
         print("Done!")
-        self.save_cache()
     
     def solve(self, game: Jigsaw) -> int:
         """Get the optimal action for the current game state."""
-        f_idx = next(i for i, f in enumerate(FIGURES) if f.value == game.get_figure().value)
-        return int(self.actions[game.board * TOTAL_FIGURES + f_idx])
+        return self.policy.action(game.board, game.figure)
+    
+    def action(self, board: int, f_idx: int) -> int:
+        """Optimal action for a board with figure index `f_idx` in hand."""
+        return self.policy.action(board, f_idx)
+    
+    def solve_many(self, boards: np.ndarray, figures: np.ndarray) -> np.ndarray:
+        """Optimal actions for arrays of boards and figure indices."""
+        return self.policy.solve_many(boards, figures)
+    
+    def values_many(self, boards: np.ndarray, figures: np.ndarray) -> np.ndarray:
+        """Expected remaining moves for arrays of boards and figure indices."""
+        return self.policy.values_many(boards, figures)
     
     def distances(self, board: int) -> Iterator[Tuple[int, float]]:
-        """Get (action, distance) pairs for a board state."""
+        """
+        Get (action, distance) pairs for a board state, from the dense arrays
+        or, once compacted, from a policy stored with its values.
+        """
+        if self.dsts is None:
+            if self.policy is None or self.policy.values is None:
+                raise ValueError("distances() needs the dense DP arrays (a fresh build()) "
+                                 "or a policy stored with its values (compact(values=True))")
+            for i in range(TOTAL_FIGURES):
+                yield (self.policy.action(board, i), self.policy.value(board, i))
+            return
+        rotated = self.symmetric and rotate_board(board) < board
+        if rotated:
+            board = rotate_board(board)
         base = board * TOTAL_FIGURES
         for i in range(TOTAL_FIGURES):
-            yield (int(self.actions[base + i]), float(self.dsts[base + i]))
+            if rotated:
+                g = ROTATED_FIGURES[i]
+                yield (rotate_action(int(self.actions[base + g]), g), float(self.dsts[base + g]))
+            else:
+                yield (int(self.actions[base + i]), float(self.dsts[base + i]))
 
 
-_cached_solver: Deterministic = None
+# height_NN.npz, and its .tmp left behind by a killed write
+_CHECKPOINT_NAME = re.compile(r"height_(\d{2})\.npz(\.tmp)?")
 
 
-def get_solver() -> Deterministic:
-    """Get or create the cached deterministic solver."""
-    global _cached_solver
-    if _cached_solver is None:
-        _cached_solver = Deterministic()
-        _cached_solver.run()
-    return _cached_solver
+def checkpoint_path(checkpoint_dir: str, height: int) -> str:
+    return os.path.join(checkpoint_dir, f"height_{height:02d}.npz")
+
+
+def _checkpoint_heights(checkpoint_dir: str) -> Dict[int, List[str]]:
+    """{height: [file names]} of the checkpoint files in a directory; other files are ignored."""
+    heights = {}
+    if os.path.isdir(checkpoint_dir):
+        for name in sorted(os.listdir(checkpoint_dir)):
+            match = _CHECKPOINT_NAME.fullmatch(name)
+            if match:
+                heights.setdefault(int(match.group(1)), []).append(name)
+    return heights
+
+
+def checkpoint_matches(data, symmetric: bool) -> bool:
+    """Whether an open checkpoint was written by this DP version, for these figures and symmetry."""
+    return ('fingerprint' in data.files and str(data['fingerprint']) == CHECKPOINT_FINGERPRINT
+            and bool(data['symmetric']) == symmetric)
+
+
+def discard_stale_checkpoints(checkpoint_dir: str, symmetric: bool) -> int:
+    """
+    Check the checkpoints from height 1 up and return how many consecutive
+    heights can be resumed. From the first checkpoint that is missing,
+    unreadable or written for another fingerprint or symmetry, every
+    later one is deleted: a build must never continue on stale layers.
+    """
+    height = 0
+    while height < TOTAL_CELLS:
+        path = checkpoint_path(checkpoint_dir, height + 1)
+        if not os.path.exists(path):
+            # Nothing past a gap can be resumed
+            clear_checkpoints(checkpoint_dir, height + 1)
+            break
+        try:
+            with np.load(path) as data:
+                matches = checkpoint_matches(data, symmetric)
+        except Exception as e:
+            print(f"Failed to read checkpoint {path}: {e}")
+            matches = False
+        if not matches:
+            print(f"Discarding checkpoints from height {height + 1}: written by another "
+                  f"build (figures, board size, DP version or symmetry)")
+            clear_checkpoints(checkpoint_dir, height + 1)
+            break
+        height += 1
+    return height
+
+
+def clear_checkpoints(checkpoint_dir: str, from_height: int = 1):
+    """Delete the per-height checkpoints (from `from_height` up) of a finished build."""
+    if not os.path.isdir(checkpoint_dir):
+        return
+    for height, names in _checkpoint_heights(checkpoint_dir).items():
+        if height >= from_height:
+            for name in names:
+                os.remove(os.path.join(checkpoint_dir, name))
+    if from_height > 1:
+        return
+    try:
+        os.rmdir(checkpoint_dir)
+    except OSError:
+        pass
 
 
 # Singleton instance for caching the computed strategy
 _cached_solver: Deterministic = None
 
 
-def get_solver() -> Deterministic:
-    """Get or create the cached deterministic solver."""
+def get_solver(on_height: Callable[[int, float], None] = None,
+               values: bool = False) -> Deterministic:
+    """
+    Get or create the cached deterministic solver. `on_height` sees the
+    time of each DP height if the table has to be built; `values` asks
+    for a policy that also answers `values_many` and `distances`.
+    """
     global _cached_solver
     if _cached_solver is None:
-        _cached_solver = Deterministic()
-        _cached_solver.run()
+        _cached_solver = Deterministic(on_height=on_height)
+        _cached_solver.run(values)
+    elif values and _cached_solver.policy.values is None:
+        _cached_solver.on_height = on_height
+        _cached_solver.run(values)
     return _cached_solver
@@ -0,0 +1,411 @@
+"""
+Move-count distributions of a policy, and a tail-risk policy.
+
+`Deterministic` keeps only the expected number of moves per state, which
+says nothing about how often a board takes much longer. This module
+evaluates a given policy exactly: for every board, the probability that
+it is finished in exactly k more moves (chest draws), k = 0..horizon.
+The mass beyond the horizon is kept as a single tail value; the mean and
+variance follow their own (untruncated) recursions.
+
+Layers are evaluated like the DP, from the full board down to the empty
+one: a board's distribution only depends on the boards its placements
+land on, at most `MAX_FIGURE_SIZE` layers below, so only that window of
+layers is kept in memory. A skip keeps the board and draws a new figure,
+so with skip probability `s` (the share of figures the policy skips on
+board b) and `P(k)` the average over the placed figures of the next
+boards' probabilities of k moves:
+
+    Q_b(0) = 0,  Q_b(k) = P(k - 1) + s * Q_b(k - 1)
+
+`risk_policy` builds a different policy on the same pass: on each board
+it plays the placement whose distribution has the smallest `quantile`
+(e.g. p95) instead of the smallest mean, and picks the set of figures to
+skip the way the DP does (the best prefix of the figures sorted by that
+score). The quantile is optimised board by board, which is what a table
+lookup can act on; the result is a `CompactPolicy` the bot can play.
+
+Usage:
+    python distribution.py                         # distribution of the stored policy
+    python distribution.py --boards 100 --confidence 0.95
+    python distribution.py --risk 0.95 --save risk_policy.bin
+"""
+import argparse
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Tuple
+
+import numpy as np
+
+from jigsaw import (FIGURES, INIT_STATE, PLACEMENT_MASKS, SKIP_ACTION, TERMINAL_STATE,
+                    TOTAL_CELLS, TOTAL_FIGURES)
+from policy import CompactPolicy, rotate_boards
+from deterministic import filled_counts, placements, pull_layer
+
+DEFAULT_HORIZON = 64   # moves tracked per board; the expert policy needs > 64 for ~1e-4 of the boards
+CHUNK = 1 << 15        # boards evaluated per array operation
+_FIG_SIZES = np.array([figure.size for figure in FIGURES], dtype=np.intp)
+MAX_FIGURE_SIZE = int(_FIG_SIZES.max())
+
+_PLACEMENT_MASKS = np.array(PLACEMENT_MASKS, dtype=np.uint32)
+
+
+class MoveDistribution:
+    """
+    Distribution of the number of moves until a board is full.
+    `probs[k]` is the probability of exactly k moves (k <= horizon); the
+    rest is the tail. `mean`/`variance` are exact when given, otherwise
+    they are computed from the truncated probabilities.
+    """
+
+    def __init__(self, probs: np.ndarray, mean: float = None, variance: float = None):
+        self.probs = np.asarray(probs, dtype=np.float64)
+        moves = np.arange(len(self.probs))
+        self.mean = float((moves * self.probs).sum()) if mean is None else float(mean)
+        if variance is None:
+            variance = float((moves ** 2 * self.probs).sum()) - self.mean ** 2
+        self.variance = float(variance)
+
+    @property
+    def horizon(self) -> int:
+        return len(self.probs) - 1
+
+    @property
+    def tail(self) -> float:
+        """Probability of more than `horizon` moves."""
+        return max(1.0 - float(self.probs.sum()), 0.0)
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(max(self.variance, 0.0)))
+
+    def cdf(self, k: int) -> float:
+        """P(moves <= k)."""
+        return float(self.probs[:k + 1].sum())
+
+    def quantile(self, q: float) -> int:
+        """Smallest k with P(moves <= k) >= q, or horizon + 1 if that is beyond the horizon."""
+        return int(np.searchsorted(np.cumsum(self.probs), q - 1e-12))
+
+    def total(self, n_boards: int) -> 'MoveDistribution':
+        """Moves for `n_boards` boards in a row (the n-fold sum, via FFT)."""
+        length = n_boards * self.horizon + 1
+        spectrum = np.fft.rfft(self.probs, length) ** n_boards
+        probs = np.clip(np.fft.irfft(spectrum, length), 0.0, None)
+        return MoveDistribution(probs, n_boards * self.mean, n_boards * self.variance)
+
+    def draws_for(self, n_boards: int, confidence: float) -> int:
+        """Chest draws that finish `n_boards` boards with probability `confidence`."""
+        return self.total(n_boards).quantile(confidence)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "mean_moves": self.mean,
+            "std_moves": self.std,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "tail": self.tail,
+        }
+
+
+class DistributionTable:
+    """
+    Per-board results of an evaluation (dense arrays indexed by board;
+    a symmetric evaluation only fills orbit representatives). Full
+    distributions are kept for the boards asked for in `keep`.
+    """
+
+    def __init__(self, horizon: int, symmetric: bool, means: np.ndarray, variances: np.ndarray,
+                 tails: np.ndarray, kept: Dict[int, MoveDistribution], seconds: float):
+        self.horizon = horizon
+        self.symmetric = symmetric
+        self.means = means
+        self.variances = variances
+        self.tails = tails
+        self.kept = kept
+        self.seconds = seconds
+
+    def _index(self, board: int) -> int:
+        if self.symmetric:
+            return int(min(board, rotate_boards(np.array([board], dtype=np.uint32))[0]))
+        return board
+
+    def mean(self, board: int) -> float:
+        return float(self.means[self._index(board)])
+
+    def std(self, board: int) -> float:
+        return float(np.sqrt(self.variances[self._index(board)]))
+
+    def tail(self, board: int) -> float:
+        return float(self.tails[self._index(board)])
+
+    def distribution(self, board: int = INIT_STATE) -> MoveDistribution:
+        """Full distribution of a board passed in `keep`."""
+        return self.kept[self._index(board)]
+
+
+class _Layer(NamedTuple):
+    """Distributions of the (sorted) boards of one height, one row per board."""
+    boards: np.ndarray
+    probs: np.ndarray  # (boards x horizon + 1) float32
+
+
+def _score(probs: np.ndarray, quantile: float) -> np.ndarray:
+    """
+    Quantile of each row with its CDF as tie-break: `t + (1 - cdf(t))`
+    orders by the quantile t first, then by the mass already finished
+    at t. Rows that do not reach `quantile` get horizon + 1 + tail.
+    """
+    cdf = np.cumsum(probs, axis=1, dtype=np.float64)
+    reached = cdf >= quantile - 1e-9
+    t = np.where(reached.any(axis=1), reached.argmax(axis=1), probs.shape[1])
+    at = cdf[np.arange(len(probs)), np.minimum(t, probs.shape[1] - 1)]
+    return (t + (1.0 - at)).astype(np.float32)
+
+
+def _propagate(placed: np.ndarray, rows: np.ndarray, layers: Dict[int, "_Layer"],
+               heights: np.ndarray, means: np.ndarray, seconds: np.ndarray, horizon: int):
+    """
+    Distributions, means and second moments of a chunk of boards.
+    `placed[i, f]` says whether figure f is played on board i (else
+    skipped), `rows[i, f]` is the landing board of that placement.
+    """
+    n = len(placed)
+    pulled = np.zeros((n, horizon + 1), dtype=np.float32)
+    sum_mean = np.zeros(n)
+    sum_second = np.zeros(n)
+    for f_idx in range(TOTAL_FIGURES):
+        idx = np.flatnonzero(placed[:, f_idx])
+        if not len(idx):
+            continue
+        targets = rows[idx, f_idx]
+        layer = layers[heights[f_idx]]
+        pulled[idx] += layer.probs[_row_index(layer, targets)]
+        sum_mean[idx] += means[targets]
+        sum_second[idx] += seconds[targets]
+    pulled /= TOTAL_FIGURES
+
+    skip = (TOTAL_FIGURES - placed.sum(axis=1)) / TOTAL_FIGURES
+    probs = np.zeros((n, horizon + 1), dtype=np.float32)
+    skip32 = skip.astype(np.float32)
+    for k in range(1, horizon + 1):
+        probs[:, k] = pulled[:, k - 1] + skip32 * probs[:, k - 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (1.0 + sum_mean / TOTAL_FIGURES) / (1.0 - skip)
+        step_mean = sum_mean / TOTAL_FIGURES + skip * mean
+        second = (1.0 + 2.0 * step_mean + sum_second / TOTAL_FIGURES) / (1.0 - skip)
+    mean[skip >= 1.0] = np.inf
+    second[skip >= 1.0] = np.inf
+    return probs, mean, second
+
+
+def _row_index(layer: _Layer, boards: np.ndarray) -> np.ndarray:
+    return np.searchsorted(layer.boards, boards)
+
+
+def _run(policy, horizon: int, symmetric: bool, keep: Iterable[int], quantile: float,
+         on_height: Callable[[int, float], None], max_height: int):
+    """Shared layer loop of `evaluate_distribution` (policy given) and `risk_policy` (policy None)."""
+    start_time = time.perf_counter()
+    total = 1 << TOTAL_CELLS
+    means = np.full(total, np.nan)
+    seconds = np.full(total, np.nan)
+    tails = np.full(total, np.nan, dtype=np.float32)
+    scores = np.full(total, np.inf, dtype=np.float32) if policy is None else None
+    actions = np.full(total * TOTAL_FIGURES, SKIP_ACTION, dtype=np.uint8) if policy is None else None
+    reachable = np.zeros(total, dtype=np.bool_) if policy is None else None
+    keep = {int(min(b, rotate_boards(np.array([b], dtype=np.uint32))[0])) if symmetric else int(b)
+            for b in keep}
+    kept: Dict[int, MoveDistribution] = {}
+
+    terminal = np.zeros((1, horizon + 1), dtype=np.float32)
+    terminal[0, 0] = 1.0
+    layers: Dict[int, _Layer] = {0: _Layer(np.array([TERMINAL_STATE], dtype=np.uint32), terminal)}
+    means[TERMINAL_STATE] = seconds[TERMINAL_STATE] = tails[TERMINAL_STATE] = 0.0
+    if policy is None:
+        scores[TERMINAL_STATE] = 0.0
+        reachable[TERMINAL_STATE] = True
+    if TERMINAL_STATE in keep:
+        kept[TERMINAL_STATE] = MoveDistribution(terminal[0], 0.0, 0.0)
+
+    filled = filled_counts()
+    all_placements = [placements(f_idx) for f_idx in range(TOTAL_FIGURES)]
+    figures = np.arange(TOTAL_FIGURES)
+
+    def score_lookup(f_idx, targets):
+        cand = scores[targets]
+        found = np.isfinite(cand)
+        return found, cand[found]
+
+    for height in range(1, max_height + 1):
+        start = time.perf_counter()
+        boards = np.flatnonzero(filled == TOTAL_CELLS - height).astype(np.uint32)
+        if symmetric:
+            boards = boards[boards <= rotate_boards(boards)]
+        heights = np.maximum(height - _FIG_SIZES, 0)
+        layer_placements = [pairs if _FIG_SIZES[f_idx] <= height else []
+                            for f_idx, pairs in enumerate(all_placements)]
+        layer_probs = np.empty((len(boards), horizon + 1), dtype=np.float32)
+
+        for lo in range(0, len(boards), CHUNK):
+            chunk = boards[lo:lo + CHUNK]
+            n = len(chunk)
+            placed = np.zeros((n, TOTAL_FIGURES), dtype=np.bool_)
+            rows = np.zeros((n, TOTAL_FIGURES), dtype=np.uint32)
+            chosen = np.full((n, TOTAL_FIGURES), SKIP_ACTION, dtype=np.uint8)
+
+            if policy is not None:
+                for f_idx in range(TOTAL_FIGURES):
+                    act = np.asarray(policy.solve_many(chunk, np.full(n, f_idx, dtype=np.uint8)),
+                                     dtype=np.intp)
+                    masks = _PLACEMENT_MASKS[f_idx, act]
+                    play = act != SKIP_ACTION
+                    if ((masks == 0) & play).any() or ((chunk & masks) != 0).any():
+                        raise ValueError(f"policy plays an illegal action at height {height}")
+                    targets = chunk | masks
+                    if symmetric:
+                        targets = np.minimum(targets, rotate_boards(targets))
+                    placed[:, f_idx] = play
+                    rows[:, f_idx] = targets
+                    chosen[:, f_idx] = act
+            else:
+                # Best placement per figure: the landing board with the smallest
+                # score, by the DP's pull step; which figures to skip is chosen here
+                best, chosen, _ = pull_layer(chunk, layer_placements, score_lookup, symmetric,
+                                             skips=False, fill=np.inf)
+                rows = chunk[:, None] | _PLACEMENT_MASKS[figures, chosen]
+                if symmetric:
+                    rows = np.minimum(rows, rotate_boards(rows))
+                placed = _choose_skips(best, rows, layers, heights, horizon, quantile)
+                chosen[~placed] = SKIP_ACTION
+
+            probs, mean, second = _propagate(placed, rows, layers, heights, means, seconds, horizon)
+            layer_probs[lo:lo + n] = probs
+            means[chunk] = mean
+            seconds[chunk] = second
+            tails[chunk] = np.maximum(1.0 - probs.sum(axis=1, dtype=np.float64), 0.0)
+            if policy is None:
+                scores[chunk] = _score(probs, quantile)
+                reachable[chunk] = np.isfinite(mean)
+                actions.reshape(-1, TOTAL_FIGURES)[chunk] = chosen
+            for board in keep.intersection(chunk.tolist()):
+                i = int(np.searchsorted(chunk, board))
+                kept[board] = MoveDistribution(probs[i], mean[i], second[i] - mean[i] ** 2)
+
+        layers[height] = _Layer(boards, layer_probs)
+        layers.pop(height - MAX_FIGURE_SIZE, None)  # no later layer lands this far down
+        if on_height is not None:
+            on_height(height, time.perf_counter() - start)
+
+    with np.errstate(invalid="ignore"):
+        variances = seconds - means ** 2
+    table = DistributionTable(horizon, symmetric, means, variances, tails, kept,
+                              time.perf_counter() - start_time)
+    if policy is not None:
+        return table
+    return CompactPolicy.from_dense(actions, reachable, symmetric), table
+
+
+def _choose_skips(best: np.ndarray, rows: np.ndarray, layers: Dict[int, _Layer],
+                  heights: np.ndarray, horizon: int, quantile: float) -> np.ndarray:
+    """
+    Which figures to play (the rest are skipped): the prefix of the
+    figures sorted by their best score whose resulting distribution has
+    the smallest score, as `skip_dst` does for the mean.
+    """
+    n = len(best)
+    order = np.argsort(best, axis=1, kind="stable")
+    landing = np.zeros((n, TOTAL_FIGURES, horizon + 1), dtype=np.float32)
+    for f_idx in range(TOTAL_FIGURES):
+        idx = np.flatnonzero(np.isfinite(best[:, f_idx]))
+        layer = layers[heights[f_idx]]
+        landing[idx, f_idx] = layer.probs[_row_index(layer, rows[idx, f_idx])]
+
+    pulled = np.zeros((n, horizon + 1), dtype=np.float32)
+    best_score = np.full(n, np.inf, dtype=np.float32)
+    best_count = np.zeros(n, dtype=np.intp)
+    everyone = np.arange(n)
+    for count in range(1, TOTAL_FIGURES + 1):
+        f_idx = order[:, count - 1]
+        valid = np.isfinite(best[everyone, f_idx])
+        pulled += landing[everyone, f_idx] / TOTAL_FIGURES
+        skip = np.float32((TOTAL_FIGURES - count) / TOTAL_FIGURES)
+        probs = np.zeros((n, horizon + 1), dtype=np.float32)
+        for k in range(1, horizon + 1):
+            probs[:, k] = pulled[:, k - 1] + skip * probs[:, k - 1]
+        score = np.where(valid, _score(probs, quantile), np.inf)
+        better = score < best_score
+        best_score[better] = score[better]
+        best_count[better] = count
+
+    rank = np.argsort(order, axis=1)
+    return rank < best_count[:, None]
+
+
+def evaluate_distribution(policy, horizon: int = DEFAULT_HORIZON, symmetric: bool = False,
+                          keep: Iterable[int] = (INIT_STATE,),
+                          on_height: Callable[[int, float], None] = None,
+                          max_height: int = TOTAL_CELLS) -> DistributionTable:
+    """
+    Move-count distribution of every board under `policy` (anything with
+    `solve_many(boards, figures)`). Set `symmetric` only for policies
+    that play rotated boards the rotated way (symmetric `CompactPolicy`,
+    `Deterministic`): then one board per rotation orbit is evaluated.
+    With `max_height`, only the boards with at most that many empty
+    cells are evaluated (e.g. for a partial DP build).
+    """
+    return _run(policy, horizon, symmetric, keep, None, on_height, max_height)
+
+
+def risk_policy(quantile: float = 0.95, horizon: int = DEFAULT_HORIZON, symmetric: bool = True,
+                keep: Iterable[int] = (INIT_STATE,),
+                on_height: Callable[[int, float], None] = None,
+                max_height: int = TOTAL_CELLS) -> Tuple[CompactPolicy, DistributionTable]:
+    """
+    Policy that minimises the `quantile` of the moves left on each board
+    (up to `max_height` empty cells), and its distribution.
+    """
+    return _run(None, horizon, symmetric, keep, quantile, on_height, max_height)
+
+
+def dp_expectation(solver, board: int = INIT_STATE) -> float:
+    """The DP's expected moves left on `board` before a draw (needs a policy with values)."""
+    figures = np.arange(TOTAL_FIGURES)
+    return float(solver.values_many(np.full(TOTAL_FIGURES, board), figures).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON)
+    parser.add_argument("--risk", type=float, default=None, metavar="Q",
+                        help="build the policy minimising this quantile instead")
+    parser.add_argument("--save", default=None, help="write the risk policy artifact here")
+    parser.add_argument("--boards", type=int, default=100, help="boards to plan chest draws for")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    args = parser.parse_args()
+
+    report = lambda height, seconds: print(f"  Height {height}/{TOTAL_CELLS}: {seconds:.2f} s")
+    if args.risk is None:
+        from deterministic import get_solver
+        solver = get_solver(values=True)
+        table = evaluate_distribution(solver, args.horizon, solver.policy.symmetric, on_height=report)
+        print(f"DP expectation: {dp_expectation(solver):.6g}")
+    else:
+        policy, table = risk_policy(args.risk, args.horizon, on_height=report)
+        if args.save:
+            policy.save(args.save)
+            print(f"Saved {args.save} ({policy.artifact_size / 2**20:.1f} MB)")
+
+    root = table.distribution(INIT_STATE)
+    print(f"Evaluated in {table.seconds:.1f} s")
+    for key, value in root.summary().items():
+        print(f"{key:>14}: {value:.6g}" if isinstance(value, float) else f"{key:>14}: {value}")
+    draws = root.draws_for(args.boards, args.confidence)
+    print(f"{args.boards} boards with {args.confidence:.0%} confidence: {draws} chest draws "
+          f"(mean {args.boards * root.mean:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Generalized DP solver for arbitrary board sizes and piece sets.
+
+Unlike `Deterministic`, nothing here is tied to the 4x6 board or the
+fixed FIGURES list: placements and bitmasks are derived from a
+`BoardSpec` and a list of `Piece` shapes, and the DP only keeps the
+boards that can actually reach the full board, stored as sorted
+per-layer arrays. Memory therefore scales with the reachable states
+instead of 2^cells, which makes larger event boards (e.g. 5x6) possible.
+
+Board encoding matches `Jigsaw`: cell (x, y) (column, row) is bit
+`cells - 1 - (x * rows + y)`, and an action is the `x * rows + y` offset
+of the piece's top-left corner, with `cells` meaning skip.
+"""
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from jigsaw import Figure
+from solver import Solver
+from deterministic import INF, board_values_numpy, pull_layer, sorted_lookup
+
+MAX_CELLS = 63  # boards are stored as uint64
+
+
+@dataclass(frozen=True)
+class BoardSpec:
+    """Board dimensions."""
+    rows: int
+    cols: int
+
+    @property
+    def cells(self) -> int:
+        return self.rows * self.cols
+
+    @property
+    def full(self) -> int:
+        """Board with every cell filled."""
+        return (1 << self.cells) - 1
+
+    def bit(self, x: int, y: int) -> int:
+        """Bitmask of the cell in column x, row y."""
+        return 1 << (self.cells - 1 - (x * self.rows + y))
+
+
+@dataclass(frozen=True)
+class Piece:
+    """A piece shape as (x, y) cell offsets from its top-left corner."""
+    cells: Tuple[Tuple[int, int], ...]
+
+    @property
+    def size(self) -> int:
+        return len(self.cells)
+
+    @property
+    def width(self) -> int:
+        return max(x for x, _ in self.cells) + 1
+
+    @property
+    def height(self) -> int:
+        return max(y for _, y in self.cells) + 1
+
+
+@dataclass
+class _Layer:
+    """All reachable boards with the same number of empty cells."""
+    boards: np.ndarray   # sorted uint64
+    dsts: np.ndarray     # (boards x pieces) float32
+    actions: np.ndarray  # (boards x pieces) uint8
+
+
+def pieces_from_figures(figures: Sequence[Figure], spec: BoardSpec) -> List[Piece]:
+    """Convert `Figure` bitmasks (placed at offset 0) into piece shapes."""
+    pieces = []
+    for figure in figures:
+        cells = tuple(
+            divmod(p, spec.rows) for p in range(spec.cells)
+            if figure.value & (1 << (spec.cells - 1 - p))
+        )
+        pieces.append(Piece(cells))
+    return pieces
+
+
+class GeneralSolver(Solver):
+    """
+    Optimal policy for any board spec and piece list, with a sparse
+    reachable-only state store. For the default 4x6 board and FIGURES it
+    produces the same table as `Deterministic(symmetric=False)`.
+    """
+
+    def __init__(self, spec: BoardSpec, pieces: Sequence[Piece],
+                 on_height: Callable[[int, float], None] = None):
+        if spec.cells > MAX_CELLS:
+            raise ValueError(f"boards with more than {MAX_CELLS} cells are not supported")
+        for piece in pieces:
+            if piece.width > spec.cols or piece.height > spec.rows:
+                raise ValueError(f"piece {piece.cells} does not fit on the board")
+
+        self.spec = spec
+        self.pieces = list(pieces)
+        self.skip_action = spec.cells
+        self.placements = [self._placements(piece) for piece in self.pieces]
+        self.layers: List[_Layer] = []
+        self.on_height = on_height
+        self.height_times: List[float] = []
+
+    def _placements(self, piece: Piece) -> List[Tuple[int, np.uint64]]:
+        """(action, mask) for every in-bounds placement, highest action first."""
+        result = []
+        for x in range(self.spec.cols - piece.width + 1):
+            for y in range(self.spec.rows - piece.height + 1):
+                mask = 0
+                for dx, dy in piece.cells:
+                    mask |= self.spec.bit(x + dx, y + dy)
+                result.append((x * self.spec.rows + y, np.uint64(mask)))
+        result.sort(key=lambda placement: -placement[0])
+        return result
+
+    @property
+    def n_states(self) -> int:
+        """Number of stored (reachable) boards."""
+        return sum(len(layer.boards) for layer in self.layers)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the state store."""
+        return sum(layer.boards.nbytes + layer.dsts.nbytes + layer.actions.nbytes
+                   for layer in self.layers)
+
+    def run(self, max_height: int = None):
+        """
+        Run the layered DP from the full board down to the empty board, or
+        only up to `max_height` empty cells. Like `Deterministic.build`, the
+        seconds spent on each height end up in `height_times` and are
+        passed to `on_height(height, seconds)`.
+        """
+        max_height = self.spec.cells if max_height is None else max_height
+        self.height_times = []
+        n_pieces = len(self.pieces)
+        max_size = max(piece.size for piece in self.pieces)
+
+        # Terminal state: full board, nothing left to do
+        self.layers = [_Layer(
+            boards=np.array([self.spec.full], dtype=np.uint64),
+            dsts=np.zeros((1, n_pieces), dtype=np.float32),
+            actions=np.full((1, n_pieces), self.skip_action, dtype=np.uint8),
+        )]
+        values = {0: board_values_numpy(self.layers[0].dsts)}
+
+        for height in range(1, max_height + 1):
+            start = time.perf_counter()
+            boards = self._generate_layer(height)
+            layer_placements = [
+                pairs if piece.size <= height and len(self.layers[height - piece.size].boards) else []
+                for piece, pairs in zip(self.pieces, self.placements)]
+
+            def lookup(f_idx, targets):
+                lower = height - self.pieces[f_idx].size
+                return sorted_lookup(self.layers[lower].boards, values[lower], targets)
+
+            best, best_actions, _ = pull_layer(boards, layer_placements, lookup,
+                                               skip_action=self.skip_action)
+            self.layers.append(_Layer(boards, best, best_actions))
+            values[height] = board_values_numpy(best)
+            values.pop(height - max_size, None)
+
+            self.height_times.append(time.perf_counter() - start)
+            if self.on_height is not None:
+                self.on_height(height, self.height_times[-1])
+
+    def _generate_layer(self, height: int) -> np.ndarray:
+        """Sorted boards of a layer: remove one placement from a lower layer's boards."""
+        parts = [np.empty(0, dtype=np.uint64)]
+        for f_idx, piece in enumerate(self.pieces):
+            if piece.size > height:
+                continue
+            sources = self.layers[height - piece.size].boards
+            for _, mask in self.placements[f_idx]:
+                parts.append(sources[(sources & mask) == mask] ^ mask)
+        return np.unique(np.concatenate(parts))
+
+    def _find(self, board: int) -> Tuple[_Layer, int]:
+        """Layer and row of a board, or (layer, -1) if it is not reachable (or not built)."""
+        height = self.spec.cells - bin(board).count("1")
+        if height >= len(self.layers):
+            return None, -1
+        layer = self.layers[height]
+        pos = int(np.searchsorted(layer.boards, np.uint64(board)))
+        if pos < len(layer.boards) and int(layer.boards[pos]) == board:
+            return layer, pos
+        return layer, -1
+
+    def action(self, board: int, f_idx: int) -> int:
+        """Optimal action for a board with piece `f_idx` in hand."""
+        layer, pos = self._find(board)
+        if pos < 0:
+            return self.skip_action
+        return int(layer.actions[pos, f_idx])
+
+    def value(self, board: int, f_idx: int) -> float:
+        """Expected remaining moves, or INF if the board cannot be completed (or was not built)."""
+        layer, pos = self._find(board)
+        if pos < 0:
+            return float(INF)
+        return float(layer.dsts[pos, f_idx])
+
+    def solve(self, game) -> int:
+        """Get the optimal action for a game using the same board encoding."""
+        return self.action(game.board, game.figure)
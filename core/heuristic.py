@@ -0,0 +1,127 @@
+"""
+Fast heuristic solver for the jigsaw puzzle.
+Needs no precomputed table, so the bot can start playing while the
+optimal `Deterministic` policy is still being built or loaded.
+"""
+import time
+from typing import Dict, Tuple
+
+from jigsaw import (FIGURE_OFFSETS, FIGURES, M, N, Jigsaw, PLACEMENT_MASKS, SKIP_ACTION,
+                    TERMINAL_STATE, TOTAL_CELLS, legal_mask)
+from solver import Solver
+
+# Leaf estimate of the expected remaining moves. The empty cell and
+# adjacency weights are a least squares fit against the optimal board
+# values; the single-only weight was tuned by simulated play (larger
+# values make the search skip too eagerly). Adjacent empty cells are
+# cheaper to fill because the bigger figures fit there.
+EMPTY_CELL_COST = 1.5
+ADJACENCY_COST = -0.62
+SINGLE_ONLY_COST = 2.0
+OPEN_BOARD_COST = 1.8
+
+# Cells in the bottom row, which have no empty neighbour below them
+_BOTTOM_ROW = sum(1 << (TOTAL_CELLS - 1 - (x * N + N - 1)) for x in range(M))
+
+
+def single_only_cells(board: int) -> int:
+    """Empty cells that no figure larger than one cell can still cover."""
+    covered = 0
+    for f_idx in range(1, len(FIGURES)):
+        legal = legal_mask(board, f_idx)
+        for offset in FIGURE_OFFSETS[f_idx]:
+            covered |= legal >> offset
+    return ~board & TERMINAL_STATE & ~covered
+
+
+def estimate(board: int) -> float:
+    """Heuristic expected number of moves left to fill the board."""
+    if board == TERMINAL_STATE:
+        return 0.0
+    empty = ~board & TERMINAL_STATE
+    # Pairs of empty cells next to each other, vertically and horizontally
+    adjacent = (bin(empty & (empty << 1) & ~_BOTTOM_ROW).count("1")
+                + bin(empty & (empty << N) & TERMINAL_STATE).count("1"))
+    single = bin(single_only_cells(board)).count("1")
+    return (EMPTY_CELL_COST * bin(empty).count("1") + ADJACENCY_COST * adjacent
+            + SINGLE_ONLY_COST * single + OPEN_BOARD_COST)
+
+
+class HeuristicSolver(Solver):
+    """
+    Depth-limited expectimax over `Jigsaw` with `estimate` at the leaves.
+    A depth of 1 looks at the figure in hand only; every extra level
+    averages over the next random figure.
+
+    With a `time_budget` (seconds) the search deepens iteratively up to
+    `depth` and answers with the deepest search that finished in time.
+    """
+
+    def __init__(self, depth: int = 2, time_budget: float = None):
+        self.depth = depth
+        self.time_budget = time_budget
+        self._estimates: Dict[int, float] = {}
+        self._values: Dict[Tuple[int, int], float] = {}
+        self._deadline = None
+
+    def _estimate(self, board: int) -> float:
+        value = self._estimates.get(board)
+        if value is None:
+            if len(self._estimates) > 1 << 20:
+                self._estimates.clear()
+            value = self._estimates[board] = estimate(board)
+        return value
+
+    def _value(self, board: int, depth: int) -> float:
+        """Expected remaining moves of a board before the next figure is drawn."""
+        if depth == 0 or board == TERMINAL_STATE:
+            return self._estimate(board)
+        key = (board, depth)
+        value = self._values.get(key)
+        if value is None:
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise TimeoutError
+            value = sum(self._best(board, f_idx, depth)[0]
+                        for f_idx in range(len(FIGURES))) / len(FIGURES)
+            self._values[key] = value
+        return value
+
+    def _best(self, board: int, f_idx: int, depth: int) -> Tuple[float, int]:
+        """(expected moves, action) of the best move with figure `f_idx` in hand."""
+        best_cost = 1.0 + self._value(board, depth - 1)
+        best_action = SKIP_ACTION
+
+        mask = legal_mask(board, f_idx)
+        while mask:
+            top = mask.bit_length() - 1
+            mask ^= 1 << top
+            action = TOTAL_CELLS - 1 - top
+            cost = 1.0 + self._value(board | PLACEMENT_MASKS[f_idx][action], depth - 1)
+            if cost <= best_cost:
+                best_cost, best_action = cost, action
+        return best_cost, best_action
+
+    def action(self, board: int, f_idx: int) -> int:
+        """Best action found for a board with figure `f_idx` in hand."""
+        if board == TERMINAL_STATE:
+            return SKIP_ACTION
+        self._values.clear()
+        if self.time_budget is None:
+            return self._best(board, f_idx, self.depth)[1]
+
+        # Iterative deepening: depth 1 always completes, deeper searches
+        # only count if they finish before the deadline
+        self._deadline = time.perf_counter() + self.time_budget
+        best_action = SKIP_ACTION
+        try:
+            for depth in range(1, self.depth + 1):
+                best_action = self._best(board, f_idx, depth)[1]
+        except TimeoutError:
+            pass
+        finally:
+            self._deadline = None
+        return best_action
+
+    def solve(self, game: Jigsaw) -> int:
+        """Get the best action found for the current game state."""
+        return self.action(game.board, game.figure)
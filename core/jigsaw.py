@@ -60,12 +60,61 @@ FIGURES: List[Figure] = [
 ]
 
 
+def _placement_masks(figure: Figure) -> List[int]:
+    """Board cells covered by the figure for every action (0 if out of bounds or skip)."""
+    masks = []
+    for action in range(TOTAL_ACTIONS):
+        x_offset, y_offset = action >> 2, action & 0b11
+        in_bounds = (action != SKIP_ACTION
+                     and x_offset <= figure.max_offset[0]
+                     and y_offset <= figure.max_offset[1])
+        masks.append(figure.value >> action if in_bounds else 0)
+    return masks
+
+
+def _action_bit(action: int) -> int:
+    """Bit of an action in a legal-move mask (same order as board cells)."""
+    return (1 << (TOTAL_CELLS - 1)) >> action
+
+
+# PLACEMENT_MASKS[f][a]: cells filled by placing figure f at action a
+PLACEMENT_MASKS: List[List[int]] = [_placement_masks(f) for f in FIGURES]
+
+# FIGURE_OFFSETS[f]: cells of figure f as offsets from its placement
+# action (the first is 0), so action a covers cells a + offset
+FIGURE_OFFSETS: List[Tuple[int, ...]] = [
+    tuple(TOTAL_CELLS - 1 - bit for bit in range(TOTAL_CELLS - 1, -1, -1) if f.value >> bit & 1)
+    for f in FIGURES
+]
+# Per figure: the legal-move bits of all in-bounds placements
+_IN_BOUNDS: List[int] = [
+    sum(_action_bit(a) for a in range(TOTAL_CELLS) if masks[a]) for masks in PLACEMENT_MASKS
+]
+
+
+def legal_mask(board: int, f_idx: int) -> int:
+    """
+    Legal placements of figure `f_idx` as a bitmask (bit of action a is
+    `(1 << 23) >> a`; skip is always legal and not included).
+    A placement is legal when every cell it covers is empty: shifting the
+    empty-cell mask by each cell offset and AND-ing the results checks all
+    24 placements at once.
+    """
+    legal = ~board & TERMINAL_STATE
+    empty = legal
+    for offset in FIGURE_OFFSETS[f_idx][1:]:
+        legal &= empty << offset
+    return legal & _IN_BOUNDS[f_idx]
+
+
 class Jigsaw:
     """
     Represents the state of a jigsaw puzzle game.
     The board is a 4x6 grid represented as a 24-bit integer.
     """
     
+    __slots__ = ("board", "figure", "round")
+    
     def __init__(self, board: int = INIT_STATE, figure: int = 0, round_num: int = 0):
         self.board = board
         self.figure = figure
@@ -92,9 +141,25 @@ class Jigsaw:
         """
         if action != SKIP_ACTION:
             assert self.is_legal(action), f"Illegal action: {action}"
-            self.board |= self.get_figure().value >> action
+            self.board |= PLACEMENT_MASKS[self.figure][action]
         self.round += 1
     
+    def make(self, action: int) -> int:
+        """
+        Perform an action in place without any checks and return the cells
+        it filled; pass that to `unmake` to take the move back. Lets search
+        code walk the game tree without cloning states.
+        """
+        placed = PLACEMENT_MASKS[self.figure][action]
+        self.board |= placed
+        self.round += 1
+        return placed
+    
+    def unmake(self, placed: int):
+        """Undo a move made with `make`."""
+        self.board ^= placed
+        self.round -= 1
+    
     def get_figure(self) -> Figure:
         """Get the current figure."""
         return FIGURES[self.figure]
@@ -119,22 +184,24 @@ class Jigsaw:
         if action == SKIP_ACTION:
             return True
         
-        x_offset, y_offset = Jigsaw.action_to_offsets(action)
-        assert x_offset < M and y_offset < N
-        
-        figure = self.get_figure()
-        
-        # Check bounds and overlap
-        illegal = False
-        illegal |= x_offset > figure.max_offset[0]
-        illegal |= y_offset > figure.max_offset[1]
-        illegal |= (self.board & (figure.value >> (x_offset * N + y_offset))) != 0
-        
-        return not illegal
+        # Out-of-bounds placements have an empty mask
+        placed = PLACEMENT_MASKS[self.figure][action]
+        return placed != 0 and (self.board & placed) == 0
+    
+    def legal_mask(self) -> int:
+        """Legal placements as a bitmask (see `legal_mask`)."""
+        return legal_mask(self.board, self.figure)
     
     def legal_actions(self) -> List[int]:
         """Get all legal actions for the current state."""
-        return [a for a in range(TOTAL_ACTIONS) if self.is_legal(a)]
+        mask = legal_mask(self.board, self.figure)
+        actions = []
+        while mask:
+            top = mask.bit_length() - 1
+            actions.append(TOTAL_CELLS - 1 - top)
+            mask ^= 1 << top
+        actions.append(SKIP_ACTION)
+        return actions
     
     @staticmethod
     def action_to_offsets(action: int) -> Tuple[int, int]:
@@ -160,6 +227,7 @@ class Jigsaw:
     def __repr__(self) -> str:
         """Debug representation of the game state."""
         lines = [f"<--------Round {self.round}-------->"]
+        legal = self.legal_mask()
         
         for i in range(N):
             row = ""
@@ -170,7 +238,7 @@ class Jigsaw:
                 
                 if value:
                     row += "🟥"
-                elif self.is_legal(action):
+                elif legal & _action_bit(action):
                     row += "🟩"
                 else:
                     row += "🟨"
@@ -202,3 +270,35 @@ def is_possible(board: int, figure: Figure, x_offset: int, y_offset: int) -> boo
     illegal |= (board | shifted_figure) != board
     
     return not illegal
+
+
+def rotate_board(board: int) -> int:
+    """
+    Rotate a board by 180 degrees.
+    Cell (x, y) maps to (M-1-x, N-1-y), i.e. the 24 cell bits are reversed.
+    """
+    return int(f"{board:0{TOTAL_CELLS}b}"[::-1], 2)
+
+
+def _rotated_figure(f_idx: int) -> int:
+    """Index of the figure that a 180 degree rotation turns FIGURES[f_idx] into."""
+    figure = FIGURES[f_idx]
+    rotated = rotate_board(figure.value)
+    for i, other in enumerate(FIGURES):
+        # A figure at offset (0, 0) rotates into its image at the max offset
+        if other.value >> Jigsaw.offset_to_action(other.max_offset) == rotated:
+            return i
+    raise ValueError(f"Figure {f_idx} has no rotated counterpart")
+
+
+# Figure permutation under a 180 degree rotation (L and reverse L swap)
+ROTATED_FIGURES: List[int] = [_rotated_figure(i) for i in range(len(FIGURES))]
+
+
+def rotate_action(action: int, f_idx: int) -> int:
+    """Map a placement of figure `f_idx` onto the rotated board."""
+    if action == SKIP_ACTION:
+        return SKIP_ACTION
+    x_offset, y_offset = Jigsaw.action_to_offsets(action)
+    max_x, max_y = FIGURES[f_idx].max_offset
+    return Jigsaw.offset_to_action((max_x - x_offset, max_y - y_offset))
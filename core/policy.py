@@ -0,0 +1,341 @@
+"""
+Compact runtime policy table.
+Stores the optimal action only for boards the DP marked reachable.
+
+Boards are indexed through a rank/select bitmap over all 2^24 boards, and
+the six per-figure actions of a board are bit-packed into 5 bits each,
+so a whole board fits into a single uint32 row. A symmetric table stores
+only one board per 180 degree rotation orbit and rotates the others in.
+The expected distances can optionally be stored next to the actions.
+
+The table can be saved as an uncompressed, versioned artifact that is
+served straight from `np.memmap`, so loading it costs milliseconds and
+only the rows that actually get looked up are paged in.
+"""
+import os
+import struct
+import numpy as np
+
+from jigsaw import (
+    Jigsaw, INIT_STATE, SKIP_ACTION, TOTAL_ACTIONS, TOTAL_CELLS, TOTAL_FIGURES,
+    ROTATED_FIGURES, rotate_action, rotate_board
+)
+
+ACTION_BITS = 5
+ACTION_MASK = (1 << ACTION_BITS) - 1
+WORD_BITS = 64
+
+assert TOTAL_FIGURES * ACTION_BITS <= 32, "packed row must fit into uint32"
+
+# Artifact layout: fixed header, then 64-byte aligned sections
+#   magic, version, cells, figures, action bits, flags, n_words, n_rows,
+#   bitmap offset, ranks offset, packed offset, values offset (0 if absent)
+ARTIFACT_MAGIC = b"JIGPOLCY"
+ARTIFACT_VERSION = 3
+FLAG_SYMMETRIC = 1
+_HEADER = struct.Struct("<8sIIIIIQQQQQQ")
+_ALIGN = 64
+
+_ROTATED_FIGURES_NP = np.array(ROTATED_FIGURES, dtype=np.intp)
+
+# _ROTATED_ACTIONS[f, a]: placement a of figure f seen on the rotated board
+# (out-of-range placements never occur in a policy and map to skip)
+_ROTATED_ACTIONS = np.array(
+    [[rotate_action(a, f) if Jigsaw(INIT_STATE, f).is_legal(a) else SKIP_ACTION
+      for a in range(TOTAL_ACTIONS)] for f in range(TOTAL_FIGURES)],
+    dtype=np.uint8,
+)
+
+
+class ArtifactError(Exception):
+    """Raised when a policy artifact is missing, corrupt or incompatible."""
+
+
+class CompactPolicy:
+    """
+    Read-only (board, figure) -> action table without dense arrays.
+
+    bitmap: uint64 words, bit `b` set if board `b` is reachable
+    ranks:  uint32 per word, number of reachable boards before that word
+    packed: uint32 per reachable board, action of figure i at bits [5i, 5i+5)
+    values: optional (reachable x figures) float32 expected distances
+    symmetric: only boards with board <= rotate_board(board) are stored
+    """
+
+    def __init__(self, bitmap: np.ndarray, ranks: np.ndarray, packed: np.ndarray,
+                 symmetric: bool = False, values: np.ndarray = None):
+        self.bitmap = bitmap
+        self.ranks = ranks
+        self.packed = packed
+        self.values = values
+        self.symmetric = symmetric
+
+    @classmethod
+    def from_dense(cls, actions: np.ndarray, reachable: np.ndarray,
+                   symmetric: bool = False, dsts: np.ndarray = None) -> 'CompactPolicy':
+        """
+        Build the compact table from a dense actions array and a reachable mask.
+        For a symmetric table the mask must only cover orbit representatives.
+        Pass the dense `dsts` to keep the expected distances as well.
+        """
+        reachable = np.ascontiguousarray(reachable, dtype=np.bool_)
+        bitmap = np.packbits(reachable, bitorder='little').view(np.uint64)
+        counts = _popcount64(bitmap)
+        ranks = np.zeros(len(bitmap), dtype=np.uint32)
+        np.cumsum(counts[:-1], out=ranks[1:])
+
+        # Pack one figure at a time to avoid a (reachable x figures) temporary
+        packed = np.zeros(int(counts.sum()), dtype=np.uint32)
+        for f_idx in range(TOTAL_FIGURES):
+            column = actions[f_idx::TOTAL_FIGURES][reachable].astype(np.uint32)
+            packed |= column << np.uint32(f_idx * ACTION_BITS)
+        
+        values = None
+        if dsts is not None:
+            values = dsts.reshape(-1, TOTAL_FIGURES)[reachable]
+        return cls(bitmap, ranks, packed, symmetric, values)
+
+    def __len__(self) -> int:
+        """Number of stored (reachable) boards."""
+        return len(self.packed)
+
+    @property
+    def nbytes(self) -> int:
+        """Total memory used by the table."""
+        total = self.bitmap.nbytes + self.ranks.nbytes + self.packed.nbytes
+        if self.values is not None:
+            total += self.values.nbytes
+        return total
+
+    def rank(self, board: int) -> int:
+        """Row of `board` in `packed`, or -1 if the board is not stored."""
+        word = int(self.bitmap[board >> 6])
+        bit = board & (WORD_BITS - 1)
+        if not (word >> bit) & 1:
+            return -1
+        return int(self.ranks[board >> 6]) + _popcount(word & ((1 << bit) - 1))
+
+    def action(self, board: int, f_idx: int) -> int:
+        """Optimal action for a board with figure `f_idx` in hand."""
+        if self.symmetric:
+            rotated = rotate_board(board)
+            if rotated < board:
+                f_rot = ROTATED_FIGURES[f_idx]
+                return rotate_action(self._stored_action(rotated, f_rot), f_rot)
+        return self._stored_action(board, f_idx)
+
+    def _stored_action(self, board: int, f_idx: int) -> int:
+        row = self.rank(board)
+        if row < 0:
+            return SKIP_ACTION
+        return (int(self.packed[row]) >> (f_idx * ACTION_BITS)) & ACTION_MASK
+
+    def value(self, board: int, f_idx: int) -> float:
+        """Expected remaining moves for a board with figure `f_idx` in hand."""
+        if self.values is None:
+            raise ValueError("policy was stored without values")
+        if self.symmetric:
+            rotated = rotate_board(board)
+            if rotated < board:
+                board, f_idx = rotated, ROTATED_FIGURES[f_idx]
+        row = self.rank(board)
+        return float(self.values[row, f_idx]) if row >= 0 else float("inf")
+
+    def solve(self, game: Jigsaw) -> int:
+        """Get the optimal action for the current game state."""
+        return self.action(game.board, game.figure)
+
+    def _rows_many(self, boards: np.ndarray, figures: np.ndarray):
+        """
+        Vectorized lookup of stored rows.
+        Returns (rows, present, flipped, stored figure indices); rows of
+        boards that are not stored are 0 and must be masked with `present`.
+        """
+        boards = np.asarray(boards, dtype=np.uint32)
+        figures = np.asarray(figures, dtype=np.intp)
+        flipped = np.zeros(boards.shape, dtype=np.bool_)
+        if self.symmetric:
+            rotated = rotate_boards(boards)
+            flipped = rotated < boards
+            boards = np.where(flipped, rotated, boards)
+            figures = np.where(flipped, _ROTATED_FIGURES_NP[figures], figures)
+
+        words = self.bitmap[boards >> 6]
+        bits = (boards & (WORD_BITS - 1)).astype(np.uint64)
+        present = ((words >> bits) & np.uint64(1)).astype(np.bool_)
+        below = words & ((np.uint64(1) << bits) - np.uint64(1))
+        rows = self.ranks[boards >> 6].astype(np.intp) + _popcount64(below)
+        rows[~present] = 0
+        return rows, present, flipped, figures
+
+    def solve_many(self, boards: np.ndarray, figures: np.ndarray) -> np.ndarray:
+        """Optimal actions (uint8) for arrays of boards and figure indices."""
+        rows, present, flipped, figures = self._rows_many(boards, figures)
+        if len(self.packed) == 0:
+            return np.full(rows.shape, SKIP_ACTION, dtype=np.uint8)
+        shifts = (figures * ACTION_BITS).astype(np.uint32)
+        actions = ((self.packed[rows] >> shifts) & np.uint32(ACTION_MASK)).astype(np.uint8)
+        actions[flipped] = _ROTATED_ACTIONS[figures[flipped], actions[flipped]]
+        actions[~present] = SKIP_ACTION
+        return actions
+
+    def values_many(self, boards: np.ndarray, figures: np.ndarray) -> np.ndarray:
+        """Expected remaining moves (float32) for arrays of boards and figure indices."""
+        if self.values is None:
+            raise ValueError("policy was stored without values")
+        rows, present, _, figures = self._rows_many(boards, figures)
+        if len(self.values) == 0:
+            return np.full(rows.shape, np.inf, dtype=np.float32)
+        values = self.values[rows, figures]
+        values[~present] = np.inf
+        return values
+
+    def _layout(self):
+        """Header, (offset, array) sections and total size of the artifact."""
+        bitmap_off = _align(_HEADER.size)
+        ranks_off = _align(bitmap_off + self.bitmap.nbytes)
+        packed_off = _align(ranks_off + self.ranks.nbytes)
+        sections = [(bitmap_off, self.bitmap), (ranks_off, self.ranks), (packed_off, self.packed)]
+        values_off = 0
+        size = packed_off + self.packed.nbytes
+        if self.values is not None:
+            values_off = _align(size)
+            sections.append((values_off, self.values.astype(np.float32)))
+            size = values_off + self.values.size * 4
+        header = _HEADER.pack(
+            ARTIFACT_MAGIC, ARTIFACT_VERSION, TOTAL_CELLS, TOTAL_FIGURES, ACTION_BITS,
+            FLAG_SYMMETRIC if self.symmetric else 0, len(self.bitmap), len(self.packed),
+            bitmap_off, ranks_off, packed_off, values_off,
+        )
+        return header, sections, size
+
+    @property
+    def artifact_size(self) -> int:
+        """Bytes the artifact layout takes (see `save` / `write_into`)."""
+        return self._layout()[2]
+
+    def save(self, filepath: str):
+        """Write the table as an uncompressed artifact (atomically replaced)."""
+        header, sections, _ = self._layout()
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for offset, array in sections:
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, filepath)
+
+    def write_into(self, buffer):
+        """Write the artifact layout into a writable buffer of at least `artifact_size` bytes."""
+        header, sections, size = self._layout()
+        data = np.frombuffer(buffer, dtype=np.uint8, count=size)
+        data[:] = 0
+        data[:len(header)] = np.frombuffer(header, dtype=np.uint8)
+        for offset, array in sections:
+            raw = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+            data[offset:offset + len(raw)] = raw
+
+    @classmethod
+    def load(cls, filepath: str) -> 'CompactPolicy':
+        """Map an artifact read-only; no data is read until it is looked up."""
+        with open(filepath, "rb") as f:
+            raw = f.read(_HEADER.size)
+        if len(raw) != _HEADER.size:
+            raise ArtifactError(f"truncated header in {filepath}")
+        return cls.from_buffer(np.memmap(filepath, dtype=np.uint8, mode="r"), filepath)
+
+    @classmethod
+    def from_buffer(cls, data: np.ndarray, source: str = "buffer") -> 'CompactPolicy':
+        """
+        View an artifact held in a uint8 array (a file mapping, shared
+        memory, ...) without copying it. `source` names it in errors.
+        """
+        if len(data) < _HEADER.size:
+            raise ArtifactError(f"truncated header in {source}")
+        (magic, version, cells, figures, action_bits, flags,
+         n_words, n_rows, bitmap_off, ranks_off, packed_off, values_off) = _HEADER.unpack(
+            data[:_HEADER.size].tobytes())
+        if magic != ARTIFACT_MAGIC:
+            raise ArtifactError(f"not a policy artifact: {source}")
+        if version != ARTIFACT_VERSION:
+            raise ArtifactError(f"unsupported artifact version {version}")
+        if (cells, figures, action_bits) != (TOTAL_CELLS, TOTAL_FIGURES, ACTION_BITS):
+            raise ArtifactError(f"artifact built for {cells} cells / {figures} figures")
+        if n_words * WORD_BITS != 1 << TOTAL_CELLS:
+            raise ArtifactError(f"bitmap has {n_words} words")
+
+        values_size = n_rows * TOTAL_FIGURES * 4
+        end = values_off + values_size if values_off else packed_off + n_rows * 4
+        if len(data) < end:
+            raise ArtifactError(f"truncated artifact {source}")
+        bitmap = data[bitmap_off:bitmap_off + n_words * 8].view(np.uint64)
+        ranks = data[ranks_off:ranks_off + n_words * 4].view(np.uint32)
+        packed = data[packed_off:packed_off + n_rows * 4].view(np.uint32)
+        values = None
+        if values_off:
+            values = data[values_off:values_off + values_size].view(np.float32)
+            values = values.reshape(-1, TOTAL_FIGURES)
+        return cls(bitmap, ranks, packed, bool(flags & FLAG_SYMMETRIC), values)
+
+    def unpack(self) -> np.ndarray:
+        """Expand back into a dense (2^24 * figures) uint8 actions array."""
+        actions = np.full((1 << TOTAL_CELLS) * TOTAL_FIGURES, SKIP_ACTION, dtype=np.uint8)
+        reachable = np.unpackbits(self.bitmap.view(np.uint8), bitorder='little').view(np.bool_)
+        for f_idx in range(TOTAL_FIGURES):
+            column = (self.packed >> np.uint32(f_idx * ACTION_BITS)) & np.uint32(ACTION_MASK)
+            actions[f_idx::TOTAL_FIGURES][reachable] = column
+        
+        if self.symmetric:
+            # Fill the other half of every orbit from its representative
+            boards = np.arange(1 << TOTAL_CELLS, dtype=np.uint32)
+            rotated = rotate_boards(boards)
+            others = boards[rotated < boards]
+            sources = rotated[others]
+            for f_idx in range(TOTAL_FIGURES):
+                f_rot = ROTATED_FIGURES[f_idx]
+                stored = actions[sources.astype(np.int64) * TOTAL_FIGURES + f_rot]
+                actions[others.astype(np.int64) * TOTAL_FIGURES + f_idx] = _ROTATED_ACTIONS[f_rot, stored]
+        return actions
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+# Bit-reversal of a byte; three lookups rotate a 24-bit board by 180 degrees
+REVERSED_BYTES = np.array([int(f"{i:08b}"[::-1], 2) for i in range(256)], dtype=np.uint32)
+
+
+def rotate_boards(boards: np.ndarray) -> np.ndarray:
+    """Vectorized 180 degree rotation of uint32 boards."""
+    return ((REVERSED_BYTES[boards & 0xFF] << 16)
+            | (REVERSED_BYTES[(boards >> 8) & 0xFF] << 8)
+            | REVERSED_BYTES[boards >> 16])
+
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount_bin(word: int) -> int:
+    """Popcount of a non-negative int on any Python version."""
+    return bin(word).count('1')
+
+
+def _popcount64_table(words: np.ndarray) -> np.ndarray:
+    """Per-element popcount of a uint64 array through a byte table, on any NumPy."""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _POPCOUNT8[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint32)
+
+
+# Native popcounts where available, the fallbacks above otherwise
+if hasattr(int, "bit_count"):  # Python >= 3.10
+    _popcount = int.bit_count
+else:
+    _popcount = _popcount_bin
+
+if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+    def _popcount64(words: np.ndarray) -> np.ndarray:
+        """Per-element popcount of a uint64 array."""
+        return np.bitwise_count(words).astype(np.uint32)
+else:
+    _popcount64 = _popcount64_table
@@ -0,0 +1,248 @@
+"""
+Sharded DP build for the deterministic solver.
+
+Every height layer is split into contiguous board ranges ("shards") that
+are evaluated independently, either by a local process pool or by
+workers on several machines sharing a directory. A shard only reads the
+merged layers it can land on (at most the largest figure size below it),
+so that frontier is all the workers exchange.
+
+Merged layers are written in the `Deterministic` checkpoint format
+(`height_NN.npz`), so the final table is assembled by resuming a
+`Deterministic` build from the shared directory, and `save_cache`
+produces the same artifact as a single-process build.
+
+Usage:
+    python sharded.py local DIR --workers 8
+    python sharded.py worker DIR --shard 0 --shards 4   (one per machine/process)
+    python sharded.py merge DIR --shards 4              (one coordinator)
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from jigsaw import FIGURES, TERMINAL_STATE, TOTAL_CELLS, TOTAL_FIGURES
+from policy import rotate_boards
+from deterministic import (CHECKPOINT_FINGERPRINT, Deterministic, board_values_numpy,
+                           checkpoint_matches, checkpoint_path, clear_checkpoints,
+                           discard_stale_checkpoints, filled_counts, placements, pull_layer,
+                           sorted_lookup)
+
+MAX_FIGURE_SIZE = max(figure.size for figure in FIGURES)
+POLL_INTERVAL = 0.5
+
+_filled = None
+
+
+def _layer_boards(height: int, symmetric: bool) -> np.ndarray:
+    """Sorted boards with `height` empty cells (orbit representatives if symmetric)."""
+    global _filled
+    if _filled is None:
+        _filled = filled_counts()
+    boards = np.flatnonzero(_filled == TOTAL_CELLS - height).astype(np.uint32)
+    if symmetric:
+        boards = boards[boards <= rotate_boards(boards)]
+    return boards
+
+
+def shard_boards(height: int, shard: int, n_shards: int, symmetric: bool) -> np.ndarray:
+    """The contiguous board range of one shard of a layer."""
+    return np.array_split(_layer_boards(height, symmetric), n_shards)[shard]
+
+
+def _shard_path(directory: str, height: int, shard: int) -> str:
+    return os.path.join(directory, f"shard_{height:02d}_{shard:04d}.npz")
+
+
+def _is_current(path: str, symmetric: bool) -> bool:
+    """`path` exists and was written by this build (fingerprint and symmetry)."""
+    try:
+        with np.load(path) as data:
+            return checkpoint_matches(data, symmetric)
+    except Exception:  # missing, or unreadable
+        return False
+
+
+def _discard_stale(directory: str, symmetric: bool):
+    """Delete the layers and shards a different build left in the directory."""
+    discard_stale_checkpoints(directory, symmetric)
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith("shard_") and name.endswith(".npz") and not _is_current(path, symmetric):
+            os.remove(path)
+
+
+def _save_atomic(path: str, **arrays):
+    """Write an npz under a temporary name and rename it into place."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _load_frontier(directory: str, height: int, symmetric: bool
+                   ) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """(boards, values) of the merged layers a shard of `height` can land on."""
+    frontier = {}
+    for lower in range(max(height - MAX_FIGURE_SIZE, 0), height):
+        if lower == 0:
+            terminal = np.zeros((1, TOTAL_FIGURES), dtype=np.float32)
+            frontier[0] = (np.array([TERMINAL_STATE], dtype=np.uint32),
+                           board_values_numpy(terminal))
+            continue
+        with np.load(checkpoint_path(directory, lower)) as data:
+            if not checkpoint_matches(data, symmetric):
+                raise ValueError(f"layer {lower} was written by another build")
+            frontier[lower] = (data['boards'], board_values_numpy(data['dsts']))
+    return frontier
+
+
+def build_shard(directory: str, height: int, shard: int, n_shards: int,
+                symmetric: bool = True):
+    """
+    Evaluate one shard of a layer against the merged lower layers and
+    write its reachable boards with their dsts/actions rows.
+    Same `pull_layer` step as `_run_numpy`, with the landing boards
+    looked up in the sorted frontier layers.
+    """
+    boards = shard_boards(height, shard, n_shards, symmetric)
+    frontier = _load_frontier(directory, height, symmetric)
+
+    layer_placements = []
+    for f_idx, figure in enumerate(FIGURES):
+        fits = figure.size <= height and len(frontier[height - figure.size][0]) > 0
+        layer_placements.append(placements(f_idx) if fits else [])
+
+    def lookup(f_idx, targets):
+        return sorted_lookup(*frontier[height - FIGURES[f_idx].size], targets)
+
+    best, best_actions, reachable = pull_layer(boards, layer_placements, lookup, symmetric)
+    boards = boards[reachable]
+    best = best[reachable]
+    best_actions = best_actions[reachable]
+
+    _save_atomic(_shard_path(directory, height, shard), boards=boards, dsts=best,
+                 actions=best_actions, symmetric=symmetric, fingerprint=CHECKPOINT_FINGERPRINT)
+
+
+def merge_layer(directory: str, height: int, n_shards: int):
+    """
+    Concatenate the shards of a layer in shard order into its checkpoint
+    file. Shards are contiguous board ranges, so the merged layer is
+    sorted and identical for any shard count.
+    """
+    parts = [np.load(_shard_path(directory, height, shard)) for shard in range(n_shards)]
+    try:
+        merged = {key: np.concatenate([part[key] for part in parts])
+                  for key in ("boards", "dsts", "actions")}
+        symmetric = bool(parts[0]['symmetric'])
+        if not all(checkpoint_matches(part, symmetric) for part in parts):
+            raise ValueError(f"the shards of layer {height} were written by different builds")
+    finally:
+        for part in parts:
+            part.close()
+    _save_atomic(checkpoint_path(directory, height), symmetric=symmetric,
+                 fingerprint=CHECKPOINT_FINGERPRINT, **merged)
+    for shard in range(n_shards):
+        os.remove(_shard_path(directory, height, shard))
+
+
+def _wait_until(ready: Callable[[], bool]):
+    while not ready():
+        time.sleep(POLL_INTERVAL)
+
+
+def run_worker(directory: str, shard: int, n_shards: int, symmetric: bool = True):
+    """Build one shard of every layer, waiting for the coordinator's merges."""
+    os.makedirs(directory, exist_ok=True)
+    for height in range(1, TOTAL_CELLS + 1):
+        if (_is_current(checkpoint_path(directory, height), symmetric)
+                or _is_current(_shard_path(directory, height, shard), symmetric)):
+            continue
+        lower_heights = range(max(height - MAX_FIGURE_SIZE, 1), height)
+        _wait_until(lambda: all(_is_current(checkpoint_path(directory, lower), symmetric)
+                                for lower in lower_heights))
+        build_shard(directory, height, shard, n_shards, symmetric)
+        print(f"  Height {height}/{TOTAL_CELLS}: shard {shard + 1}/{n_shards} done")
+
+
+def run_merger(directory: str, n_shards: int, symmetric: bool = True):
+    """Merge every layer as soon as all its shards are written."""
+    os.makedirs(directory, exist_ok=True)
+    _discard_stale(directory, symmetric)
+    for height in range(1, TOTAL_CELLS + 1):
+        if _is_current(checkpoint_path(directory, height), symmetric):
+            continue
+        paths = [_shard_path(directory, height, shard) for shard in range(n_shards)]
+        _wait_until(lambda: all(os.path.exists(path) for path in paths))
+        merge_layer(directory, height, n_shards)
+        print(f"  Height {height}/{TOTAL_CELLS}: merged {n_shards} shards")
+
+
+def _build_shard_task(args):
+    build_shard(*args)
+
+
+def build_local(directory: str, n_workers: int = None, symmetric: bool = True):
+    """Build all layers with a local process pool, one shard per worker."""
+    n_workers = n_workers or os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    _discard_stale(directory, symmetric)
+    with multiprocessing.get_context("spawn").Pool(n_workers) as pool:
+        for height in range(1, TOTAL_CELLS + 1):
+            if _is_current(checkpoint_path(directory, height), symmetric):
+                continue
+            start = time.perf_counter()
+            pool.map(_build_shard_task, [(directory, height, shard, n_workers, symmetric)
+                                         for shard in range(n_workers)])
+            merge_layer(directory, height, n_workers)
+            print(f"  Height {height}/{TOTAL_CELLS}: {time.perf_counter() - start:.2f}s "
+                  f"on {n_workers} workers")
+
+
+def assemble(directory: str, symmetric: bool = True) -> Deterministic:
+    """Load the merged layers into a `Deterministic` with dense tables."""
+    for height in range(1, TOTAL_CELLS + 1):
+        if not os.path.exists(checkpoint_path(directory, height)):
+            raise RuntimeError(f"{directory} does not hold layer {height}")
+    solver = Deterministic(symmetric=symmetric)
+    solver.build(checkpoint_dir=directory)
+    if solver.height_times:
+        raise RuntimeError(f"{directory} holds unreadable layers")
+    return solver
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("local", "worker", "merge"))
+    parser.add_argument("directory", help="shared work directory")
+    parser.add_argument("--workers", type=int, default=None, help="local mode pool size")
+    parser.add_argument("--shard", type=int, default=0, help="worker mode shard index")
+    parser.add_argument("--shards", type=int, default=1, help="total number of shards")
+    parser.add_argument("--no-symmetric", action="store_true",
+                        help="solve every board instead of one per rotation orbit")
+    parser.add_argument("--cache", default=None,
+                        help="where merge/local write the npz cache (default: solver cache)")
+    args = parser.parse_args()
+    symmetric = not args.no_symmetric
+
+    if args.mode == "worker":
+        run_worker(args.directory, args.shard, args.shards, symmetric)
+        return
+    if args.mode == "merge":
+        run_merger(args.directory, args.shards, symmetric)
+    else:
+        build_local(args.directory, args.workers, symmetric)
+
+    solver = assemble(args.directory, symmetric)
+    solver.save_cache(args.cache)
+    clear_checkpoints(args.directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Policy table in shared memory, for running many bots on one host.
+
+Every `get_solver()` call maps its own view of the policy artifact. With
+one bot process per game window, the controller instead publishes the
+table once: `SharedPolicy.publish` copies the artifact layout of a
+`CompactPolicy` into a named `multiprocessing.shared_memory` block, and
+each worker process attaches to it by name with `SharedPolicy.attach`.
+Attaching only maps the block and views the sections in place (no copy,
+no parsing beyond the header), so a new worker starts in milliseconds
+and RAM stays flat however many workers run.
+
+Workers use the table read-only; the publisher owns the block and
+removes it on `close()`. Workers are meant to be started by the
+publisher's process tree (`multiprocessing`), so they share its resource
+tracker. On Windows the block disappears as soon as the last process
+closes it, so the publisher must outlive its workers.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from jigsaw import Jigsaw
+from policy import CompactPolicy
+
+
+class SharedPolicy:
+    """A `CompactPolicy` held in a named shared-memory block."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        data = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+        if not owner:
+            data.flags.writeable = False
+        self.policy = CompactPolicy.from_buffer(data, f"shared memory {shm.name}")
+
+    @property
+    def name(self) -> str:
+        """Block name the workers attach to."""
+        return self.shm.name
+
+    @classmethod
+    def publish(cls, policy: CompactPolicy, name: str = None,
+                values: bool = False) -> 'SharedPolicy':
+        """
+        Copy `policy` into a new block. The expected distances are left
+        out unless `values` is set: the bots only look up actions.
+        """
+        if not values:
+            policy = CompactPolicy(policy.bitmap, policy.ranks, policy.packed, policy.symmetric)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=policy.artifact_size)
+        try:
+            policy.write_into(shm.buf)
+            return cls(shm, owner=True)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedPolicy':
+        """Map a published block read-only."""
+        return cls(_attach(name), owner=False)
+
+    def solve(self, game: Jigsaw) -> int:
+        return self.policy.action(game.board, game.figure)
+
+    def solve_many(self, boards: np.ndarray, figures: np.ndarray) -> np.ndarray:
+        return self.policy.solve_many(boards, figures)
+
+    def close(self):
+        """Drop this process's mapping; the publisher also removes the block."""
+        self.policy = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Views handed out elsewhere keep the mapping alive until they go
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Older versions register attached blocks with the resource tracker as
+        # well. Worker processes share the publisher's tracker, which keeps one
+        # entry per name: the block is still removed only by the publisher
+        return shared_memory.SharedMemory(name=name)
+
+
+def publish_solver(name: str = None) -> SharedPolicy:
+    """Load (or build) the deterministic solver and publish its policy."""
+    from deterministic import get_solver
+    return SharedPolicy.publish(get_solver().policy, name)
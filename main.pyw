@@ -1,34 +1,24 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext
 import threading
-import cv2
-import numpy as np
 import pydirectinput
 import time
 import os
 import sys
 import ctypes
+import traceback
 import pyautogui
 
 # --- OYUN AYARLARI ---
 pyautogui.FAILSAFE = False
 pydirectinput.FAILSAFE = False
 CELL_SIZE = 32
-
-# --- WINDOWS API ---
-PUL = ctypes.POINTER(ctypes.c_ulong)
-class MouseInput(ctypes.Structure):
-    _fields_ = [("dx", ctypes.c_long), ("dy", ctypes.c_long), ("mouseData", ctypes.c_ulong), ("dwFlags", ctypes.c_ulong), ("time", ctypes.c_ulong), ("dwExtraInfo", PUL)]
-class Input_I(ctypes.Union):
-    _fields_ = [("mi", MouseInput)]
-class Input(ctypes.Structure):
-    _fields_ = [("type", ctypes.c_ulong), ("ii", Input_I)]
-
-def SendInput(*inputs):
-    return ctypes.windll.user32.SendInput(len(inputs), (Input * len(inputs))(*inputs), ctypes.sizeof(Input))
-
-MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP = 0x0002, 0x0004
-MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP = 0x0008, 0x0010
+METRICS_REFRESH = 2000   # Aşama dökümü kaç ms'de bir yenilenir
+METRICS_EXPORT = 30000   # Ölçümler kaç ms'de bir dosyaya yazılır
+METRICS_FILE = os.path.join(os.path.dirname(__file__), 'metrics.prom')  # .csv de olur
+LOG_LINES = 500          # Kayıt alanında tutulan en fazla satır
+LOG_DRAIN = 100          # Bekleyen kayıtlar kaç ms'de bir ekrana aktarılır
+LOG_FILE = None          # Örn. os.path.join(os.path.dirname(__file__), 'logs', 'bot.log'): döner dosya kaydı
 
 # --- MODÜLLERİ YÜKLE ---
 sys.path.append(os.path.join(os.path.dirname(__file__), 'core'))
@@ -41,8 +31,14 @@ except ImportError:
     CONFIG_LOADED = False
 
 try:
-    from core.jigsaw import Jigsaw, SKIP_ACTION
     from core.deterministic import get_solver
+    from core.heuristic import HeuristicSolver
+    from utils.pipeline import PipelinedBot
+    from utils.recognition import PieceClassifier
+    from utils.frames import GdiFrameSource
+    from utils.inputs import Win32Input
+    from utils.metrics import Metrics
+    from utils.logsink import LogSink
 except ImportError:
     pass
 
@@ -61,17 +57,25 @@ class ModernBotGUI:
         self.root.attributes('-alpha', 0.96)
 
         # Değişkenler
+        # Kayıtlar her iş parçacığından kuyruğa yazılır, ekrana yalnızca ana döngü aktarır
+        self.log_sink = LogSink(file_path=LOG_FILE)
         self.solver = None
         self.running = False
         self.calibrated = False
-        self.ref_x, self.ref_y = 0, 0
-        self.stats_count = 0
         self.asset_path = os.path.join(os.path.dirname(__file__), 'assets')
+        self.classifier = PieceClassifier(self.asset_path)  # Şablonlar bir kez yüklenir
+        # Oyun döngüsü: ekran GDI'dan okunur, tıklamalar gerçek fareye gider.
+        # Tahta okuma/tanıma ve çözücü ayrı iş parçacıklarında, tıklamalarla eş zamanlı çalışır
+        offsets = (bot_config.OFF_BTN_CHEST, bot_config.OFF_BTN_YES_ADD) if CONFIG_LOADED else ((0, 0), (0, 0))
+        self.metrics = Metrics()  # Aşama süreleri: tıklama, ekran, tanıma, çözücü, beklemeler
+        self.bot = PipelinedBot(GdiFrameSource(), Win32Input(), self.classifier, *offsets,
+                                CELL_SIZE, log=self.log, metrics=self.metrics)
 
         # --- ARAYÜZ TASARIMI ---
         self.setup_styles()
         self.create_header()
         self.create_status_panel()
+        self.create_metrics_panel()
         self.create_controls()
         self.create_log_area()
         self.create_footer()
@@ -86,6 +90,9 @@ class ModernBotGUI:
         # Dinleyiciler
         threading.Thread(target=self.hardware_listener, daemon=True).start()
         threading.Thread(target=self.bot_loop, daemon=True).start()
+        self.root.after(LOG_DRAIN, self.drain_log)
+        self.root.after(METRICS_REFRESH, self.refresh_metrics)
+        self.root.after(METRICS_EXPORT, self.export_metrics)
 
     def setup_styles(self):
         style = ttk.Style()
@@ -146,6 +153,15 @@ class ModernBotGUI:
         tk.Label(stats_frame, text="HAMLE:", font=("Segoe UI", 8), bg=self.colors["panel"], fg="#888").pack(side="left")
         tk.Label(stats_frame, textvariable=self.stats_var, font=("Consolas", 10, "bold"), 
                  bg=self.colors["panel"], fg=self.colors["accent"]).pack(side="left", padx=5)
+        self.rate_var = tk.StringVar(value="0/saat")
+        tk.Label(stats_frame, textvariable=self.rate_var, font=("Consolas", 8),
+                 bg=self.colors["panel"], fg="#888").pack(side="left")
+
+    def create_metrics_panel(self):
+        # Aşama dökümü: en çok zaman alan aşamalar, p50/p95/p99 (ms)
+        self.metrics_var = tk.StringVar(value="Ölçüm yok")
+        tk.Label(self.root, textvariable=self.metrics_var, font=("Consolas", 7), justify="left",
+                 anchor="w", bg=self.colors["bg"], fg="#888").pack(fill="x", padx=15)
 
     def create_controls(self):
         control_frame = tk.Frame(self.root, bg=self.colors["bg"])
@@ -189,42 +205,65 @@ class ModernBotGUI:
     # --- FONKSİYONLAR ---
 
     def log(self, message, tag="text"):
-        self.log_area.config(state='normal')
-        self.log_area.insert(tk.END, f"> {message}\n", tag)
-        self.log_area.see(tk.END)
-        self.log_area.config(state='disabled')
+        # Her iş parçacığından çağrılabilir: widget'a dokunmaz
+        self.log_sink(message, tag)
+
+    def drain_log(self):
+        # Bekleyen kayıtları toplu ekle, en eski satırları silerek alanı LOG_LINES'ta tut
+        batch = self.log_sink.drain()
+        if batch:
+            self.log_area.config(state='normal')
+            for _, message, tag in batch:
+                self.log_area.insert(tk.END, f"> {message}\n", tag)
+            excess = int(self.log_area.index('end-1c').split('.')[0]) - 1 - LOG_LINES
+            if excess > 0:
+                self.log_area.delete('1.0', f'{excess + 1}.0')
+            self.log_area.see(tk.END)
+            self.log_area.config(state='disabled')
+        self.root.after(LOG_DRAIN, self.drain_log)
 
     def load_solver(self):
+        # Tablo hazırlanırken bot sezgisel çözücüyle hemen oynamaya başlar
         try:
-            self.solver = get_solver()
-            self.log("Yapay Zeka Hazır!", "success")
-        except: 
+            self.solver = HeuristicSolver()
+            self.log("Hızlı mod aktif, tablo hazırlanıyor...", "warning")
+        except:
             self.log("AI Modülü Yüklenemedi!", "error")
+            return
 
-    def real_click(self, x, y, button='left'):
-        # Hedefe ışınlan
-        ctypes.windll.user32.SetCursorPos(int(x), int(y))
-        time.sleep(0.12)
-        
-        # Tıkla
-        extra = ctypes.c_ulong(0)
-        ii_ = Input_I()
-        down = MOUSEEVENTF_LEFTDOWN if button == 'left' else MOUSEEVENTF_RIGHTDOWN
-        up = MOUSEEVENTF_LEFTUP if button == 'left' else MOUSEEVENTF_RIGHTUP
-        
-        ii_.mi = MouseInput(0, 0, 0, down, 0, ctypes.pointer(extra))
-        SendInput(Input(ctypes.c_ulong(0), ii_))
-        time.sleep(0.12)
-        
-        ii_.mi = MouseInput(0, 0, 0, up, 0, ctypes.pointer(extra))
-        SendInput(Input(ctypes.c_ulong(0), ii_))
-        time.sleep(0.1)
+        try:
+            # Tablo yoksa her DP katının süresi ayrı ölçüm olarak kaydedilir
+            on_height = lambda height, seconds: self.metrics.gauge("dp_height_seconds", seconds, height=height)
+            with self.metrics.time("solver_load"):
+                solver = get_solver(on_height)
+            self.solver = solver  # Tek atama: bot_loop bir sonraki hamlede yeni çözücüyü kullanır
+            self.log("Yapay Zeka Hazır!", "success")
+        except: 
+            self.log("Optimal tablo yüklenemedi, hızlı mod devam ediyor!", "error")
+
+    def refresh_metrics(self):
+        self.stats_var.set(str(self.bot.moves))
+        self.rate_var.set(f"{self.metrics.per_hour('moves'):.0f}/saat")
+        lines = [f"{'aşama':<12}{'p50':>7}{'p95':>7}{'p99':>7}{'n':>7}"]
+        for name, s in self.metrics.breakdown(top=5):
+            lines.append(f"{name[:12]:<12}{s['p50'] * 1000:>7.0f}{s['p95'] * 1000:>7.0f}"
+                         f"{s['p99'] * 1000:>7.0f}{s['count']:>7}")
+        if len(lines) > 1:
+            self.metrics_var.set("\n".join(lines))
+        self.root.after(METRICS_REFRESH, self.refresh_metrics)
+
+    def export_metrics(self):
+        try:
+            self.metrics.export(METRICS_FILE)
+        except OSError as e:
+            self.log(f"Ölçümler yazılamadı: {e}", "error")
+        self.root.after(METRICS_EXPORT, self.export_metrics)
 
     def calibrate(self):
         x, y = pyautogui.position()
-        self.ref_x, self.ref_y = x, y
+        self.bot.calibrate(x, y)
         self.calibrated = True
-        self.log(f"Kilitlendi: {self.ref_x}, {self.ref_y}", "system")
+        self.log(f"Kilitlendi: {x}, {y}", "system")
         self.status_var.set("HAZIR")
         self.canvas_status.itemconfig(self.status_circle, fill=self.colors["warning"])
 
@@ -252,94 +291,24 @@ class ModernBotGUI:
                 break
             time.sleep(0.05)
 
-    # --- PARÇA TANIMA ---
-    def identify_piece_on_cursor(self):
-        # Mouse'u F1 noktasına (+16 piksel ortaya) götür
-        ctypes.windll.user32.SetCursorPos(int(self.ref_x + 16), int(self.ref_y + 16))
-        time.sleep(0.35) 
-
-        try:
-            screenshot = pyautogui.screenshot(region=(int(self.ref_x), int(self.ref_y), 32, 32))
-            crop_img = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
-        except: return None
-
-        pieces = [
-            ("fish_2.png", 0), # TEKLİ
-            ("fish_1.png", 3), # ÇUBUK
-            ("fish_3.png", 5), # L ŞEKLİ
-            ("fish_4.png", 4), # TERS L
-            ("fish_5.png", 1), # KARE
-            ("fish_6.png", 2)  # Z ŞEKLİ
-        ]
-        
-        for img_name, logic_id in pieces:
-            path = os.path.join(self.asset_path, img_name)
-            if not os.path.exists(path): continue
-            template = cv2.imread(path)
-            res = cv2.matchTemplate(crop_img, template, cv2.TM_CCOEFF_NORMED)
-            if cv2.minMaxLoc(res)[1] > 0.75: return logic_id 
-        return None
-
     def bot_loop(self):
-        game_memory = None
         while True:
-            if self.running and self.calibrated and self.solver:
-                if game_memory is None: game_memory = Jigsaw()
-                
-                if game_memory.has_finished(): 
-                    self.log("Tur tamamlandı. Bekleniyor...", "system")
-                    game_memory = Jigsaw()
-                    time.sleep(1.5)
-                    continue
-
-                # 1. Sandık
-                cx, cy = self.ref_x + bot_config.OFF_BTN_CHEST[0], self.ref_y + bot_config.OFF_BTN_CHEST[1]
-                self.real_click(cx, cy)
-                time.sleep(1.0) 
-
-                # 2. Evet -> Parça Mouse'a
-                yx, yy = self.ref_x + bot_config.OFF_BTN_YES_ADD[0], self.ref_y + bot_config.OFF_BTN_YES_ADD[1]
-                self.real_click(yx, yy)
-                time.sleep(0.3) 
-
-                # 3. Tanı (F1'e git)
-                piece_id = self.identify_piece_on_cursor()
-
-                if piece_id is not None:
-                    best_action = self.solver.solve(game_memory)
-                    
-                    if best_action == SKIP_ACTION:
-                        self.log("PAS GEÇİLİYOR", "warning")
-                        # Sağ tık (köşedeyken)
-                        self.real_click(self.ref_x + 16, self.ref_y + 16, button='right') 
-                        time.sleep(0.8)
-                        self.real_click(yx, yy) # Onayla
-                    else:
-                        # 4. Hedef
-                        col, row = (best_action >> 2) & 0x0F, best_action & 0x03
-                        tx, ty = self.ref_x + (col * CELL_SIZE), self.ref_y + (row * CELL_SIZE)
-                        
-                        self.log(f"Yerleştiriliyor: {col},{row}", "action")
-                        self.real_click(tx, ty)
-                        time.sleep(0.9) 
-                        
-                        # 5. Onay
-                        self.real_click(yx, yy)
-                    
-                    game_memory.perform_action(best_action)
-                    self.stats_count += 1
-                    self.stats_var.set(str(self.stats_count))
-                    time.sleep(0.4)
-                
-                else:
-                    self.log("Parça Tanınamadı! Atlanıyor.", "error")
-                    self.real_click(self.ref_x + 16, self.ref_y + 16, button='right')
-                    time.sleep(0.8)
-                    self.real_click(yx, yy)
-
+            solver = self.solver
+            if self.running and self.calibrated and solver:
+                try:
+                    self.bot.step(solver)  # Sayaç ana döngüde refresh_metrics ile güncellenir
+                except Exception as e:
+                    # Beklenmeyen hata iş parçacığını öldürmesin: kaydet, botu durdur (F5 ile devam)
+                    frame = traceback.extract_tb(e.__traceback__)[-1]
+                    self.log(f"Bot hatası: {type(e).__name__}: {e} "
+                             f"({os.path.basename(frame.filename)}:{frame.lineno})", "error")
+                    self.running = False
+                    self.root.after(0, self.stop_bot)
+                continue  # Hamleler arasında sabit bekleme yok
             time.sleep(0.1)
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ModernBotGUI(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.log_sink.close()
\ No newline at end of file
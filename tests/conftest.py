@@ -0,0 +1,8 @@
+"""Put `core/` and `utils/` on the path, like main.pyw and the tools do."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, 'core'), os.path.join(ROOT, 'utils'), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,66 @@
+"""The layer-walk backends against the push-style stack build, on a partial (low height) build."""
+import numpy as np
+import pytest
+
+from deterministic import HAS_NUMBA, Deterministic, filled_counts
+from jigsaw import TOTAL_CELLS, TOTAL_FIGURES
+from test_symmetry import action_values
+
+MAX_HEIGHT = 5
+
+needs_numba = pytest.mark.skipif(not HAS_NUMBA, reason="numba is not installed")
+BACKENDS = [pytest.param("numba", marks=needs_numba), "numpy"]
+
+
+def build(backend: str) -> Deterministic:
+    solver = Deterministic(symmetric=False)
+    solver.build(backend, max_height=MAX_HEIGHT)
+    return solver
+
+
+@pytest.fixture(scope="module")
+def stack_build():
+    """The pure Python backend, which still pushes values like the old stack build."""
+    solver = build("python")
+    boards = np.flatnonzero(filled_counts() >= TOTAL_CELLS - MAX_HEIGHT)
+    return solver, boards[solver.in_stack[boards]].astype(np.uint32)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_layer_walk_matches_stack_build(stack_build, backend):
+    stack, boards = stack_build
+    solver = build(backend)
+    np.testing.assert_array_equal(solver.in_stack[boards], True)
+    dsts = stack.dsts.reshape(-1, TOTAL_FIGURES)
+    np.testing.assert_array_equal(solver.dsts.reshape(-1, TOTAL_FIGURES)[boards], dsts[boards])
+
+    # Actions only differ where the two builds broke a tie differently
+    ours = solver.actions.reshape(-1, TOTAL_FIGURES)[boards].astype(np.intp)
+    theirs = stack.actions.reshape(-1, TOTAL_FIGURES)[boards].astype(np.intp)
+    rows, figures = np.nonzero(ours != theirs)
+    np.testing.assert_array_equal(
+        action_values(dsts, boards[rows], figures, ours[rows, figures]),
+        action_values(dsts, boards[rows], figures, theirs[rows, figures]))
+
+
+@needs_numba
+def test_numba_matches_numpy():
+    numba_build, numpy_build = build("numba"), build("numpy")
+    assert np.array_equal(numba_build.dsts, numpy_build.dsts)
+    assert np.array_equal(numba_build.actions, numpy_build.actions)
+    assert np.array_equal(numba_build.in_stack, numpy_build.in_stack)
+
+
+@needs_numba
+def test_numba_thread_count_invariant():
+    import numba
+    threads = numba.get_num_threads()
+    numba.set_num_threads(1)
+    try:
+        single = build("numba")
+    finally:
+        numba.set_num_threads(threads)
+    assert numba.get_num_threads() == threads
+    default = build("numba")  # layers above 1000 boards go through the prange kernel
+    assert np.array_equal(single.dsts, default.dsts)
+    assert np.array_equal(single.actions, default.actions)
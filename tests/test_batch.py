@@ -0,0 +1,50 @@
+"""Monte Carlo `evaluate_policy` against the DP's expected moves, on a partial (low height) build."""
+import numpy as np
+import pytest
+
+from batch import BatchJigsaw, evaluate_policy
+from deterministic import INF, Deterministic, filled_counts
+from distribution import dp_expectation
+from jigsaw import TOTAL_CELLS
+
+MAX_HEIGHT = 8
+N_GAMES = 200_000
+STANDARD_ERRORS = 4  # fixed seed: the check is deterministic, this is how much room it has
+
+
+@pytest.fixture(scope="module")
+def solver():
+    solver = Deterministic()
+    solver.build(max_height=MAX_HEIGHT)
+    solver.compact(values=True)
+    return solver
+
+
+def start_boards(solver):
+    """The first, middle and last board of the top layer the DP can finish."""
+    boards = np.flatnonzero(filled_counts() == TOTAL_CELLS - MAX_HEIGHT).astype(np.uint32)
+    boards = boards[solver.values_many(boards, np.zeros(len(boards), dtype=np.intp)) < INF]
+    return [int(boards[i]) for i in (0, len(boards) // 2, len(boards) - 1)]
+
+
+def test_mean_matches_dp(solver):
+    for board in start_boards(solver):
+        report = evaluate_policy(solver, N_GAMES, batch_size=1 << 16, seed=0, board=board)
+        assert report.unfinished == 0
+        expected = dp_expectation(solver, board)
+        assert abs(report.mean_moves - expected) < STANDARD_ERRORS * report.std_moves / np.sqrt(N_GAMES)
+
+
+def test_same_seed_same_report(solver):
+    board = start_boards(solver)[0]
+    first = evaluate_policy(solver, 5000, seed=7, board=board)
+    second = evaluate_policy(solver, 5000, seed=7, board=board)
+    np.testing.assert_array_equal(first.moves_histogram, second.moves_histogram)
+    assert first.skip_rate == second.skip_rate
+
+
+def test_illegal_action_rejected():
+    env = BatchJigsaw(3, np.random.default_rng(0), board=1)
+    env.figures[:] = 0
+    with pytest.raises(ValueError, match="Illegal"):
+        env.perform_actions(np.array([0, 1, TOTAL_CELLS - 1]))  # the last covers the filled cell
@@ -0,0 +1,87 @@
+"""Per-height checkpoints: resumed only when written by the same build."""
+import os
+
+import numpy as np
+import pytest
+
+import sharded
+from deterministic import (CHECKPOINT_FINGERPRINT, Deterministic, checkpoint_path,
+                           clear_checkpoints, discard_stale_checkpoints)
+
+MAX_HEIGHT = 4
+
+
+def build(directory, max_height: int = MAX_HEIGHT, symmetric: bool = True) -> Deterministic:
+    solver = Deterministic(symmetric=symmetric)
+    solver.build("numpy", max_height=max_height, checkpoint_dir=str(directory))
+    return solver
+
+
+def rewrite(path, **changes):
+    """Rewrite a checkpoint with some of its entries replaced (None: dropped)."""
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    arrays.update(changes)
+    np.savez(path, **{key: value for key, value in arrays.items() if value is not None})
+
+
+def test_resume_keeps_matching_checkpoints(tmp_path):
+    full = build(tmp_path)
+    assert discard_stale_checkpoints(str(tmp_path), True) == MAX_HEIGHT
+    resumed = build(tmp_path, max_height=MAX_HEIGHT + 1)
+    assert len(resumed.height_times) == 1  # only the new height was computed
+    assert (resumed.dsts[full.in_stack.repeat(6)] == full.dsts[full.in_stack.repeat(6)]).all()
+
+
+@pytest.mark.parametrize("changes", [
+    {"fingerprint": "another build"},
+    {"fingerprint": None},  # written before checkpoints had a fingerprint
+    {"symmetric": False},
+])
+def test_stale_checkpoints_are_discarded(tmp_path, changes):
+    build(tmp_path)
+    rewrite(checkpoint_path(str(tmp_path), 3), **changes)
+    assert discard_stale_checkpoints(str(tmp_path), True) == 2
+    assert sorted(os.listdir(tmp_path)) == ["height_01.npz", "height_02.npz"]
+
+    resumed = build(tmp_path)
+    assert len(resumed.height_times) == MAX_HEIGHT - 2
+    with np.load(checkpoint_path(str(tmp_path), 3)) as data:
+        assert str(data["fingerprint"]) == CHECKPOINT_FINGERPRINT
+
+
+def test_sharded_build_rejects_stale_layers(tmp_path):
+    build(tmp_path, max_height=MAX_HEIGHT)
+    rewrite(checkpoint_path(str(tmp_path), MAX_HEIGHT), fingerprint="another build")
+    with pytest.raises(ValueError, match="another build"):
+        sharded.build_shard(str(tmp_path), MAX_HEIGHT + 1, 0, 2)
+
+    sharded._discard_stale(str(tmp_path), True)
+    assert not os.path.exists(checkpoint_path(str(tmp_path), MAX_HEIGHT))
+    assert os.path.exists(checkpoint_path(str(tmp_path), MAX_HEIGHT - 1))
+
+
+STRAY = ["height_final.npz", "height_1.npz", "notes.txt", "shard_00_of_02.npz"]
+
+
+def add_stray_files(directory):
+    for name in STRAY:
+        (directory / name).write_bytes(b"")
+    (directory / "height_03.npz.tmp").write_bytes(b"")  # left by a killed write
+
+
+def test_gap_discards_later_checkpoints(tmp_path):
+    build(tmp_path)
+    add_stray_files(tmp_path)
+    os.remove(checkpoint_path(str(tmp_path), 2))
+    assert discard_stale_checkpoints(str(tmp_path), True) == 1
+    assert sorted(os.listdir(tmp_path)) == sorted(["height_01.npz"] + STRAY)
+
+
+def test_clear_keeps_other_files(tmp_path):
+    build(tmp_path)
+    add_stray_files(tmp_path)
+    clear_checkpoints(str(tmp_path), from_height=3)
+    assert sorted(os.listdir(tmp_path)) == sorted(["height_01.npz", "height_02.npz"] + STRAY)
+    clear_checkpoints(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted(STRAY)  # not ours to delete, so the directory stays
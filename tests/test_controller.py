@@ -0,0 +1,44 @@
+"""Bots of several windows on one shared cursor, stepped the way the controller's workers are."""
+import contextlib
+import threading
+
+from controller import play_step
+from heuristic import HeuristicSolver
+from simulator import AcceleratedClock, GameSimulator, SharedCursor, make_bot
+
+STEPS = 40
+
+
+def play_windows(input_lock, windows: int = 2):
+    """Step the bots of `windows` simulated windows concurrently; returns the simulators."""
+    cursor = SharedCursor()
+    simulators = [GameSimulator(clock=AcceleratedClock(), seed=i, cursor=cursor)
+                  for i in range(windows)]
+    bots = [make_bot(simulator) for simulator in simulators]
+    solver = HeuristicSolver()
+
+    def play(bot):
+        for _ in range(STEPS):
+            play_step(bot, solver, input_lock)
+
+    threads = [threading.Thread(target=play, args=(bot,)) for bot in bots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for bot in bots:
+        bot.close()
+    return simulators
+
+
+def test_locked_steps_never_conflict():
+    simulators = play_windows(threading.Lock())
+    for simulator in simulators:
+        assert simulator.stats.cursor_conflicts == 0
+        assert simulator.stats.moves > STEPS // 2
+
+
+def test_unlocked_steps_conflict():
+    # Without the step lock the check must see the windows fight over the cursor
+    simulators = play_windows(contextlib.nullcontext())
+    assert sum(simulator.stats.cursor_conflicts for simulator in simulators) > 0
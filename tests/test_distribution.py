@@ -0,0 +1,75 @@
+"""Move-count distributions on a partial (low height) build: DP means, n-board totals, risk policy moves."""
+import numpy as np
+import pytest
+
+from deterministic import INF, Deterministic, filled_counts
+from distribution import MoveDistribution, dp_expectation, evaluate_distribution, risk_policy
+from jigsaw import PLACEMENT_MASKS, SKIP_ACTION, TOTAL_CELLS, TOTAL_FIGURES
+
+MAX_HEIGHT = 6
+HORIZON = 64
+N_BOARDS = 200
+TOLERANCE = 1e-5
+
+_MASKS = np.array(PLACEMENT_MASKS, dtype=np.uint32)
+
+
+@pytest.fixture(scope="module")
+def solver():
+    solver = Deterministic(symmetric=True)
+    solver.build(max_height=MAX_HEIGHT)
+    solver.compact(values=True)
+    return solver
+
+
+def top_boards(solver, count: int = N_BOARDS):
+    """Boards of the highest built layer the DP can finish."""
+    boards = np.flatnonzero(filled_counts() == TOTAL_CELLS - MAX_HEIGHT).astype(np.uint32)
+    figures = np.zeros(len(boards), dtype=np.intp)
+    return boards[solver.values_many(boards, figures) < INF][:count].tolist()
+
+
+def test_means_match_dp(solver):
+    boards = top_boards(solver)
+    table = evaluate_distribution(solver, HORIZON, symmetric=True, keep=boards,
+                                  max_height=MAX_HEIGHT)
+    for board in boards:
+        expected = dp_expectation(solver, board)
+        assert table.mean(board) == pytest.approx(expected, rel=TOLERANCE)
+
+        # The truncated probabilities miss exactly the tail, all of it beyond the horizon
+        distribution = table.distribution(board)
+        truncated = MoveDistribution(distribution.probs).mean
+        assert distribution.tail == pytest.approx(table.tail(board), abs=1e-6)
+        assert truncated <= expected + TOLERANCE
+        assert expected - truncated >= distribution.tail * (HORIZON + 1) - TOLERANCE
+
+
+@pytest.mark.parametrize("n_boards", [1, 2, 5])
+def test_total_matches_convolution(n_boards):
+    rng = np.random.default_rng(n_boards)
+    probs = rng.random(HORIZON + 1)
+    probs[0] = 0.0
+    single = MoveDistribution(probs / probs.sum() * 0.99)  # 1% tail
+
+    expected = single.probs
+    for _ in range(n_boards - 1):
+        expected = np.convolve(expected, single.probs)
+    total = single.total(n_boards)
+    assert total.horizon == n_boards * HORIZON
+    np.testing.assert_allclose(total.probs, expected, atol=1e-12)
+    assert total.mean == pytest.approx(n_boards * single.mean)
+    assert total.variance == pytest.approx(n_boards * single.variance)
+
+
+def test_risk_policy_legal():
+    policy, _ = risk_policy(0.95, HORIZON, symmetric=True, max_height=MAX_HEIGHT)
+    boards = np.flatnonzero(filled_counts() >= TOTAL_CELLS - MAX_HEIGHT).astype(np.uint32)
+    for f_idx in range(TOTAL_FIGURES):
+        actions = np.asarray(policy.solve_many(boards, np.full(len(boards), f_idx, dtype=np.uint8)),
+                             dtype=np.intp)
+        masks = _MASKS[f_idx, actions]
+        play = actions != SKIP_ACTION
+        assert not ((masks == 0) & play).any(), "placement out of bounds"
+        assert not (boards & masks).any(), "placement on filled cells"
+        assert play.any()
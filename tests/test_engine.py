@@ -0,0 +1,46 @@
+"""GeneralSolver on the 4x6 board and FIGURES against the dense `Deterministic` table."""
+import numpy as np
+import pytest
+
+from deterministic import INF, Deterministic, filled_counts
+from engine import BoardSpec, GeneralSolver, pieces_from_figures
+from jigsaw import FIGURES, INIT_STATE, M, N, TOTAL_CELLS, TOTAL_FIGURES
+
+MAX_HEIGHT = 6
+
+
+@pytest.fixture(scope="module")
+def solvers():
+    spec = BoardSpec(rows=N, cols=M)
+    heights = []
+    general = GeneralSolver(spec, pieces_from_figures(FIGURES, spec),
+                            on_height=lambda height, seconds: heights.append(height))
+    general.run(max_height=MAX_HEIGHT)
+    assert heights == list(range(1, MAX_HEIGHT + 1))
+    assert len(general.height_times) == MAX_HEIGHT
+
+    dense = Deterministic(symmetric=False)
+    dense.build(max_height=MAX_HEIGHT)
+    return general, dense
+
+
+@pytest.mark.parametrize("height", range(1, MAX_HEIGHT + 1))
+def test_layer_matches_deterministic(solvers, height):
+    general, dense = solvers
+    layer = general.layers[height]
+    boards = np.flatnonzero(filled_counts() == TOTAL_CELLS - height)
+    boards = boards[dense.in_stack[boards]]
+    np.testing.assert_array_equal(layer.boards, boards)
+    np.testing.assert_array_equal(layer.dsts, dense.dsts.reshape(-1, TOTAL_FIGURES)[boards])
+    np.testing.assert_array_equal(layer.actions, dense.actions.reshape(-1, TOTAL_FIGURES)[boards])
+
+
+def test_lookups(solvers):
+    general, dense = solvers
+    board = int(general.layers[MAX_HEIGHT].boards[0])
+    for f_idx in range(TOTAL_FIGURES):
+        assert general.action(board, f_idx) == dense.actions[board * TOTAL_FIGURES + f_idx]
+        assert general.value(board, f_idx) == dense.dsts[board * TOTAL_FIGURES + f_idx]
+    # Heights above max_height were not built
+    assert general.action(INIT_STATE, 0) == general.skip_action
+    assert general.value(INIT_STATE, 0) == float(INF)
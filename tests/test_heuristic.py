@@ -0,0 +1,70 @@
+"""HeuristicSolver: legal moves on random boards, the leaf estimate and the time-budget fallback."""
+import numpy as np
+import pytest
+
+from heuristic import HeuristicSolver, estimate, single_only_cells
+from jigsaw import (FIGURES, INIT_STATE, PLACEMENT_MASKS, SKIP_ACTION, TERMINAL_STATE,
+                    TOTAL_CELLS)
+
+N_BOARDS = 40
+
+
+def random_boards(seed: int, count: int = N_BOARDS):
+    """Boards from empty to nearly full, plus the empty and the full board."""
+    rng = np.random.default_rng(seed)
+    boards = [INIT_STATE, TERMINAL_STATE]
+    for fill in rng.uniform(0.0, 1.0, count):
+        cells = rng.random(TOTAL_CELLS) < fill
+        boards.append(sum(1 << bit for bit in np.flatnonzero(cells).tolist()))
+    return boards
+
+
+def assert_legal(board: int, f_idx: int, action: int):
+    if action == SKIP_ACTION:
+        return
+    mask = PLACEMENT_MASKS[f_idx][action]
+    assert mask, f"figure {f_idx} out of bounds at {action}"
+    assert not board & mask, f"figure {f_idx} overlaps board {board:024b} at {action}"
+
+
+@pytest.mark.parametrize("depth", [1, 2])
+def test_actions_legal(depth):
+    solver = HeuristicSolver(depth=depth)
+    for board in random_boards(depth):
+        for f_idx in range(len(FIGURES)):
+            assert_legal(board, f_idx, solver.action(board, f_idx))
+
+
+def test_terminal_board():
+    assert estimate(TERMINAL_STATE) == 0.0
+    assert single_only_cells(TERMINAL_STATE) == 0
+    solver = HeuristicSolver()
+    assert all(solver.action(TERMINAL_STATE, f_idx) == SKIP_ACTION for f_idx in range(len(FIGURES)))
+
+
+def test_estimate_positive_before_terminal():
+    for board in random_boards(3):
+        if board != TERMINAL_STATE:
+            assert estimate(board) > 0.0
+
+
+def test_time_budget_falls_back_to_depth_one():
+    # With no time at all only the depth 1 search finishes
+    shallow = HeuristicSolver(depth=1)
+    budgeted = HeuristicSolver(depth=3, time_budget=0.0)
+    for board in random_boards(4, count=10):
+        for f_idx in range(len(FIGURES)):
+            action = budgeted.action(board, f_idx)
+            assert_legal(board, f_idx, action)
+            assert action == shallow.action(board, f_idx)
+    assert budgeted._deadline is None
+
+
+def test_single_only_cells():
+    for board in random_boards(5):
+        covered = 0
+        for f_idx in range(1, len(FIGURES)):
+            for mask in PLACEMENT_MASKS[f_idx]:
+                if mask and not board & mask:
+                    covered |= mask
+        assert single_only_cells(board) == ~board & TERMINAL_STATE & ~covered
@@ -0,0 +1,57 @@
+"""LogSink: bounded pending queue with a dropped-message line, file writes on the writer thread."""
+import threading
+
+from logsink import DROPPED_MESSAGE, LogSink
+
+
+def messages(batch):
+    return [message for _, message, _ in batch]
+
+
+def test_drain_in_batches():
+    sink = LogSink()
+    for i in range(5):
+        sink(f"message {i}", "action")
+    assert messages(sink.drain(limit=3)) == ["message 0", "message 1", "message 2"]
+    batch = sink.drain()
+    assert messages(batch) == ["message 3", "message 4"]
+    assert {tag for _, _, tag in batch} == {"action"}
+    assert sink.drain() == []
+
+
+def test_dropped_messages_reported():
+    sink = LogSink(max_pending=3)
+    for i in range(10):
+        sink(f"message {i}")
+    batch = sink.drain()
+    assert messages(batch) == [DROPPED_MESSAGE.format(7), "message 7", "message 8", "message 9"]
+    assert batch[0][2] == "warning"
+    assert sink.drain() == []  # reported once
+
+    sink("message 10")
+    assert messages(sink.drain()) == ["message 10"]
+
+
+def test_file_written_off_the_draining_thread(tmp_path):
+    path = tmp_path / "logs" / "bot.log"
+    sink = LogSink(max_pending=3, file_path=str(path))
+    threads = set()
+    handle = sink.file.handle
+
+    def recorded(record):
+        threads.add(threading.current_thread().name)
+        return handle(record)
+
+    sink.file.handle = recorded
+    for i in range(10):
+        sink(f"message {i}", "error" if i == 4 else "text")
+    sink.drain()
+    sink.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    # The file keeps what the GUI dropped, in order
+    assert [line.split(None, 3)[-1] for line in lines] == [f"message {i}" for i in range(10)]
+    assert "ERROR" in lines[4] and "INFO" in lines[0]
+    assert threads == {"log-writer"}
+
+    sink("after close")  # must not raise once the writer is gone
@@ -0,0 +1,133 @@
+"""LatencyHistogram buckets and quantiles, and the CSV / Prometheus snapshots of `Metrics.export`."""
+import csv
+import os
+import re
+
+import numpy as np
+import pytest
+
+from metrics import (BUCKET_COUNT, BUCKETS_PER_DOUBLING, MIN_LATENCY, PROMETHEUS_PREFIX,
+                     LatencyHistogram, Metrics)
+from waits import Clock
+
+# Half a bucket width: the bucket middle is this close to any duration in the bucket
+BUCKET_ERROR = 2 ** (0.5 / BUCKETS_PER_DOUBLING) - 1
+
+
+def upper_bound(index: int) -> float:
+    return MIN_LATENCY * 2 ** (index / BUCKETS_PER_DOUBLING)
+
+
+def test_bucket_bounds():
+    assert LatencyHistogram.bucket(0.0) == 0
+    assert LatencyHistogram.bucket(MIN_LATENCY) == 0
+    assert LatencyHistogram.bucket(2 * MIN_LATENCY) == BUCKETS_PER_DOUBLING
+    assert LatencyHistogram.bucket(1e6) == BUCKET_COUNT - 1
+    for index in range(1, BUCKET_COUNT):
+        lower, upper = upper_bound(index - 1), upper_bound(index)
+        assert LatencyHistogram.bucket(lower * (1 + 1e-9)) == index
+        assert LatencyHistogram.bucket(upper * (1 - 1e-9)) == index
+        assert lower < LatencyHistogram.bucket_value(index) < upper
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_quantiles_within_bucket_error(seed):
+    samples = np.random.default_rng(seed).lognormal(np.log(0.05), 1.0, 20000)
+    histogram = LatencyHistogram()
+    for seconds in samples:
+        histogram.record(float(seconds))
+    assert histogram.count == len(samples)
+    assert histogram.mean == pytest.approx(samples.mean())
+    assert histogram.max == samples.max()
+    for q in (0.50, 0.90, 0.95, 0.99):
+        assert histogram.quantile(q) == pytest.approx(np.quantile(samples, q), rel=BUCKET_ERROR + 0.01)
+    top = histogram.quantile(1.0)
+    assert top <= samples.max()  # never above the largest sample
+    assert top == pytest.approx(samples.max(), rel=2 * BUCKET_ERROR)
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.5) == 0.0 and histogram.mean == 0.0
+
+
+class StepClock(Clock):
+    """Every reading is one second after the previous one."""
+
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self) -> float:
+        self.time += 1.0
+        return self.time
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics(clock=StepClock())
+    for seconds in (0.010, 0.020, 0.030):
+        metrics.record("capture", seconds)
+    metrics.record('Diyalog "evet", açık', 0.5)  # free-form stage name: quotes, comma, non-ASCII
+    metrics.count("prefetch_hits", 3)
+    for _ in range(4):
+        metrics.mark("moves")
+    metrics.gauge("dp_height_seconds", 1.25, height=3)
+    metrics.gauge("dp_height_seconds", 2.5, height=4)
+    return metrics
+
+
+PROM_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{([a-z_]+="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+def test_export_prometheus(metrics, tmp_path):
+    path = str(tmp_path / "bot.prom")
+    metrics.export(path)
+    assert os.listdir(tmp_path) == ["bot.prom"]  # written through a replaced .tmp
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+
+    samples = {}
+    for line in lines:
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) [a-z_]+ ", line), line
+            continue
+        match = PROM_SAMPLE.match(line)
+        assert match, line
+        samples[line.rsplit(" ", 1)[0]] = float(match.group(4))
+
+    p = PROMETHEUS_PREFIX
+    assert f"# TYPE {p}_stage_seconds summary" in lines
+    assert samples[f'{p}_stage_seconds_count{{stage="capture"}}'] == 3
+    assert samples[f'{p}_stage_seconds_sum{{stage="capture"}}'] == pytest.approx(0.06)
+    assert samples[f'{p}_stage_seconds{{stage="capture",quantile="0.5"}}'] == pytest.approx(
+        0.02, rel=BUCKET_ERROR)
+    assert samples[f'{p}_stage_seconds_count{{stage="Diyalog \\"evet\\", açık"}}'] == 1
+    assert f"# TYPE {p}_prefetch_hits_total counter" in lines
+    assert samples[f"{p}_prefetch_hits_total"] == 3
+    assert samples[f"{p}_moves_total"] == 4
+    assert samples[f"{p}_moves_per_hour"] == 3600.0  # one mark per (step clock) second
+    assert lines.count(f"# TYPE {p}_dp_height_seconds gauge") == 1
+    assert samples[f'{p}_dp_height_seconds{{height="4"}}'] == 2.5
+
+
+def test_export_csv(metrics, tmp_path):
+    path = str(tmp_path / "bot.csv")
+    metrics.export(path)
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+
+    header = rows[0]
+    assert header == ["kind", "name", "labels", "count", "mean", "p50", "p95", "p99", "max", "value"]
+    assert all(len(row) == len(header) for row in rows)
+    by_name = {row[1]: dict(zip(header, row)) for row in rows[1:]}
+
+    # Histograms come first, the stage with the most total time leading
+    assert [row[1] for row in rows[1:3]] == ['Diyalog "evet", açık', "capture"]
+    capture = by_name["capture"]
+    assert capture["kind"] == "histogram" and capture["count"] == "3"
+    assert float(capture["mean"]) == pytest.approx(0.02)
+    assert float(capture["max"]) == pytest.approx(0.03)
+    assert by_name["prefetch_hits"]["kind"] == "counter" and by_name["prefetch_hits"]["value"] == "3"
+    assert float(by_name["moves_per_hour"]["value"]) == 3600.0
+    gauges = [row for row in rows if row[0] == "gauge"]
+    assert [(row[2], float(row[9])) for row in gauges] == [("height=3", 1.25), ("height=4", 2.5)]
@@ -0,0 +1,65 @@
+"""PipelinedBot against the game simulator: recovery from faults and the prefetch accounting."""
+from heuristic import HeuristicSolver
+from simulator import AcceleratedClock, Faults, GameSimulator, make_bot, run
+
+MOVES = 80
+FAULTS = Faults(spike_rate=0.05, misclick_rate=0.05, drop_rate=0.05)
+
+
+def play(faults: Faults, seed: int = 0):
+    """Run the pipelined bot for MOVES moves; returns the report and the number of plans asked for."""
+    simulator = GameSimulator(clock=AcceleratedClock(), faults=faults, seed=seed)
+    bot = make_bot(simulator)
+    plan_for, plans = bot.plan_for, []
+
+    def counted(solver, game_memory):
+        plans.append(game_memory.board)
+        return plan_for(solver, game_memory)
+
+    bot.plan_for = counted
+    try:
+        report = run(bot, HeuristicSolver(), simulator, MOVES)
+    finally:
+        bot.close()
+    return report, len(plans)
+
+
+def test_prefetch_without_faults():
+    report, plans = play(Faults())
+    assert not report["stalled"] and report["moves"] >= MOVES
+    # Every plan was prefetched, and every prediction of the next board held
+    assert report["prefetch_hits"] == plans
+    assert report["prefetch_misses"] == 0
+
+
+def test_prefetch_with_faults():
+    report, plans = play(FAULTS)
+    assert not report["stalled"] and report["moves"] >= MOVES
+    assert report["misclicks"] + report["dropped_clicks"] > 0
+    assert report["prefetch_hits"] == plans
+    # A plan is only dropped when the board check disagreed with the prediction
+    assert 0 < report["prefetch_misses"] <= report["bot_resyncs"]
+
+
+def test_plan_for_counts_only_plans_in_flight():
+    simulator = GameSimulator(clock=AcceleratedClock(), seed=0)
+    bot = make_bot(simulator)
+    solver = HeuristicSolver()
+    try:
+        game = bot.game_memory = simulator.game.clone()
+        assert bot.prefetch(solver, game.board, game.round)
+        assert not bot.prefetch(solver, game.board, game.round)
+        bot.plan_for(solver, game)
+        assert (bot.prefetch_hits, bot.prefetch_misses) == (1, 0)
+
+        # A board nobody prefetched: computed on demand, neither hit nor miss
+        game.board |= 1
+        bot.plan_for(solver, game)
+        assert (bot.prefetch_hits, bot.prefetch_misses) == (1, 0)
+
+        # Replacing a plan that was never used is a miss
+        bot.prefetch(solver, game.board | 2, game.round)
+        bot.prefetch(solver, game.board | 4, game.round)
+        assert (bot.prefetch_hits, bot.prefetch_misses) == (1, 1)
+    finally:
+        bot.close()
@@ -0,0 +1,67 @@
+"""CompactPolicy lookups: popcount fallbacks and distances served after compaction."""
+import numpy as np
+import pytest
+
+import policy
+from deterministic import INF, Deterministic
+from jigsaw import rotate_board
+from policy import CompactPolicy
+
+MAX_HEIGHT = 4
+
+
+def test_popcount_fallbacks():
+    rng = np.random.default_rng(0)
+    words = rng.integers(0, 2**63, 1000, dtype=np.uint64) * np.uint64(2)
+    words += rng.integers(0, 2, 1000, dtype=np.uint64)
+    words[:3] = [0, 1, 2**64 - 1]
+    expected = np.array([bin(int(w)).count('1') for w in words])
+    assert [policy._popcount_bin(int(w)) for w in words] == expected.tolist()
+    assert [policy._popcount(int(w)) for w in words] == expected.tolist()
+    np.testing.assert_array_equal(policy._popcount64_table(words), expected)
+    np.testing.assert_array_equal(policy._popcount64(words), expected)
+    np.testing.assert_array_equal(policy._popcount64_table(words.reshape(10, 100)),
+                                  expected.reshape(10, 100))
+
+
+def test_rank_matches_vectorized_rows():
+    rng = np.random.default_rng(1)
+    reachable = rng.random(1 << 16) < 0.3
+    actions = rng.integers(0, 25, len(reachable) * 6, dtype=np.uint8)
+    compact = CompactPolicy.from_dense(actions, reachable)
+    boards = rng.integers(0, len(reachable), 2000).astype(np.uint32)
+    rows, present, _, _ = compact._rows_many(boards, np.zeros(len(boards), dtype=np.intp))
+    ranks = np.array([compact.rank(int(board)) for board in boards])
+    np.testing.assert_array_equal(ranks >= 0, present)
+    np.testing.assert_array_equal(ranks[present], rows[present])
+
+
+@pytest.mark.parametrize("symmetric", [False, True])
+def test_distances_after_compact(symmetric):
+    solver = Deterministic(symmetric=symmetric)
+    solver.build(max_height=MAX_HEIGHT)
+    boards = [int(b) for b in np.flatnonzero(solver.dsts[::6] < INF)[:200]]
+    boards += [rotate_board(board) for board in boards]  # served through the rotation when symmetric
+    dense = {board: list(solver.distances(board)) for board in boards}
+
+    solver.compact(values=True)
+    for board in boards:
+        assert list(solver.distances(board)) == dense[board]
+
+    solver.policy = CompactPolicy(solver.policy.bitmap, solver.policy.ranks,
+                                  solver.policy.packed, symmetric)
+    with pytest.raises(ValueError, match="dense"):
+        list(solver.distances(boards[0]))
+
+
+def test_values_opt_in():
+    solver = Deterministic()
+    solver.build(max_height=MAX_HEIGHT)
+    boards = np.flatnonzero(solver.dsts[::6] < INF).astype(np.uint32)
+    figures = np.zeros(len(boards), dtype=np.intp)
+    actions = solver.actions[boards.astype(np.int64) * 6]
+    solver.compact()
+    assert solver.policy.values is None
+    np.testing.assert_array_equal(solver.solve_many(boards, figures), actions)
+    with pytest.raises(ValueError):
+        solver.values_many(boards, figures)
@@ -0,0 +1,54 @@
+"""The closed-form skip operator against the brute force over all figure subsets."""
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+import deterministic
+from deterministic import HAS_NUMBA, INF, skip_dst, skip_dsts_numpy
+
+N_FIGURES = 6
+TOLERANCE = 1e-6
+
+
+def brute_force(row) -> float:
+    """min over non-empty subsets S of (n + sum of S) / |S| (all 2^n - 1 subsets)."""
+    n = len(row)
+    return min((n + sum(float(row[i]) for i in subset)) / len(subset)
+               for size in range(1, n + 1) for subset in combinations(range(n), size))
+
+
+def random_rows(seed: int, count: int = 500) -> np.ndarray:
+    """Distances like the DP's: mostly 0-40, some ties, some unreachable (INF)."""
+    rng = np.random.default_rng(seed)
+    rows = rng.uniform(0.0, 40.0, (count, N_FIGURES)).astype(np.float32)
+    ties = rng.random((count, N_FIGURES)) < 0.2
+    rows[ties] = np.round(rows[ties])
+    rows[rng.random((count, N_FIGURES)) < 0.15] = INF
+    rows[0] = 0.0
+    rows[1] = INF
+    return rows
+
+
+def assert_close(value: float, expected: float):
+    assert abs(value - expected) <= TOLERANCE * max(1.0, abs(expected))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_skip_dst_python(seed):
+    for row in random_rows(seed):
+        assert_close(skip_dst(row), brute_force(row))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_skip_dsts_numpy(seed):
+    rows = random_rows(seed)
+    for value, row in zip(skip_dsts_numpy(rows), rows):
+        assert_close(float(value), brute_force(row))
+
+
+@pytest.mark.skipif(not HAS_NUMBA, reason="numba not installed")
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_skip_dst_numba(seed):
+    for row in random_rows(seed):
+        assert_close(float(deterministic._compute_skip_dst_numba(row)), brute_force(row))
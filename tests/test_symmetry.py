@@ -0,0 +1,83 @@
+"""The rotation-reduced DP table against the full one, on a partial (low height) build."""
+import numpy as np
+import pytest
+
+from deterministic import Deterministic, board_values_numpy, filled_counts, skip_dsts_numpy
+from jigsaw import PLACEMENT_MASKS, ROTATED_FIGURES, SKIP_ACTION, TOTAL_CELLS, TOTAL_FIGURES
+from policy import rotate_boards
+
+MAX_HEIGHT = 8
+TOLERANCE = 1e-5
+
+_MASKS = np.array(PLACEMENT_MASKS, dtype=np.uint32)
+
+
+@pytest.fixture(scope="module")
+def tables():
+    full = Deterministic(symmetric=False)
+    full.build(max_height=MAX_HEIGHT)
+    reduced = Deterministic(symmetric=True)
+    reduced.build(max_height=MAX_HEIGHT)
+    filled = filled_counts()
+    boards = np.flatnonzero(filled >= TOTAL_CELLS - MAX_HEIGHT).astype(np.uint32)
+    return full, reduced, boards
+
+
+def _unrotated_actions() -> np.ndarray:
+    """
+    UNROTATED[f, a]: action of figure f covering the 180 degree rotation of
+    the cells figure ROTATED_FIGURES[f] covers at action a (skip stays skip).
+    Derived from the placement masks, independently of `rotate_action`.
+    """
+    table = np.full((TOTAL_FIGURES, SKIP_ACTION + 1), SKIP_ACTION, dtype=np.intp)
+    for f_idx in range(TOTAL_FIGURES):
+        g = ROTATED_FIGURES[f_idx]
+        for action, mask in enumerate(PLACEMENT_MASKS[g]):
+            if mask:
+                cells = int(rotate_boards(np.array([mask], dtype=np.uint32))[0])
+                table[f_idx, action] = PLACEMENT_MASKS[f_idx].index(cells)
+    return table
+
+
+def reduced_rows(reduced, boards):
+    """Per board and figure: the reduced table's (value, action), rotated in from the representative."""
+    unrotated = _unrotated_actions()
+    reps = np.minimum(boards, rotate_boards(boards)).astype(np.int64)
+    rotated = boards != reps
+    values = np.empty((len(boards), TOTAL_FIGURES), dtype=np.float32)
+    actions = np.empty((len(boards), TOTAL_FIGURES), dtype=np.intp)
+    for f_idx in range(TOTAL_FIGURES):
+        g = np.where(rotated, ROTATED_FIGURES[f_idx], f_idx)
+        values[:, f_idx] = reduced.dsts[reps * TOTAL_FIGURES + g]
+        stored = reduced.actions[reps * TOTAL_FIGURES + g].astype(np.intp)
+        actions[:, f_idx] = np.where(rotated, unrotated[f_idx, stored], stored)
+    return values, actions
+
+
+def test_values_match(tables):
+    full, reduced, boards = tables
+    values, _ = reduced_rows(reduced, boards)
+    expected = full.dsts.reshape(-1, TOTAL_FIGURES)[boards]
+    np.testing.assert_allclose(values, expected, rtol=TOLERANCE)
+
+
+def test_actions_match_or_tie(tables):
+    full, reduced, boards = tables
+    _, actions = reduced_rows(reduced, boards)
+    expected = full.actions.reshape(-1, TOTAL_FIGURES)[boards].astype(np.intp)
+    # Differences are allowed only between equally good actions
+    rows, figures = np.nonzero(actions != expected)
+    dsts = full.dsts.reshape(-1, TOTAL_FIGURES)
+    ours = action_values(dsts, boards[rows], figures, actions[rows, figures])
+    theirs = action_values(dsts, boards[rows], figures, expected[rows, figures])
+    np.testing.assert_allclose(ours, theirs, rtol=TOLERANCE)
+
+
+def action_values(dsts, boards, figures, actions) -> np.ndarray:
+    """Expected moves after playing each action, from the full table."""
+    masks = _MASKS[figures, actions]
+    skip = actions == SKIP_ACTION
+    assert not ((masks == 0) & ~skip).any() and not (boards & masks).any(), "illegal action"
+    values = board_values_numpy(dsts[boards | masks])
+    values[skip] = skip_dsts_numpy(dsts[boards[skip]])
+    return values
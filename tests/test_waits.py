@@ -0,0 +1,80 @@
+"""UIWaiter on a fake clock: latencies recorded per transition and the adaptive 3 x p99 timeout."""
+import numpy as np
+import pytest
+
+from waits import MAX_TIMEOUT, MIN_SAMPLES, MIN_TIMEOUT, TIMEOUT_FACTOR, Clock, UIWaiter
+
+REGION = (0, 0, 4, 4)
+DEFAULT_TIMEOUT = 2.0
+
+
+class FakeClock(Clock):
+    """Time only moves when someone sleeps."""
+
+    def __init__(self):
+        self.time = 100.0
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, seconds: float):
+        self.time += seconds
+
+
+class Transition:
+    """A region that changes `latency` seconds after `trigger`."""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.changes_at = float("inf")
+
+    def trigger(self, latency: float) -> float:
+        self.changes_at = self.clock.now() + latency
+        return self.clock.now()
+
+    def grab(self, region) -> np.ndarray:
+        value = 255 if self.clock.now() >= self.changes_at else 0
+        return np.full((region[3], region[2], 3), value, dtype=np.uint8)
+
+
+def play(latencies):
+    """Wait for a transition once per latency; returns the waiter and the timeouts seen before each wait."""
+    clock = FakeClock()
+    transition = Transition(clock)
+    waiter = UIWaiter(transition.grab, poll_interval=0.01, clock=clock)
+    reference = transition.grab(REGION)
+    timeouts = []
+    for latency in latencies:
+        timeouts.append(waiter.tracker("dialog", DEFAULT_TIMEOUT).timeout)
+        start = transition.trigger(latency)
+        result = waiter.until_changed("dialog", REGION, reference, DEFAULT_TIMEOUT, start)
+        assert result.ok and result.elapsed == pytest.approx(latency, abs=0.011)
+        transition.changes_at = float("inf")
+    return waiter, timeouts
+
+
+@pytest.mark.parametrize("latencies, expected", [
+    (np.linspace(0.5, 1.0, MIN_SAMPLES), TIMEOUT_FACTOR * 1.0),   # 3 x p99
+    (np.linspace(0.05, 0.1, MIN_SAMPLES), MIN_TIMEOUT),            # clamped from below
+    (np.linspace(1.0, 1.9, MIN_SAMPLES), MAX_TIMEOUT),             # clamped from above
+])
+def test_timeout_adapts_after_min_samples(latencies, expected):
+    waiter, timeouts = play(latencies)
+    # The default holds until MIN_SAMPLES latencies are known
+    assert timeouts == [DEFAULT_TIMEOUT] * MIN_SAMPLES
+    tracker = waiter.trackers["dialog"]
+    p99 = float(np.quantile(tracker.samples, 0.99))
+    assert tracker.timeout == pytest.approx(min(max(TIMEOUT_FACTOR * p99, MIN_TIMEOUT), MAX_TIMEOUT),
+                                            abs=1e-9)
+    assert tracker.timeout == pytest.approx(expected, abs=TIMEOUT_FACTOR * 0.011)
+
+
+def test_wait_gives_up_at_the_adapted_timeout():
+    waiter, _ = play(np.linspace(0.5, 1.0, MIN_SAMPLES))
+    tracker = waiter.trackers["dialog"]
+    frame = waiter.grab(REGION)
+    result = waiter.until_changed("dialog", REGION, frame)  # the region never changes
+    assert not result.ok
+    assert result.elapsed == pytest.approx(tracker.timeout)
+    assert tracker.timeouts == 1
+    assert len(tracker.samples) == MIN_SAMPLES  # a timeout is not a latency sample
@@ -0,0 +1,324 @@
+"""
+The bot's game loop without the GUI.
+
+`JigsawBot` draws a piece from the chest, recognizes it, asks the solver
+for a move, places or discards the piece and keeps its `Jigsaw` memory in
+sync with the board on screen. Everything it touches from the outside is
+injected: screen pixels come from a `FrameSource`, clicks go to an
+`InputSink` and waits run on a `Clock`. `main.pyw` plugs in the Win32
+implementations; `utils/simulator.py` plugs in a simulated game, so the
+same loop can be run and measured headless.
+
+Each stage of a move is timed into `self.metrics` (`utils/metrics.py`):
+"click", "capture", "classify", "recognize", "board_read", "solve",
+"step" and one "wait.<name>" per UI transition.
+"""
+from typing import Callable, Optional, Tuple
+
+from jigsaw import Jigsaw, SKIP_ACTION
+from frames import FrameSource
+from inputs import InputSink
+from metrics import Metrics
+from recognition import BoardReader, PieceClassifier, ROWS, COLS
+from waits import Clock, UIWaiter, frame_difference
+
+CELL_SIZE = 32
+WAIT_BOX = 24       # Onay butonu çevresinde izlenen bölge (piksel)
+STATS_EVERY = 50    # Bekleme istatistikleri kaç hamlede bir yazılır
+ROUND_PAUSE = 1.5   # Tur bittikten sonra yeni tahtanın gelmesi için
+STRAY_RETRIES = 2   # Açık diyalog sanılan kare kaç başarısız denemede unutulur
+
+
+class JigsawBot:
+    """
+    One bot playing one game window. `chest_offset` and `yes_offset` are
+    the chest and confirm buttons relative to the board's top-left corner
+    (`bot_config.OFF_BTN_CHEST`, `bot_config.OFF_BTN_YES_ADD`).
+    """
+
+    def __init__(self, frames: FrameSource, mouse: InputSink, classifier: PieceClassifier,
+                 chest_offset: Tuple[int, int], yes_offset: Tuple[int, int],
+                 cell_size: int = CELL_SIZE, clock: Clock = None,
+                 log: Callable[[str, str], None] = None, metrics: Metrics = None):
+        self.frames = frames
+        self.mouse = mouse
+        self.classifier = classifier
+        self.chest_offset = chest_offset
+        self.yes_offset = yes_offset
+        self.cell_size = cell_size
+        self.clock = clock or Clock()
+        self.log = log or (lambda message, tag="text": None)
+        self.metrics = metrics or Metrics(self.clock)
+        self.board_reader = BoardReader(cell_size)
+        self.waiter = UIWaiter(self.grab_region, clock=self.clock, on_wait=self.record_wait)
+
+        self.ref_x, self.ref_y = 0, 0
+        self.dialog_yes = None  # Onay butonunun diyalog açıkken görüntüsü
+        self.stray_failures = 0
+        self.game_memory: Optional[Jigsaw] = None
+        self.moves = 0
+        self.unrecognized = 0
+        self.resyncs = 0
+        self.rounds = 0
+
+    def calibrate(self, x: int, y: int):
+        self.ref_x, self.ref_y = x, y
+        self.board_reader = BoardReader(self.cell_size)  # Yeni konum: boş tahta referansı yeniden alınır
+
+    # --- KONUMLAR ---
+    def chest_point(self):
+        return self.ref_x + self.chest_offset[0], self.ref_y + self.chest_offset[1]
+
+    def yes_point(self):
+        return self.ref_x + self.yes_offset[0], self.ref_y + self.yes_offset[1]
+
+    def cell_point(self, action):
+        col, row = (action >> 2) & 0x0F, action & 0x03
+        return self.ref_x + (col * self.cell_size), self.ref_y + (row * self.cell_size)
+
+    def cursor_point(self):
+        # Parça imlecin ortasında: F1 noktası + yarım hücre
+        return self.ref_x + self.cell_size // 2, self.ref_y + self.cell_size // 2
+
+    # --- GİRDİ / EKRAN ---
+    def click(self, x, y, button='left'):
+        with self.metrics.time("click"):
+            return self.mouse.click(x, y, button)
+
+    def grab_region(self, region):
+        # Kalıcı tamponlardan kopyasız görüntü: saklanacaksa .copy() gerekir
+        with self.metrics.time("capture"):
+            return self.frames.grab(region)
+
+    def record_wait(self, name, result):
+        self.metrics.record(f"wait.{name}", result.elapsed)
+        if not result.ok:
+            self.metrics.count(f"timeouts.{name}")
+
+    # --- EKRAN BEKLEMELERİ ---
+
+    def yes_region(self):
+        yx, yy = self.yes_point()
+        return (int(yx) - WAIT_BOX // 2, int(yy) - WAIT_BOX // 2, WAIT_BOX, WAIT_BOX)
+
+    def park_cursor(self):
+        # İmleci sandığa çek: onay butonunu ve tahtayı örtmesin
+        self.mouse.move(*self.chest_point())
+
+    def wait_changed(self, name, region, reference, default_timeout, start=None):
+        result = self.waiter.until_changed(name, region, reference, default_timeout, start)
+        if not result.ok:
+            self.log(f"Zaman aşımı: {name} ({result.elapsed:.2f} sn)", "warning")
+        return result
+
+    def wait_dialog_closed(self, idle_yes, dialog, start):
+        # Onaydan sonra imleci çek, diyalog görüntüsü kaybolana kadar bekle.
+        # Diyalogun altındaki hücreler bu hamleyle dolmuş olabilir: butonun
+        # eski haline dönmesi ancak diyalog hiç görülmediyse beklenir
+        self.park_cursor()
+        if dialog is not None:
+            closed = lambda frame: frame_difference(frame, dialog) > self.waiter.threshold
+        else:
+            closed = lambda frame: frame_difference(frame, idle_yes) <= self.waiter.threshold
+        result = self.waiter.wait_for("kapanış", self.yes_region(), closed, 0.8, start)
+        if not result.ok:
+            self.log(f"Zaman aşımı: kapanış ({result.elapsed:.2f} sn)", "warning")
+        return result.ok
+
+    def confirm(self, yes_region, idle_yes, opened):
+        # Evet'e bas ve diyalogun kapanmasını bekle
+        dialog = self.grab_region(yes_region).copy() if opened.ok else None
+        clicked = self.click(*self.yes_point())
+        if self.wait_dialog_closed(idle_yes, dialog, clicked) and dialog is not None:
+            # Evet'le kaybolduğu görüldü: bu kare gerçekten diyalog
+            self.dialog_yes = dialog
+
+    def close_stray_dialog(self):
+        # Düşen bir onay tıklaması diyalogu açık bırakmış olabilir: tahtayı
+        # örter ve sandık tıklamasını engeller. Önce onu kapat
+        if self.dialog_yes is None:
+            return False
+        self.park_cursor()
+        if frame_difference(self.grab_region(self.yes_region()), self.dialog_yes) > self.waiter.threshold:
+            return False
+        self.log("Açık kalan diyalog kapatılıyor", "warning")
+        clicked = self.click(*self.yes_point())
+        if self.wait_dialog_closed(None, self.dialog_yes, clicked):
+            self.stray_failures = 0
+        else:
+            # Üst üste kapanmıyorsa kaydedilen kare diyalog değil: unut, yeniden öğrenilir
+            self.stray_failures += 1
+            if self.stray_failures >= STRAY_RETRIES:
+                self.dialog_yes, self.stray_failures = None, 0
+        return True
+
+    def dismiss_covering_dialog(self):
+        # Yeni tur başladı ama tahta dolu okunuyor: tahtayı açık kalan bir
+        # diyalog örtüyor olabilir. Evet'e bas (diyalog yoksa oyun yok sayar)
+        self.log("Tahta dolu görünüyor, diyalog kapatılıyor", "warning")
+        clicked = self.click(*self.yes_point())
+        self.wait_dialog_closed(None, self.grab_region(self.yes_region()).copy(), clicked)
+
+    # --- PARÇA TANIMA ---
+    def classify(self, frame):
+        with self.metrics.time("classify"):
+            return self.classifier.classify(frame)
+
+    def recognize_piece(self):
+        with self.metrics.time("recognize"):
+            return self._recognize_piece()
+
+    def _recognize_piece(self):
+        # İmleç F1 noktasında (+16 piksel ortada): parça imlece gelip
+        # güvenle tanınana kadar bölgeyi izle
+        region = (int(self.ref_x), int(self.ref_y), self.cell_size, self.cell_size)
+        try:
+            result = self.waiter.wait_for(
+                "parça", region, lambda frame: self.classify(frame).piece is not None, 0.65)
+        except: return None
+
+        # Tüm şablonlar tek geçişte puanlanır, belirsiz kareler reddedilir
+        match = self.classify(result.frame)
+        if match.piece is None and match.score > self.classifier.min_score:
+            self.log(f"Belirsiz parça (skor {match.score:.2f}, fark {match.margin:.2f})", "warning")
+        return match.piece
+
+    def log_wait_stats(self):
+        # Gözlenen tepki süreleri (p50/p95) ve uyarlanan zaman aşımları
+        for name, stats in self.waiter.summary().items():
+            self.log(f"{name}: p50 {stats['p50'] * 1000:.0f} ms, p95 {stats['p95'] * 1000:.0f} ms, "
+                     f"limit {stats['timeout']:.2f} sn", "system")
+
+    # --- TAHTA OKUMA ---
+    def capture_board(self):
+        return self.grab_region((int(self.ref_x), int(self.ref_y),
+                                 COLS * self.cell_size, ROWS * self.cell_size))
+
+    def sync_board(self, game_memory):
+        # İmleci tahtanın dışına (sandığa) çek ki hücreleri örtmesin
+        self.park_cursor()
+        self.apply_board(game_memory, self.observe_board(game_memory.board, game_memory.round))
+
+    def observe_board(self, board, round_num):
+        """The board read from the screen when it reliably differs from `board`, else None."""
+        with self.metrics.time("board_read"):
+            return self._observe_board(board, round_num)
+
+    def _observe_board(self, board, round_num):
+        reader = self.board_reader
+        try:
+            if round_num == 0 and not reader.calibrated:
+                # İlk tur başında tahta boştur: referans olarak kaydet. Referans
+                # konum değişene kadar saklanır; yanlış bir tur sonu onu bozamaz
+                reader.calibrate(self.capture_board())
+                return None
+            if not reader.calibrated:
+                return None
+            observed = reader.read(self.capture_board())
+            if observed == board:
+                return None
+            # Tek karelik bozulmaları düzeltme sebebi sayma: ikinci okuma da aynı olmalı
+            self.clock.sleep(0.05)
+            if reader.read(self.capture_board()) != observed:
+                return None
+        except:
+            return None
+        return observed
+
+    def apply_board(self, game_memory, observed):
+        if observed is None:
+            return
+        self.log(f"Tahta senkronize edildi ({bin(game_memory.board ^ observed).count('1')} hücre)", "warning")
+        game_memory.board = observed
+        self.resyncs += 1
+        self.metrics.count("resyncs")
+
+    # --- OYUN DÖNGÜSÜ ---
+    def end_round(self, game_memory):
+        """Start a new round if the (synced) memory is full; True when it was."""
+        if not game_memory.has_finished():
+            return False
+        if game_memory.round == 0:
+            self.dismiss_covering_dialog()
+        else:
+            self.log("Tur tamamlandı. Bekleniyor...", "system")
+            self.rounds += 1
+            self.metrics.count("rounds")
+            self.clock.sleep(ROUND_PAUSE)
+        self.game_memory = Jigsaw()
+        return True
+
+    def draw_piece(self, yes_region, idle_yes, clicked):
+        # 1. Sandık tıklandı: diyalog açılana kadar bekle
+        self.wait_changed("sandık", yes_region, idle_yes, 2.0, clicked)
+        # 2. Evet -> Parça Mouse'a, ardından F1'e git
+        self.click(*self.yes_point())
+        self.mouse.move(*self.cursor_point())
+
+    def play(self, game_memory, best_action, yes_region, idle_yes):
+        if best_action == SKIP_ACTION:
+            self.log("PAS GEÇİLİYOR", "warning")
+            # Sağ tık (köşedeyken)
+            clicked = self.click(*self.cursor_point(), button='right')
+            opened = self.wait_changed("onay", yes_region, idle_yes, 1.6, clicked)
+        else:
+            # 4. Hedef
+            tx, ty = self.cell_point(best_action)
+            self.log(f"Yerleştiriliyor: {(best_action >> 2) & 0x0F},{best_action & 0x03}", "action")
+            clicked = self.click(tx, ty)
+            self.park_cursor()
+            opened = self.wait_changed("onay", yes_region, idle_yes, 1.8, clicked)
+
+        # 5. Onay
+        self.confirm(yes_region, idle_yes, opened)
+        game_memory.perform_action(best_action)
+        self.moves += 1
+        self.metrics.mark("moves")
+        if self.moves % STATS_EVERY == 0:
+            self.log_wait_stats()
+
+    def discard_unrecognized(self, yes_region, idle_yes):
+        self.log("Parça Tanınamadı! Atlanıyor.", "error")
+        self.unrecognized += 1
+        self.metrics.count("unrecognized")
+        clicked = self.click(*self.cursor_point(), button='right')
+        opened = self.wait_changed("onay", yes_region, idle_yes, 1.6, clicked)
+        self.confirm(yes_region, idle_yes, opened)
+
+    def step(self, solver) -> bool:
+        """Play one chest draw; True when a piece was placed or skipped."""
+        with self.metrics.time("step"):
+            return self._step(solver)
+
+    def _step(self, solver) -> bool:
+        if self.game_memory is None: self.game_memory = Jigsaw()
+        game_memory = self.game_memory
+
+        if self.close_stray_dialog():
+            return False
+
+        # 0. Tahtayı oku, hafızayı doğrula (reddedilen bir yerleştirme
+        # hafızayı erkenden doldurmuş olabilir: tur sonu ekrandan teyit edilir)
+        self.sync_board(game_memory)
+        if self.end_round(game_memory):
+            return False
+
+        # 1-2. Sandık ve parça çekme
+        yes_region = self.yes_region()
+        idle_yes = self.grab_region(yes_region).copy()
+        self.draw_piece(yes_region, idle_yes, self.click(*self.chest_point()))
+
+        # 3. Tanı
+        piece_id = self.recognize_piece()
+        if piece_id is None:
+            self.discard_unrecognized(yes_region, idle_yes)
+            return False
+
+        game_memory.figure = piece_id
+        with self.metrics.time("solve"):
+            best_action = solver.solve(game_memory)
+        self.play(game_memory, best_action, yes_region, idle_yes)
+        return True
+
+    def close(self):
+        """Release the bot's worker threads (the sequential bot has none)."""
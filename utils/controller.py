@@ -0,0 +1,248 @@
+"""
+One controller, one bot process per game window.
+
+The controller loads the policy table once and publishes it in shared
+memory (`core/shared.py`). Every window gets a worker process that
+attaches to the table read-only, builds its own `PipelinedBot` on that
+window's calibration point and plays until told to stop. Workers report
+their moves, moves/hour and the time they needed to attach over a
+queue; the controller prints a summary, restarts workers that die and
+stops everything on Ctrl+C.
+
+All real windows share one cursor: a worker holds a lock shared across
+processes for each whole step of its bot (draw, place, confirm), so the
+action sequences of different windows never interleave.
+
+Usage:
+    python utils/controller.py --window 100,200 --window 700,200
+    python utils/controller.py --simulate 4 --duration 30     (headless, simulated windows)
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'core'))
+sys.path.append(os.path.join(ROOT, 'utils'))
+sys.path.append(ROOT)
+
+from shared import SharedPolicy, publish_solver
+
+STATUS_EVERY = 5.0    # seconds (bot clock) between two status reports of a worker
+RESTART_DELAY = 2.0   # seconds before a dead worker is started again
+REPORT_EVERY = 10.0   # seconds between two summaries of the controller
+STOP_TIMEOUT = 5.0    # seconds a worker gets to stop before it is terminated
+
+
+class WindowSpec(NamedTuple):
+    """One game window: its calibration point (board's top-left corner)."""
+    name: str
+    origin: Tuple[int, int]
+    simulated: bool = False
+    seed: int = 0
+
+
+class WorkerStatus(NamedTuple):
+    name: str
+    moves: int
+    moves_per_hour: float
+    resyncs: int
+    unrecognized: int
+    attach_ms: float
+    done: bool = False
+
+
+def make_window_bot(spec: WindowSpec, log):
+    """The bot of one window: the real screen and cursor, or a simulated game."""
+    from recognition import PieceClassifier
+    from pipeline import PipelinedBot
+    asset_path = os.path.join(ROOT, 'assets')
+    if spec.simulated:
+        from simulator import AcceleratedClock, GameSimulator, make_bot
+        return make_bot(GameSimulator(clock=AcceleratedClock(), seed=spec.seed), asset_path, log)
+
+    import bot_config
+    from bot import CELL_SIZE
+    from frames import GdiFrameSource
+    from inputs import Win32Input
+    bot = PipelinedBot(GdiFrameSource(), Win32Input(),
+                       PieceClassifier(asset_path), bot_config.OFF_BTN_CHEST,
+                       bot_config.OFF_BTN_YES_ADD, CELL_SIZE, log=log)
+    bot.calibrate(*spec.origin)
+    return bot
+
+
+def play_step(bot, solver, input_lock) -> bool:
+    """
+    One step of `bot` with the cursor to itself: between the chest click
+    and the confirmation the piece rides on the cursor, so a single move
+    of another window's bot in between would break the sequence.
+    """
+    with input_lock:
+        return bot.step(solver)
+
+
+def worker_main(spec: WindowSpec, policy_name: str, input_lock, status, stop, verbose: bool = False):
+    """Entry point of a worker process: attach to the table and play one window."""
+    start = time.perf_counter()
+    policy = SharedPolicy.attach(policy_name)
+    attach_ms = (time.perf_counter() - start) * 1000
+
+    def log(message, tag="text"):
+        if verbose or tag in ("error", "system"):
+            status.put(("log", spec.name, message, tag))
+
+    bot = make_window_bot(spec, log)
+
+    def report(done=False):
+        status.put(("status", WorkerStatus(spec.name, bot.moves, bot.metrics.per_hour("moves"),
+                                           bot.resyncs, bot.unrecognized, attach_ms, done)))
+
+    last = bot.clock.now()
+    report()
+    try:
+        while not stop.is_set():
+            play_step(bot, policy, input_lock)
+            if bot.clock.now() - last >= STATUS_EVERY:
+                report()
+                last = bot.clock.now()
+        report(done=True)
+    finally:
+        bot.close()
+        policy.close()
+
+
+class BotController:
+    """Starts, supervises and stops one worker process per window."""
+
+    def __init__(self, windows: List[WindowSpec], policy: SharedPolicy, verbose: bool = False):
+        # spawn: the only start method on Windows, and the same behaviour everywhere
+        self.ctx = multiprocessing.get_context("spawn")
+        self.windows = {spec.name: spec for spec in windows}
+        self.policy = policy
+        self.verbose = verbose
+        self.status = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.input_lock = self.ctx.Lock()
+        self.workers: Dict[str, multiprocessing.Process] = {}
+        self.latest: Dict[str, WorkerStatus] = {}
+        self.restarts: Dict[str, int] = {name: 0 for name in self.windows}
+        self.died_at: Dict[str, float] = {}
+
+    def start(self):
+        for spec in self.windows.values():
+            self._spawn(spec)
+
+    def _spawn(self, spec: WindowSpec):
+        process = self.ctx.Process(
+            target=worker_main, name=f"bot-{spec.name}", daemon=True,
+            args=(spec, self.policy.name, self.input_lock, self.status, self.stop_event, self.verbose))
+        process.start()
+        self.workers[spec.name] = process
+
+    def poll(self, timeout: float = 0.5):
+        """Take in the workers' messages and restart the ones that died."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                message = self.status.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                break
+            if message[0] == "status":
+                self.latest[message[1].name] = message[1]
+            else:
+                _, name, text, tag = message
+                print(f"[{name}] {text}")
+        if self.stop_event.is_set():
+            return
+        now = time.monotonic()
+        for name, process in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            died = self.died_at.setdefault(name, now)
+            if now - died >= RESTART_DELAY:
+                print(f"[{name}] worker exited ({process.exitcode}), restarting")
+                del self.died_at[name]
+                self.restarts[name] += 1
+                self._spawn(self.windows[name])
+
+    def summary(self) -> str:
+        lines = []
+        for name in self.windows:
+            s = self.latest.get(name)
+            if s is None:
+                lines.append(f"{name:>8}: starting")
+                continue
+            lines.append(f"{name:>8}: {s.moves:6} moves, {s.moves_per_hour:7.0f}/h, "
+                         f"{s.resyncs} resyncs, {s.unrecognized} unrecognized, "
+                         f"attach {s.attach_ms:.1f} ms, {self.restarts[name]} restarts")
+        total = sum(s.moves_per_hour for s in self.latest.values())
+        lines.append(f"{'total':>8}: {total:.0f} moves/h")
+        return "\n".join(lines)
+
+    def run(self, duration: float = None, report_every: float = REPORT_EVERY):
+        """Supervise until `duration` seconds passed (forever by default) or Ctrl+C."""
+        self.start()
+        start = last_report = time.monotonic()
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                self.poll()
+                if time.monotonic() - last_report >= report_every:
+                    print(self.summary())
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+        print(self.summary())
+
+    def stop(self, timeout: float = STOP_TIMEOUT):
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self.workers.values():
+            while process.is_alive() and time.monotonic() < deadline:
+                self.poll(0.1)  # keep draining: a worker blocked on a full queue cannot exit
+                process.join(0.05)
+            if process.is_alive():
+                process.terminate()
+        self.poll(0.1)
+
+
+def parse_point(text: str) -> Tuple[int, int]:
+    x, y = text.split(",")
+    return int(x), int(y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--window", type=parse_point, action="append", default=[], metavar="X,Y",
+                        help="calibration point of a game window (repeat for each window)")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N",
+                        help="add N simulated windows")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--report-every", type=float, default=REPORT_EVERY)
+    parser.add_argument("--verbose", action="store_true", help="forward every log line of the bots")
+    args = parser.parse_args()
+
+    windows = [WindowSpec(f"w{i + 1}", origin) for i, origin in enumerate(args.window)]
+    windows += [WindowSpec(f"sim{i + 1}", (0, 0), simulated=True, seed=i) for i in range(args.simulate)]
+    if not windows:
+        parser.error("no windows: pass --window X,Y or --simulate N")
+
+    start = time.perf_counter()
+    policy = publish_solver()
+    print(f"Policy published as {policy.name} ({policy.shm.size / 2**20:.1f} MB) "
+          f"in {time.perf_counter() - start:.2f} s")
+    try:
+        BotController(windows, policy, args.verbose).run(args.duration, args.report_every)
+    finally:
+        policy.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Frame sources: where the bot's screen pixels come from.
+
+Every source hands out BGR regions of interest as NumPy views into a
+buffer it owns, so a grab does not allocate or copy the frame. A view
+stays valid until the next grab of the same size from the same source;
+callers that keep a frame around (e.g. a reference for a later
+comparison) must `.copy()` it.
+
+- `GdiFrameSource`: live capture through the Win32 GDI, of the screen or
+  of one window. Device contexts and DIB sections are created once and
+  reused; the screen is blitted straight into the DIB section's pixel
+  memory, which is the NumPy buffer handed out.
+- `ReplayFrameSource`: recorded frames from an image, a directory of
+  images, a video file or in-memory arrays, for running the recognition
+  pipeline offline (benchmarks, tests, Linux).
+"""
+import ctypes
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+Region = Tuple[int, int, int, int]  # (left, top, width, height)
+
+IMAGE_EXTENSIONS = (".png", ".bmp", ".jpg", ".jpeg")
+
+
+class FrameSource(ABC):
+    """Interface for anything that can return a region of the screen."""
+
+    @abstractmethod
+    def grab(self, region: Region) -> np.ndarray:
+        """BGR pixels of `region` as an (height, width, 3) view."""
+
+    def close(self):
+        """Release the resources held by the source."""
+
+    def __enter__(self) -> 'FrameSource':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _BitmapInfoHeader(ctypes.Structure):
+    _fields_ = [
+        ("biSize", ctypes.c_uint32), ("biWidth", ctypes.c_int32), ("biHeight", ctypes.c_int32),
+        ("biPlanes", ctypes.c_uint16), ("biBitCount", ctypes.c_uint16),
+        ("biCompression", ctypes.c_uint32), ("biSizeImage", ctypes.c_uint32),
+        ("biXPelsPerMeter", ctypes.c_int32), ("biYPelsPerMeter", ctypes.c_int32),
+        ("biClrUsed", ctypes.c_uint32), ("biClrImportant", ctypes.c_uint32),
+    ]
+
+
+SRCCOPY = 0x00CC0020
+DIB_RGB_COLORS = 0
+
+
+def _load_gdi():
+    """user32/gdi32 with handle-sized prototypes (private copies, globals untouched)."""
+    from ctypes import wintypes
+    user32, gdi32 = ctypes.WinDLL("user32"), ctypes.WinDLL("gdi32")
+    for function in (user32.GetDC, user32.GetWindowDC):
+        function.argtypes, function.restype = [wintypes.HWND], wintypes.HDC
+    user32.ReleaseDC.argtypes = [wintypes.HWND, wintypes.HDC]
+    gdi32.CreateCompatibleDC.argtypes, gdi32.CreateCompatibleDC.restype = [wintypes.HDC], wintypes.HDC
+    gdi32.CreateDIBSection.argtypes = [wintypes.HDC, ctypes.c_void_p, wintypes.UINT,
+                                       ctypes.POINTER(ctypes.c_void_p), wintypes.HANDLE, wintypes.DWORD]
+    gdi32.CreateDIBSection.restype = wintypes.HBITMAP
+    gdi32.SelectObject.argtypes = [wintypes.HDC, wintypes.HGDIOBJ]
+    gdi32.SelectObject.restype = wintypes.HGDIOBJ
+    gdi32.BitBlt.argtypes = [wintypes.HDC] + [ctypes.c_int] * 4 + [wintypes.HDC] + [ctypes.c_int] * 2 + [wintypes.DWORD]
+    gdi32.DeleteObject.argtypes = [wintypes.HGDIOBJ]
+    gdi32.DeleteDC.argtypes = [wintypes.HDC]
+    return user32, gdi32
+
+
+class _Surface:
+    """
+    A 32-bit top-down DIB section of one size. `pixels` views the
+    section's own memory: what is blitted into it is the array.
+    """
+
+    def __init__(self, gdi32, src_dc, width: int, height: int):
+        header = _BitmapInfoHeader()
+        header.biSize = ctypes.sizeof(_BitmapInfoHeader)
+        header.biWidth = width
+        header.biHeight = -height  # top-down rows, like NumPy
+        header.biPlanes = 1
+        header.biBitCount = 32
+        bits = ctypes.c_void_p()
+        self.bitmap = gdi32.CreateDIBSection(src_dc, ctypes.byref(header), DIB_RGB_COLORS,
+                                             ctypes.byref(bits), None, 0)
+        if not self.bitmap or not bits.value:
+            raise ctypes.WinError()
+        # 32-bit rows are DWORD aligned already: no stride padding
+        buffer = (ctypes.c_uint8 * (width * height * 4)).from_address(bits.value)
+        self.pixels = np.ctypeslib.as_array(buffer).reshape(height, width, 4)
+
+
+class GdiFrameSource(FrameSource):
+    """
+    Captures the screen (`hwnd=0`, screen coordinates) or a window
+    (`hwnd`, coordinates relative to the window) through the GDI.
+    One DIB section is kept per requested region size; the frames it
+    returned are invalid after `close()`.
+    """
+
+    def __init__(self, hwnd: int = 0):
+        self._user32, self._gdi32 = _load_gdi()
+        self.hwnd = hwnd
+        self._src_dc = self._user32.GetWindowDC(hwnd) if hwnd else self._user32.GetDC(0)
+        self._mem_dc = self._gdi32.CreateCompatibleDC(self._src_dc)
+        self._surfaces: Dict[Tuple[int, int], _Surface] = {}
+        self._selected = None   # surface currently selected into the memory DC
+        self._default = None    # the DC's original bitmap, selected back on close
+
+    def grab(self, region: Region) -> np.ndarray:
+        left, top, width, height = (int(v) for v in region)
+        surface = self._surfaces.get((width, height))
+        if surface is None:
+            surface = self._surfaces[(width, height)] = _Surface(
+                self._gdi32, self._src_dc, width, height)
+
+        if surface is not self._selected:
+            previous = self._gdi32.SelectObject(self._mem_dc, surface.bitmap)
+            if self._default is None:
+                self._default = previous
+            self._selected = surface
+        self._gdi32.BitBlt(self._mem_dc, 0, 0, width, height,
+                           self._src_dc, left, top, SRCCOPY)
+        # GDI may batch the blit: finish it before the CPU reads the section
+        self._gdi32.GdiFlush()
+        # BGRA -> BGR without copying
+        return surface.pixels[..., :3]
+
+    def close(self):
+        if self._default is not None:
+            # A bitmap still selected into a DC cannot be deleted
+            self._gdi32.SelectObject(self._mem_dc, self._default)
+            self._default = self._selected = None
+        for surface in self._surfaces.values():
+            self._gdi32.DeleteObject(surface.bitmap)
+        self._surfaces.clear()
+        if self._mem_dc:
+            self._gdi32.DeleteDC(self._mem_dc)
+            self._user32.ReleaseDC(self.hwnd, self._src_dc)
+            self._mem_dc = None
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    Plays back recorded frames. `origin` is the screen position of the
+    frames' top-left pixel, so regions use the same screen coordinates
+    as live capture. `advance()` moves to the next frame.
+    """
+
+    def __init__(self, frames: Union[str, Sequence[np.ndarray]],
+                 origin: Tuple[int, int] = (0, 0), loop: bool = False):
+        self.origin = origin
+        self.loop = loop
+        self._video = None
+        self._frames: List[np.ndarray] = []
+        self.index = 0
+
+        if isinstance(frames, str):
+            if os.path.isdir(frames):
+                names = sorted(name for name in os.listdir(frames)
+                               if name.lower().endswith(IMAGE_EXTENSIONS))
+                self._frames = [cv2.imread(os.path.join(frames, name), cv2.IMREAD_COLOR)
+                                for name in names]
+            elif frames.lower().endswith(IMAGE_EXTENSIONS):
+                self._frames = [cv2.imread(frames, cv2.IMREAD_COLOR)]
+            else:
+                self._video = cv2.VideoCapture(frames)
+                if not self._video.isOpened():
+                    raise FileNotFoundError(f"Cannot open video: {frames}")
+        else:
+            self._frames = [np.asarray(frame) for frame in frames]
+
+        if self._video is None and not self._frames:
+            raise ValueError("No frames to replay")
+        self.frame = self._frames[0] if self._video is None else None
+        if self._video is not None and not self.advance():
+            raise ValueError("Video has no frames")
+        self.index = 0
+
+    def advance(self) -> bool:
+        """Move to the next frame; False at the end (unless looping)."""
+        if self._video is not None:
+            ok, frame = self._video.read(self.frame)
+            if not ok and self.loop:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self._video.read(self.frame)
+                self.index = -1
+            if not ok:
+                return False
+            self.frame = frame
+        else:
+            if self.index + 1 >= len(self._frames):
+                if not self.loop:
+                    return False
+                self.index = -1
+            self.frame = self._frames[self.index + 1]
+        self.index += 1
+        return True
+
+    def grab(self, region: Region) -> np.ndarray:
+        left, top, width, height = (int(v) for v in region)
+        x, y = left - self.origin[0], top - self.origin[1]
+        if x < 0 or y < 0 or y + height > self.frame.shape[0] or x + width > self.frame.shape[1]:
+            raise ValueError(f"Region {region} is outside the recorded frame")
+        return self.frame[y:y + height, x:x + width]
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
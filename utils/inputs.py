@@ -0,0 +1,75 @@
+"""
+Input sinks: where the bot's mouse actions go.
+
+- `Win32Input`: the real cursor, moved with SetCursorPos and clicked with
+  SendInput (hardware-like events the game client accepts).
+- `utils/simulator.py` provides a sink that feeds the clicks to a
+  simulated game instead, so the bot loop runs without Windows.
+"""
+import ctypes
+import time
+from abc import ABC, abstractmethod
+
+CLICK_HOVER = 0.05  # cursor rests on the target before the press, so the game registers it
+CLICK_HOLD = 0.05   # time between button down and up
+
+MOUSEEVENTF_LEFTDOWN, MOUSEEVENTF_LEFTUP = 0x0002, 0x0004
+MOUSEEVENTF_RIGHTDOWN, MOUSEEVENTF_RIGHTUP = 0x0008, 0x0010
+
+
+class InputSink(ABC):
+    """Interface for anything that can move the cursor and click."""
+
+    @abstractmethod
+    def move(self, x: int, y: int):
+        """Put the cursor at screen position (x, y)."""
+
+    @abstractmethod
+    def click(self, x: int, y: int, button: str = 'left') -> float:
+        """Click at (x, y); returns when the button was released (`Clock.now()` time)."""
+
+
+PUL = ctypes.POINTER(ctypes.c_ulong)
+
+
+class MouseInput(ctypes.Structure):
+    _fields_ = [("dx", ctypes.c_long), ("dy", ctypes.c_long), ("mouseData", ctypes.c_ulong),
+                ("dwFlags", ctypes.c_ulong), ("time", ctypes.c_ulong), ("dwExtraInfo", PUL)]
+
+
+class Input_I(ctypes.Union):
+    _fields_ = [("mi", MouseInput)]
+
+
+class Input(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_ulong), ("ii", Input_I)]
+
+
+def SendInput(*inputs):
+    return ctypes.windll.user32.SendInput(len(inputs), (Input * len(inputs))(*inputs), ctypes.sizeof(Input))
+
+
+class Win32Input(InputSink):
+    """The real mouse (Windows only)."""
+
+    def move(self, x: int, y: int):
+        ctypes.windll.user32.SetCursorPos(int(x), int(y))
+
+    def click(self, x: int, y: int, button: str = 'left') -> float:
+        self.move(x, y)
+        time.sleep(CLICK_HOVER)
+
+        extra = ctypes.c_ulong(0)
+        ii_ = Input_I()
+        down = MOUSEEVENTF_LEFTDOWN if button == 'left' else MOUSEEVENTF_RIGHTDOWN
+        up = MOUSEEVENTF_LEFTUP if button == 'left' else MOUSEEVENTF_RIGHTUP
+
+        ii_.mi = MouseInput(0, 0, 0, down, 0, ctypes.pointer(extra))
+        SendInput(Input(ctypes.c_ulong(0), ii_))
+        time.sleep(CLICK_HOLD)
+
+        ii_.mi = MouseInput(0, 0, 0, up, 0, ctypes.pointer(extra))
+        SendInput(Input(ctypes.c_ulong(0), ii_))
+        # No fixed sleep: callers wait for the click's effect on screen (UIWaiter)
+        return time.perf_counter()
+
@@ -0,0 +1,99 @@
+"""
+Thread-safe, bounded log sink for the GUI.
+
+The bot and the solver loader log from worker threads, but Tk widgets may
+only be touched from the main loop. `LogSink` is called like the bot's
+`log(message, tag)` callback from any thread: the message is appended to
+a bounded deque and the Tk main loop takes it out in batches with `drain`
+(scheduled with `root.after`). If the GUI falls behind, the oldest
+pending messages are dropped instead of piling up; the next batch starts
+with a "N messages dropped" line.
+
+With `file_path` every message is also written to a rotating file log
+(`logging.handlers.RotatingFileHandler`), so a multi-day session keeps a
+bounded history on disk as well. The writes happen on a dedicated writer
+thread, fed from the producer side: the Tk main loop never waits for the
+disk, and the file keeps the messages the GUI dropped.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Deque, List, Optional, Tuple
+
+MAX_PENDING = 5000          # messages waiting for the main loop
+DRAIN_BATCH = 200           # messages handled per drain
+FILE_MAX_BYTES = 1 << 20    # size of one log file before it is rotated
+FILE_BACKUPS = 3            # rotated files kept next to the current one
+
+# GUI tag -> logging level of the file log
+LEVELS = {"error": logging.ERROR, "warning": logging.WARNING}
+
+DROPPED_MESSAGE = "{} messages dropped"
+
+Entry = Tuple[float, str, str]  # (time.time(), message, tag)
+
+
+class LogSink:
+    """Collects log messages from any thread; the GUI thread drains them."""
+
+    def __init__(self, max_pending: int = MAX_PENDING, file_path: str = None,
+                 max_bytes: int = FILE_MAX_BYTES, backups: int = FILE_BACKUPS):
+        self.pending: Deque[Entry] = deque(maxlen=max_pending)
+        self.dropped = 0  # evicted since the last drain
+        self._lock = threading.Lock()
+        self.file: Optional[RotatingFileHandler] = None
+        self._writes: "queue.SimpleQueue[Optional[Entry]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        if file_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+            self.file = RotatingFileHandler(file_path, maxBytes=max_bytes,
+                                            backupCount=backups, encoding="utf-8")
+            self.file.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+            self._writer = threading.Thread(target=self._write_loop, name="log-writer",
+                                            daemon=True)
+            self._writer.start()
+
+    def __call__(self, message: str, tag: str = "text"):
+        entry = (time.time(), message, tag)
+        with self._lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(entry)
+        if self._writer is not None:
+            self._writes.put(entry)
+
+    def drain(self, limit: int = DRAIN_BATCH) -> List[Entry]:
+        """Take up to `limit` pending messages (oldest first), after a line for the dropped ones."""
+        batch = []
+        with self._lock:
+            if self.dropped:
+                batch.append((time.time(), DROPPED_MESSAGE.format(self.dropped), "warning"))
+                self.dropped = 0
+            while self.pending and len(batch) < limit:
+                batch.append(self.pending.popleft())
+        return batch
+
+    def _write_loop(self):
+        """Writer thread: hand every message to the rotating file log, until `close`."""
+        while True:
+            entry = self._writes.get()
+            if entry is None:
+                return
+            created, message, tag = entry
+            record = logging.LogRecord("jigsaw", LEVELS.get(tag, logging.INFO), "", 0,
+                                       message, None, None)
+            record.created = created
+            record.msecs = (created % 1) * 1000
+            self.file.handle(record)
+
+    def close(self):
+        """Write the messages still queued for the file log and close it."""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+            self.file.close()
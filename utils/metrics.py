@@ -0,0 +1,232 @@
+"""
+Per-stage latency metrics for the bot.
+
+Every stage of a move (clicks, screen captures, template matching, board
+reads, solver lookups, UI waits) records its duration into a
+`LatencyHistogram`: fixed log-spaced buckets, so recording is O(1) and
+memory does not grow with the run length. Quantiles (p50/p95/p99) are
+read from the buckets with ~5% relative error, which is plenty to tell
+a slow click from a slow screenshot.
+
+`Metrics` is the registry one bot writes to. It also counts events,
+holds gauges (e.g. the DP time per height) and measures moves/hour over
+a sliding window. `Metrics.export` writes a snapshot as CSV or in the
+Prometheus text format (`.prom`, e.g. for node_exporter's textfile
+collector); the file is replaced atomically.
+"""
+import math
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Tuple
+
+from waits import Clock
+
+MIN_LATENCY = 1e-5       # first bucket's upper bound (10 µs)
+BUCKETS_PER_DOUBLING = 8  # bucket width: 2**(1/8) ≈ 9% -> quantiles within ~5%
+BUCKET_COUNT = 8 * 25     # up to MIN_LATENCY * 2**25 ≈ 335 s
+RATE_WINDOW = 200        # events the moves/hour rate is measured over
+QUANTILES = (0.50, 0.95, 0.99)
+PROMETHEUS_PREFIX = "jigsaw"
+
+GaugeKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class LatencyHistogram:
+    """Durations of one stage in log-spaced buckets. Thread-safe."""
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def bucket(seconds: float) -> int:
+        if seconds <= MIN_LATENCY:
+            return 0
+        index = math.ceil(math.log2(seconds / MIN_LATENCY) * BUCKETS_PER_DOUBLING)
+        return min(index, BUCKET_COUNT - 1)
+
+    @staticmethod
+    def bucket_value(index: int) -> float:
+        """Representative duration of a bucket: the geometric middle of its bounds."""
+        return MIN_LATENCY * 2 ** ((index - 0.5) / BUCKETS_PER_DOUBLING)
+
+    def record(self, seconds: float):
+        index = self.bucket(seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Duration quantile (0 while empty), never above the largest sample."""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for index, n in enumerate(self.counts):
+                seen += n
+                if n and seen >= rank:
+                    return min(self.bucket_value(index), self.max)
+            return self.max
+
+    def summary(self) -> Dict[str, float]:
+        stats = {"count": self.count, "mean": self.mean, "max": self.max, "sum": self.total}
+        for q in QUANTILES:
+            stats[f"p{round(q * 100)}"] = self.quantile(q)
+        return stats
+
+
+class RateMeter:
+    """Events per hour over the last `window` events."""
+
+    def __init__(self, window: int = RATE_WINDOW):
+        self.times: Deque[float] = deque(maxlen=window)
+
+    def mark(self, now: float):
+        self.times.append(now)
+
+    def per_hour(self) -> float:
+        if len(self.times) < 2 or self.times[-1] <= self.times[0]:
+            return 0.0
+        return (len(self.times) - 1) * 3600.0 / (self.times[-1] - self.times[0])
+
+
+class Metrics:
+    """
+    Histograms, counters, gauges and rates of one bot. Stage names are
+    free-form (the UI waits use their Turkish names); `export` turns
+    them into labels.
+    """
+
+    def __init__(self, clock: Clock = None):
+        self.clock = clock or Clock()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[GaugeKey, float] = {}
+        self.rates: Dict[str, RateMeter] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name: str, seconds: float):
+        self.histogram(name).record(seconds)
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """Record how long the `with` block took under `name`."""
+        histogram = self.histogram(name)
+        start = self.clock.now()
+        try:
+            yield
+        finally:
+            histogram.record(self.clock.now() - start)
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def mark(self, name: str):
+        """Count one `name` event and feed it to the event's rate."""
+        self.count(name)
+        with self._lock:
+            meter = self.rates.setdefault(name, RateMeter())
+            meter.mark(self.clock.now())
+
+    def per_hour(self, name: str) -> float:
+        meter = self.rates.get(name)
+        return meter.per_hour() if meter else 0.0
+
+    def gauge(self, name: str, value: float, **labels: str):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def breakdown(self, top: int = None) -> List[Tuple[str, Dict[str, float]]]:
+        """Stage summaries, the stages that took the most time in total first."""
+        stages = [(name, h.summary()) for name, h in list(self.histograms.items()) if h.count]
+        stages.sort(key=lambda item: item[1]["sum"], reverse=True)
+        return stages[:top]
+
+    # --- EXPORT ---
+    def export(self, path: str):
+        """Write a snapshot to `path`: Prometheus text for `.prom`/`.txt`, CSV otherwise."""
+        if path.endswith((".prom", ".txt")):
+            text = self.prometheus_text()
+        else:
+            text = self.csv_text()
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def csv_text(self) -> str:
+        lines = ["kind,name,labels,count,mean,p50,p95,p99,max,value"]
+        for name, s in self.breakdown():
+            lines.append(f"histogram,{_csv(name)},,{s['count']},{s['mean']:.6f},{s['p50']:.6f},"
+                         f"{s['p95']:.6f},{s['p99']:.6f},{s['max']:.6f},")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"counter,{_csv(name)},,,,,,,,{value}")
+        for name in sorted(self.rates):
+            lines.append(f"rate,{_csv(name + '_per_hour')},,,,,,,,{self.per_hour(name):.1f}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            label_text = ";".join(f"{k}={v}" for k, v in labels)
+            lines.append(f"gauge,{_csv(name)},{_csv(label_text)},,,,,,,{value:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def prometheus_text(self) -> str:
+        p = PROMETHEUS_PREFIX
+        lines = [f"# HELP {p}_stage_seconds Duration of each bot stage.",
+                 f"# TYPE {p}_stage_seconds summary"]
+        for name, s in self.breakdown():
+            stage = _label(name)
+            for q in QUANTILES:
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                             f'{s[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {s["sum"]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        for name, value in sorted(self.counters.items()):
+            metric = f"{p}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name in sorted(self.rates):
+            metric = f"{p}_{_metric_name(name)}_per_hour"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {self.per_hour(name):.1f}"]
+        typed = set()
+        for (name, labels), value in sorted(self.gauges.items()):
+            metric = f"{p}_{_metric_name(name)}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} gauge")
+                typed.add(metric)
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:.6f}" if label_text else f"{metric} {value:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+def _csv(text: str) -> str:
+    if "," in text or '"' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _label(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(text: str) -> str:
+    return "".join(c if c.isascii() and (c.isalnum() or c == "_") else "_" for c in text)
@@ -0,0 +1,139 @@
+"""
+Pipelined version of the bot's game loop.
+
+`JigsawBot.step` reads the board, clicks, recognizes the piece, asks the
+solver and clicks again strictly one after another. `PipelinedBot` splits
+a move into stages that each run on their own worker, fed through the
+worker's job queue:
+
+    capture/classify  board reads and piece recognition (vision worker)
+    decide            solver lookups (decide worker)
+    actuate           clicks and UI waits (the bot's own thread)
+
+The actuator never waits for work it does not need yet: the board is read
+while the chest click is in flight, and the best action for every figure
+is computed before the piece is known (speculative prefetch). The next
+move's board is known as soon as the action is chosen, so its actions
+are prefetched while the move is being confirmed; a board check that
+disagrees with the prediction simply recomputes them.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+from jigsaw import Jigsaw, TOTAL_FIGURES
+from bot import JigsawBot
+
+
+class Plan(NamedTuple):
+    """Best action for each figure on one board."""
+    board: int
+    actions: Tuple[int, ...]
+
+
+def plan_actions(solver, board: int, round_num: int = 0) -> Plan:
+    """Ask the solver for the best action of every figure on `board`."""
+    game = Jigsaw(board, 0, round_num)
+    actions = []
+    for f_idx in range(TOTAL_FIGURES):
+        game.figure = f_idx
+        actions.append(solver.solve(game))
+    return Plan(board, tuple(actions))
+
+
+class PipelinedBot(JigsawBot):
+    """`JigsawBot` whose capture/classify and decide stages run on worker threads."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # One worker per stage: jobs run in submission order
+        self.vision = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vision")
+        self.decide = ThreadPoolExecutor(max_workers=1, thread_name_prefix="decide")
+        self._grab_lock = threading.Lock()
+        self._plan: Optional[Future] = None
+        self._plan_key = None
+        self._plan_used = False
+        self.prefetch_hits = 0     # moves whose plan was already in flight
+        self.prefetch_misses = 0   # plans dropped because the board turned out different
+
+    def grab_region(self, region):
+        # İki iş parçacığı aynı kaynaktan okur: kare kilit altında kopyalanır
+        with self.metrics.time("capture"), self._grab_lock:
+            return self.frames.grab(region).copy()
+
+    def plan_actions(self, solver, board: int, round_num: int) -> Plan:
+        with self.metrics.time("solve"):
+            return plan_actions(solver, board, round_num)
+
+    def prefetch(self, solver, board: int, round_num: int) -> bool:
+        """
+        Start computing the plan for `board` on the decide worker (once per
+        board). Returns whether a new plan was submitted, i.e. False when
+        the plan for `board` is already in flight.
+        """
+        if self._plan is not None:
+            if self._plan_key == (solver, board):
+                return False
+            if not self._plan_used:
+                self.prefetch_misses += 1
+                self.metrics.count("prefetch_misses")
+        self._plan = self.decide.submit(self.plan_actions, solver, board, round_num)
+        self._plan_key = (solver, board)
+        self._plan_used = False
+        return True
+
+    def plan_for(self, solver, game_memory) -> Plan:
+        """The plan for the current board, waiting for the decide worker if needed."""
+        if not self.prefetch(solver, game_memory.board, game_memory.round):
+            self.prefetch_hits += 1
+            self.metrics.count("prefetch_hits")
+        self._plan_used = True
+        # Karar işçisi hamleyi geciktiriyorsa burada görünür
+        with self.metrics.time("plan_wait"):
+            return self._plan.result()
+
+    def _step(self, solver) -> bool:
+        if self.game_memory is None: self.game_memory = Jigsaw()
+        game_memory = self.game_memory
+
+        if self.close_stray_dialog():
+            return False
+
+        # 0. Tahta okuması arka planda: imleç zaten sandıkta, hücreleri örtmüyor
+        self.park_cursor()
+        observed = self.vision.submit(self.observe_board, game_memory.board, game_memory.round)
+        self.prefetch(solver, game_memory.board, game_memory.round)
+
+        # 1. Sandık tıklaması tahta okunurken yapılır
+        yes_region = self.yes_region()
+        idle_yes = self.grab_region(yes_region)
+        clicked = self.click(*self.chest_point())
+
+        self.apply_board(game_memory, observed.result())
+        if self.end_round(game_memory):
+            # Tahta doluysa oyun sandık tıklamasını yok sayar
+            self._plan = None
+            return False
+        self.prefetch(solver, game_memory.board, game_memory.round)
+
+        # 2-3. Parça çekilir; tanıma arka planda, bu arada tüm figürler için hamle hazır
+        self.draw_piece(yes_region, idle_yes, clicked)
+        piece_id = self.vision.submit(self.recognize_piece).result()
+        if piece_id is None:
+            self.discard_unrecognized(yes_region, idle_yes)
+            return False
+
+        game_memory.figure = piece_id
+        best_action = self.plan_for(solver, game_memory).actions[piece_id]
+
+        # Sonraki tahta artık biliniyor: hamle onaylanırken onun planını hazırla
+        predicted = game_memory.clone()
+        predicted.perform_action(best_action)
+        self.prefetch(solver, predicted.board, predicted.round)
+
+        self.play(game_memory, best_action, yes_region, idle_yes)
+        return True
+
+    def close(self):
+        self.vision.shutdown(wait=False)
+        self.decide.shutdown(wait=False)
@@ -0,0 +1,155 @@
+"""
+Screen recognition: the figure held on the cursor and the board itself.
+
+The `assets/fish_*.png` templates are loaded and normalized once; a crop
+is then scored against all of them with a single matrix product that
+computes the same value as `cv2.matchTemplate(..., TM_CCOEFF_NORMED)` on
+same-sized images. Frames whose best score is too low, or too close to
+the runner-up, are rejected instead of guessed.
+
+`BoardReader` turns one capture of the 4x6 grid into a `Jigsaw.board`
+bitboard by comparing per-cell color statistics with an empty board.
+"""
+import os
+import sys
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+# Template file -> figure index in core/jigsaw.py FIGURES
+PIECE_TEMPLATES = {
+    "fish_2.png": 0,  # TEKLİ
+    "fish_1.png": 3,  # ÇUBUK
+    "fish_3.png": 5,  # L ŞEKLİ
+    "fish_4.png": 4,  # TERS L
+    "fish_5.png": 1,  # KARE
+    "fish_6.png": 2,  # Z ŞEKLİ
+}
+
+MIN_SCORE = 0.75   # same acceptance threshold as the old per-template loop
+MIN_MARGIN = 0.05  # best score must beat the runner-up by this much
+
+# Board grid (same layout as core/jigsaw.py: 4 rows, 6 columns)
+ROWS, COLS = 4, 6
+CELL_MARGIN = 4          # pixels ignored at each cell edge (grid lines, borders)
+FILLED_THRESHOLD = 24.0  # per-cell color statistics distance that counts as filled
+
+# _CELL_BITS[y, x]: board bit of the cell in row y, column x
+_CELL_BITS = np.array([[(1 << (ROWS * COLS - 1)) >> (x * ROWS + y) for x in range(COLS)]
+                       for y in range(ROWS)], dtype=np.int64)
+
+
+class Match(NamedTuple):
+    """Classification result; `piece` is None when the frame was rejected."""
+    piece: Optional[int]
+    score: float
+    margin: float
+
+
+def _normalize(images: np.ndarray) -> np.ndarray:
+    """
+    Flatten (n, h, w, c) images into zero-mean (per channel), unit-norm rows,
+    so that a dot product of two rows is their TM_CCOEFF_NORMED score.
+    """
+    images = images.astype(np.float32)
+    images -= images.mean(axis=(1, 2), keepdims=True)
+    rows = images.reshape(len(images), -1)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    # Flat images (no contrast) correlate with nothing
+    return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+
+class PieceClassifier:
+    """Scores a cursor crop against every piece template in one pass."""
+
+    def __init__(self, asset_path: str, min_score: float = MIN_SCORE,
+                 min_margin: float = MIN_MARGIN):
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+        templates, pieces = [], []
+        for name, piece in PIECE_TEMPLATES.items():
+            path = os.path.join(asset_path, name)
+            if not os.path.exists(path):
+                continue
+            templates.append(cv2.imread(path, cv2.IMREAD_COLOR))
+            pieces.append(piece)
+        if not templates:
+            raise FileNotFoundError(f"No piece templates found in {asset_path}")
+
+        self.shape = templates[0].shape
+        if any(template.shape != self.shape for template in templates):
+            raise ValueError("Piece templates must all have the same size")
+        self.pieces = np.array(pieces)
+        self.templates = _normalize(np.stack(templates))
+
+    def scores(self, crop: np.ndarray) -> np.ndarray:
+        """TM_CCOEFF_NORMED score of a BGR crop against each template (`self.pieces` order)."""
+        if crop.shape != self.shape:
+            raise ValueError(f"Expected a {self.shape} crop, got {crop.shape}")
+        return self.templates @ _normalize(crop[None])[0]
+
+    def classify(self, crop: np.ndarray) -> Match:
+        """Best piece with its score and margin to the runner-up, or a rejected Match."""
+        scores = self.scores(crop)
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+        if best <= self.min_score or margin < self.min_margin:
+            return Match(None, best, margin)
+        return Match(int(self.pieces[order[0]]), best, margin)
+
+
+def cell_statistics(image: np.ndarray, cell_size: int, margin: int = CELL_MARGIN) -> np.ndarray:
+    """
+    Per-cell mean and standard deviation of each color channel, as a
+    (ROWS, COLS, 2 * channels) array, for an image of the whole grid.
+    """
+    height, width = ROWS * cell_size, COLS * cell_size
+    if image.shape[0] < height or image.shape[1] < width:
+        raise ValueError(f"Expected at least a {height}x{width} grid image, got {image.shape}")
+    cells = image[:height, :width].reshape(ROWS, cell_size, COLS, cell_size, -1)
+    cells = cells[:, margin:cell_size - margin, :, margin:cell_size - margin].astype(np.float32)
+    return np.concatenate([cells.mean(axis=(1, 3)), cells.std(axis=(1, 3))], axis=-1)
+
+
+class BoardReader:
+    """
+    Reads the filled cells of the grid from one capture. Call `calibrate`
+    with a capture of the empty board first; a cell then counts as filled
+    when its statistics drift more than `threshold` away from that reference.
+    """
+
+    def __init__(self, cell_size: int, threshold: float = FILLED_THRESHOLD):
+        self.cell_size = cell_size
+        self.threshold = threshold
+        self.reference: Optional[np.ndarray] = None
+
+    @property
+    def calibrated(self) -> bool:
+        return self.reference is not None
+
+    def calibrate(self, empty_board: np.ndarray):
+        """Store the statistics of an empty board capture."""
+        self.reference = cell_statistics(empty_board, self.cell_size)
+
+    def filled_cells(self, image: np.ndarray) -> np.ndarray:
+        """(ROWS, COLS) boolean grid of the cells that differ from the empty board."""
+        if self.reference is None:
+            raise RuntimeError("BoardReader.calibrate() has not been called")
+        distance = np.abs(cell_statistics(image, self.cell_size) - self.reference).max(axis=-1)
+        return distance > self.threshold
+
+    def read(self, image: np.ndarray) -> int:
+        """The board in `Jigsaw.board` encoding."""
+        return int(_CELL_BITS[self.filled_cells(image)].sum())
+
+
+if __name__ == "__main__":
+    # Offline check on saved crops: python recognition.py crop1.png crop2.png ...
+    assets = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+    classifier = PieceClassifier(assets)
+    for path in sys.argv[1:]:
+        piece, score, margin = classifier.classify(cv2.imread(path, cv2.IMREAD_COLOR))
+        print(f"{path}: piece={piece} score={score:.3f} margin={margin:.3f}")
@@ -0,0 +1,440 @@
+"""
+Headless stand-in for the game client.
+
+`GameSimulator` renders synthetic frames of the jigsaw window (board,
+chest, confirm dialog and the piece held on the cursor, drawn from the
+`assets/` templates), consumes the bot's clicks and applies the game
+rules through `core/jigsaw.py`. It is both the `FrameSource` and the
+`InputSink` of a `JigsawBot`, so the real capture -> recognize -> solve
+-> click loop runs unchanged on any machine.
+
+The UI reacts to clicks after a simulated client latency, on an
+`AcceleratedClock` that skips waiting time, and `Faults` injects lag
+spikes, clicks that land off target and clicks the client drops, to see
+how the bot recovers. Several simulators can share one `SharedCursor`,
+like the windows of one desktop, to check that their bots take turns.
+
+Usage:
+    python utils/simulator.py --moves 500
+    python utils/simulator.py --moves 500 --solver table --spike-rate 0.05 --misclick-rate 0.02
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'core'))
+sys.path.append(os.path.join(ROOT, 'utils'))
+sys.path.append(ROOT)
+
+import bot_config
+from jigsaw import Jigsaw, PLACEMENT_MASKS, TERMINAL_STATE
+from bot import CELL_SIZE, JigsawBot
+from pipeline import PipelinedBot
+from frames import FrameSource, Region
+from inputs import CLICK_HOLD, CLICK_HOVER, InputSink
+from recognition import COLS, PIECE_TEMPLATES, ROWS, PieceClassifier
+from waits import Clock
+
+ASSET_PATH = os.path.join(ROOT, 'assets')
+BUTTON_SIZE = 24     # clickable area of the chest and confirm buttons (pixels)
+DIALOG_SIZE = (96, 48)
+ROUND_RESET = 1.0    # the client clears a full board after this long
+STALL_TIMEOUT = 120.0  # a run without any move for this long is reported as stalled
+
+
+class AcceleratedClock(Clock):
+    """
+    Waiting runs `speed` times faster than real time (instantly for
+    `speed=inf`), computation at real speed: `now()` is the real elapsed
+    time plus all the waiting that was skipped. A sleep lasts until the
+    clock reaches its wake-up time, so threads sleeping at the same time
+    skip that time once, not once each.
+    """
+
+    def __init__(self, speed: float = float("inf")):
+        self.speed = speed
+        self._start = time.perf_counter()
+        self._skipped = 0.0
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter() - self._start + self._skipped
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        wake = self.now() + seconds
+        real = seconds / self.speed
+        if real > 0:
+            time.sleep(real)
+        with self._lock:
+            self._skipped = max(self._skipped, wake - (time.perf_counter() - self._start))
+
+
+@dataclass
+class Faults:
+    """Client latency model and the faults injected into it."""
+    lag: float = 0.12           # fastest reaction of the UI to a click (seconds)
+    lag_jitter: float = 0.04    # mean of the exponential extra reaction time
+    spike_rate: float = 0.0     # probability that a reaction hits a lag spike
+    spike_lag: float = 1.5      # extra delay of a lag spike
+    misclick_rate: float = 0.0  # probability that a click lands up to half a cell off target
+    drop_rate: float = 0.0      # probability that the client ignores a click
+
+
+@dataclass
+class SimulatorStats:
+    draws: int = 0
+    placed: int = 0
+    discarded: int = 0
+    rounds: int = 0
+    illegal_clicks: int = 0
+    ignored_clicks: int = 0
+    misclicks: int = 0
+    dropped_clicks: int = 0
+    spikes: int = 0
+    cursor_conflicts: int = 0  # another window took the shared cursor mid-sequence
+
+    @property
+    def moves(self) -> int:
+        return self.placed + self.discarded
+
+
+class SharedCursor:
+    """
+    The one mouse cursor of several simulated windows. A window that is in
+    the middle of an action sequence (from the accepted chest click until
+    the placement or discard is confirmed) counts a cursor conflict when
+    another window moves the cursor, and its piece is no longer drawn on
+    the cursor, as with real windows.
+    """
+
+    def __init__(self):
+        self.owner = None
+        self._lock = threading.Lock()
+
+    def take(self, window: 'GameSimulator'):
+        with self._lock:
+            previous, self.owner = self.owner, window
+        if previous is not None and previous is not window and previous.busy:
+            with previous._lock:
+                previous.stats.cursor_conflicts += 1
+                previous._version += 1
+
+
+class GameSimulator(FrameSource, InputSink):
+    """
+    The jigsaw window with its board's top-left corner at `origin`, using
+    the same button offsets as the bot (`bot_config` by default).
+
+    UI states: idle -> (chest) draw dialog -> (yes) piece on the cursor
+    -> (board cell / right click) place or discard dialog -> (yes) idle.
+    Clicks that do not fit the current state are ignored, like the client
+    does; placements on occupied cells are refused. Safe to capture from
+    one thread while another one clicks.
+    """
+
+    def __init__(self, asset_path: str = ASSET_PATH, origin: Tuple[int, int] = (40, 40),
+                 chest_offset: Tuple[int, int] = bot_config.OFF_BTN_CHEST,
+                 yes_offset: Tuple[int, int] = bot_config.OFF_BTN_YES_ADD,
+                 cell_size: int = CELL_SIZE, clock: Clock = None, faults: Faults = None,
+                 seed: int = 0, cursor: SharedCursor = None):
+        self.origin = origin
+        self.chest_offset = chest_offset
+        self.yes_offset = yes_offset
+        self.cell_size = cell_size
+        self.clock = clock or AcceleratedClock()
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.stats = SimulatorStats()
+
+        self.game = Jigsaw()
+        self.dialog = None      # None, "draw", "place" or "discard"
+        self.holding = False    # a piece is on the cursor
+        self.pending = None     # placement waiting for confirmation
+        self.cursor = (0, 0)
+        self.shared_cursor = cursor
+        self.busy = False       # between an accepted chest click and the confirmed move
+        self._events: List[Tuple[float, int, Callable[[], None]]] = []
+        self._event_id = 0
+        self._lock = threading.RLock()
+
+        self._icons: Dict[int, np.ndarray] = {}
+        for name, piece in PIECE_TEMPLATES.items():
+            self._icons[piece] = cv2.imread(os.path.join(asset_path, name), cv2.IMREAD_COLOR)
+
+        noise = np.random.default_rng(seed)
+        right = max(origin[0] + COLS * cell_size, origin[0] + chest_offset[0] + cell_size)
+        bottom = max(origin[1] + ROWS * cell_size, origin[1] + chest_offset[1] + cell_size)
+        height, width = bottom + origin[1], right + origin[0]
+        self._background = noise.normal((70, 45, 30), 6, (height, width, 3)).clip(0, 255).astype(np.uint8)
+        for i in range(ROWS + 1):  # grid lines
+            y = origin[1] + i * cell_size
+            self._background[max(y - 1, 0):y + 1, origin[0]:origin[0] + COLS * cell_size] = (25, 20, 15)
+        for i in range(COLS + 1):
+            x = origin[0] + i * cell_size
+            self._background[origin[1]:origin[1] + ROWS * cell_size, max(x - 1, 0):x + 1] = (25, 20, 15)
+        self._filled = noise.normal((40, 120, 190), 20, (cell_size, cell_size, 3)).clip(0, 255).astype(np.uint8)
+        self._dialog = noise.normal((150, 150, 150), 10, DIALOG_SIZE[::-1] + (3,)).clip(0, 255).astype(np.uint8)
+        self._dialog[DIALOG_SIZE[1] // 2 - 10:DIALOG_SIZE[1] // 2 + 10,
+                     DIALOG_SIZE[0] // 2 - 10:DIALOG_SIZE[0] // 2 + 10] = (60, 170, 60)  # yes button
+        self._draw(self._background, noise.normal((30, 90, 140), 10, (cell_size, cell_size, 3)).clip(0, 255),
+                   origin[0] + chest_offset[0] - cell_size // 2, origin[1] + chest_offset[1] - cell_size // 2)
+
+        self._screen = self._background.copy()
+        self._version = 0
+        self._rendered = -1
+
+    # --- Game rules and UI state ---
+
+    def _schedule(self, action: Callable[[], None]):
+        """Run `action` once the client reacts (latency and lag spikes from `faults`)."""
+        faults = self.faults
+        delay = faults.lag + (self.rng.expovariate(1 / faults.lag_jitter) if faults.lag_jitter else 0.0)
+        if self.rng.random() < faults.spike_rate:
+            delay += faults.spike_lag
+            self.stats.spikes += 1
+        self._event_id += 1
+        heapq.heappush(self._events, (self.clock.now() + delay, self._event_id, action))
+
+    def _update(self):
+        """Apply every UI reaction that is due by now."""
+        with self._lock:
+            now = self.clock.now()
+            while self._events and self._events[0][0] <= now:
+                heapq.heappop(self._events)[2]()
+                self._version += 1
+
+    def _open(self, dialog: str):
+        def action():
+            self.dialog = dialog
+        return action
+
+    def _confirm(self):
+        dialog, self.dialog = self.dialog, None
+        if dialog == "draw":
+            self.game.set_random_figure(self.rng)
+            self.holding = True
+            self.stats.draws += 1
+        elif dialog == "place":
+            self.game.perform_action(self.pending)
+            self.holding = False
+            self.busy = False
+            self.stats.placed += 1
+            if self.game.has_finished():
+                self._event_id += 1
+                heapq.heappush(self._events, (self.clock.now() + ROUND_RESET, self._event_id, self._reset))
+        elif dialog == "discard":
+            self.game.round += 1
+            self.holding = False
+            self.busy = False
+            self.stats.discarded += 1
+
+    def _reset(self):
+        self.game = Jigsaw()
+        self.stats.rounds += 1
+
+    def _on_button(self, x: int, y: int, offset: Tuple[int, int]) -> bool:
+        bx, by = self.origin[0] + offset[0], self.origin[1] + offset[1]
+        return abs(x - bx) <= BUTTON_SIZE // 2 and abs(y - by) <= BUTTON_SIZE // 2
+
+    def _cell(self, x: int, y: int):
+        col, row = (x - self.origin[0]) // self.cell_size, (y - self.origin[1]) // self.cell_size
+        return (col, row) if 0 <= col < COLS and 0 <= row < ROWS else None
+
+    def _handle_click(self, x: int, y: int, button: str):
+        idle = self.dialog is None and not self._events
+        if self.dialog is not None and button == 'left' and self._on_button(x, y, self.yes_offset):
+            self._schedule(self._confirm)
+        elif idle and button == 'right' and self.holding:
+            self._schedule(self._open("discard"))
+        elif idle and button == 'left' and self.holding and self._cell(x, y) is not None:
+            col, row = self._cell(x, y)
+            action = Jigsaw.offset_to_action((col, row))
+            if not self.game.is_legal(action):
+                self.stats.illegal_clicks += 1
+                return
+            self.pending = action
+            self._schedule(self._open("place"))
+        elif (idle and button == 'left' and not self.holding
+              and self.game.board != TERMINAL_STATE and self._on_button(x, y, self.chest_offset)):
+            self.busy = True
+            self._schedule(self._open("draw"))
+        else:
+            self.stats.ignored_clicks += 1
+
+    # --- InputSink ---
+
+    def move(self, x: int, y: int):
+        if self.shared_cursor is not None:
+            self.shared_cursor.take(self)
+        with self._lock:
+            self._update()
+            self.cursor = (int(x), int(y))
+            if self.holding:
+                self._version += 1
+
+    def click(self, x: int, y: int, button: str = 'left') -> float:
+        self.move(x, y)
+        self.clock.sleep(CLICK_HOVER + CLICK_HOLD)
+        with self._lock:
+            self._update()
+            if self.rng.random() < self.faults.drop_rate:
+                self.stats.dropped_clicks += 1
+            else:
+                if self.rng.random() < self.faults.misclick_rate:
+                    half = self.cell_size // 2
+                    x += self.rng.randint(-half, half)
+                    y += self.rng.randint(-half, half)
+                    self.stats.misclicks += 1
+                self._handle_click(int(x), int(y), button)
+        return self.clock.now()
+
+    @property
+    def has_cursor(self) -> bool:
+        return self.shared_cursor is None or self.shared_cursor.owner is self
+
+    # --- FrameSource ---
+
+    @staticmethod
+    def _draw(screen: np.ndarray, image: np.ndarray, left: int, top: int):
+        """Paste `image` with its top-left corner at (left, top), clipped to the screen."""
+        height, width = image.shape[:2]
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + width, screen.shape[1]), min(top + height, screen.shape[0])
+        if x0 < x1 and y0 < y1:
+            screen[y0:y1, x0:x1] = image[y0 - top:y1 - top, x0 - left:x1 - left]
+
+    def _render(self):
+        screen = self._screen
+        np.copyto(screen, self._background)
+        size = self.cell_size
+        for action in range(ROWS * COLS):
+            if self.game.board & PLACEMENT_MASKS[0][action]:
+                col, row = Jigsaw.action_to_offsets(action)
+                x, y = self.origin[0] + col * size, self.origin[1] + row * size
+                screen[y + 1:y + size - 1, x + 1:x + size - 1] = self._filled[1:-1, 1:-1]
+        if self.dialog is not None:
+            self._draw(screen, self._dialog,
+                       self.origin[0] + self.yes_offset[0] - DIALOG_SIZE[0] // 2,
+                       self.origin[1] + self.yes_offset[1] - DIALOG_SIZE[1] // 2)
+        if self.holding and self.has_cursor:
+            self._draw(screen, self._icons[self.game.figure],
+                       self.cursor[0] - size // 2, self.cursor[1] - size // 2)
+        self._rendered = self._version
+
+    def grab(self, region: Region) -> np.ndarray:
+        left, top, width, height = (int(v) for v in region)
+        if left < 0 or top < 0 or top + height > self._screen.shape[0] or left + width > self._screen.shape[1]:
+            raise ValueError(f"Region {region} is outside the simulated window")
+        with self._lock:
+            self._update()
+            if self._rendered != self._version:
+                self._render()
+        return self._screen[top:top + height, left:left + width]
+
+
+def run(bot: JigsawBot, solver, simulator: GameSimulator, moves: int = None,
+        duration: float = None, stall_timeout: float = STALL_TIMEOUT) -> Dict[str, float]:
+    """
+    Let `bot` play until the simulator has seen `moves` moves or
+    `duration` seconds of (simulated) time passed, and report throughput.
+    The run also ends when the bot makes no move for `stall_timeout`
+    seconds, i.e. it did not recover from a fault.
+    """
+    clock = simulator.clock
+    real_start, start = time.perf_counter(), clock.now()
+    last_move, last_count = start, 0
+    stalled = False
+    while ((moves is None or simulator.stats.moves < moves)
+           and (duration is None or clock.now() - start < duration)):
+        bot.step(solver)
+        if simulator.stats.moves != last_count:
+            last_move, last_count = clock.now(), simulator.stats.moves
+        elif clock.now() - last_move > stall_timeout:
+            stalled = True
+            break
+    elapsed = clock.now() - start
+
+    stats = simulator.stats
+    report = {
+        "moves": stats.moves,
+        "stalled": stalled,
+        "sim_seconds": elapsed,
+        "real_seconds": time.perf_counter() - real_start,
+        "moves_per_hour": stats.moves / elapsed * 3600 if elapsed > 0 else 0.0,
+        "moves_per_round": stats.moves / stats.rounds if stats.rounds else float("nan"),
+        "bot_resyncs": bot.resyncs,
+        "bot_unrecognized": bot.unrecognized,
+        "bot_timeouts": sum(t.timeouts for t in bot.waiter.trackers.values()),
+    }
+    if isinstance(bot, PipelinedBot):
+        report["prefetch_hits"] = bot.prefetch_hits
+        report["prefetch_misses"] = bot.prefetch_misses
+    report.update((f.name, getattr(stats, f.name)) for f in fields(stats))
+    return report
+
+
+def make_bot(simulator: GameSimulator, asset_path: str = ASSET_PATH, log=None,
+             pipelined: bool = True) -> JigsawBot:
+    """A bot (`PipelinedBot` or the sequential `JigsawBot`) wired to the simulator and calibrated on its board."""
+    bot_class = PipelinedBot if pipelined else JigsawBot
+    bot = bot_class(simulator, simulator, PieceClassifier(asset_path),
+                    simulator.chest_offset, simulator.yes_offset, simulator.cell_size,
+                    clock=simulator.clock, log=log)
+    bot.calibrate(*simulator.origin)
+    return bot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", type=int, default=300, help="stop after this many moves")
+    parser.add_argument("--duration", type=float, default=None, help="or after this many simulated seconds")
+    parser.add_argument("--solver", choices=("heuristic", "table"), default="heuristic")
+    parser.add_argument("--speed", type=float, default=float("inf"),
+                        help="clock speed-up (inf: skip all waiting)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="print the bot's log")
+    parser.add_argument("--sequential", action="store_true",
+                        help="run JigsawBot instead of the pipelined bot")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write the bot's stage metrics here (.prom: Prometheus text, else CSV)")
+    for f in fields(Faults):
+        parser.add_argument("--" + f.name.replace("_", "-"), type=float, default=f.default)
+    args = parser.parse_args()
+
+    if args.solver == "table":
+        from deterministic import get_solver
+        solver = get_solver()
+    else:
+        from heuristic import HeuristicSolver
+        solver = HeuristicSolver()
+
+    faults = Faults(**{f.name: getattr(args, f.name) for f in fields(Faults)})
+    simulator = GameSimulator(clock=AcceleratedClock(args.speed), faults=faults, seed=args.seed)
+    log = (lambda message, tag="text": print(f"> {message}")) if args.verbose else None
+    bot = make_bot(simulator, log=log, pipelined=not args.sequential)
+    report = run(bot, solver, simulator, args.moves, args.duration)
+    bot.close()
+    for key, value in report.items():
+        print(f"{key:>18}: {value:.2f}" if isinstance(value, float) else f"{key:>18}: {value}")
+    print("\nstage               p50 ms   p95 ms   p99 ms    count")
+    for name, s in bot.metrics.breakdown():
+        print(f"{name:<18}{s['p50'] * 1000:>9.1f}{s['p95'] * 1000:>9.1f}{s['p99'] * 1000:>9.1f}{s['count']:>9}")
+    if args.metrics:
+        bot.metrics.export(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Event-driven waits for game UI transitions.
+
+Instead of sleeping a fixed time after each click, the bot polls a small
+screen region at a high rate and continues as soon as the expected
+change shows up (a dialog opens, the piece appears on the cursor, ...).
+The observed latency of every transition is recorded, and once enough
+samples exist the timeout adapts to them: fast clients are not slowed
+down by worst-case sleeps, and lag spikes get more time instead of
+causing misclicks.
+"""
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+Region = Tuple[int, int, int, int]  # (left, top, width, height) in screen pixels
+
+POLL_INTERVAL = 0.015    # seconds between two captures of the region
+CHANGE_THRESHOLD = 8.0   # mean absolute pixel difference that counts as a change
+HISTORY = 200            # latencies kept per transition
+MIN_SAMPLES = 10         # samples needed before the timeout adapts
+TIMEOUT_FACTOR = 3.0     # adaptive timeout = factor * p99 of the observed latencies
+MIN_TIMEOUT = 0.5
+MAX_TIMEOUT = 5.0
+
+
+class Clock:
+    """Real time. The simulator substitutes a clock that runs faster."""
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class WaitResult(NamedTuple):
+    """Outcome of a wait; `frame` is the last capture of the region."""
+    ok: bool
+    elapsed: float
+    frame: Optional[np.ndarray]
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference of two captures of the same region."""
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+
+
+class LatencyTracker:
+    """Observed latencies of one UI transition, bounded to the last `HISTORY`."""
+
+    def __init__(self, default_timeout: float):
+        self.default_timeout = default_timeout
+        self.samples: Deque[float] = deque(maxlen=HISTORY)
+        self.timeouts = 0
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def quantile(self, q: float) -> float:
+        """Latency quantile, or the default timeout while there are no samples."""
+        if not self.samples:
+            return self.default_timeout
+        return float(np.quantile(np.fromiter(self.samples, dtype=np.float64), q))
+
+    @property
+    def timeout(self) -> float:
+        """How long to wait for this transition before giving up."""
+        if len(self.samples) < MIN_SAMPLES:
+            return self.default_timeout
+        return min(max(TIMEOUT_FACTOR * self.quantile(0.99), MIN_TIMEOUT), MAX_TIMEOUT)
+
+
+class UIWaiter:
+    """
+    Waits for UI transitions by polling screen regions.
+    `grab(region)` must return the region's pixels as an array;
+    `on_wait(name, result)`, if given, sees the outcome of every wait.
+    """
+
+    def __init__(self, grab: Callable[[Region], np.ndarray],
+                 poll_interval: float = POLL_INTERVAL, threshold: float = CHANGE_THRESHOLD,
+                 clock: Clock = None, on_wait: Callable[[str, "WaitResult"], None] = None):
+        self.grab = grab
+        self.clock = clock or Clock()
+        self.on_wait = on_wait
+        self.poll_interval = poll_interval
+        self.threshold = threshold
+        self.trackers: Dict[str, LatencyTracker] = {}
+
+    def tracker(self, name: str, default_timeout: float = MAX_TIMEOUT) -> LatencyTracker:
+        if name not in self.trackers:
+            self.trackers[name] = LatencyTracker(default_timeout)
+        return self.trackers[name]
+
+    def wait_for(self, name: str, region: Region, predicate: Callable[[np.ndarray], bool],
+                 default_timeout: float = MAX_TIMEOUT, start: float = None) -> WaitResult:
+        """
+        Poll `region` until `predicate(frame)` holds or the transition's
+        timeout expires. `start` is when the triggering action happened
+        (default: now); the latency is measured from there.
+        """
+        tracker = self.tracker(name, default_timeout)
+        start = self.clock.now() if start is None else start
+        deadline = start + tracker.timeout
+        frame = None
+        while True:
+            frame = self.grab(region)
+            now = self.clock.now()
+            if predicate(frame):
+                tracker.record(now - start)
+                return self._finish(name, WaitResult(True, now - start, frame))
+            if now >= deadline:
+                tracker.timeouts += 1
+                return self._finish(name, WaitResult(False, now - start, frame))
+            self.clock.sleep(min(self.poll_interval, max(deadline - now, 0.0)))
+
+    def _finish(self, name: str, result: WaitResult) -> WaitResult:
+        if self.on_wait is not None:
+            self.on_wait(name, result)
+        return result
+
+    def until_changed(self, name: str, region: Region, reference: np.ndarray,
+                      default_timeout: float = MAX_TIMEOUT, start: float = None) -> WaitResult:
+        """Wait until `region` no longer looks like the `reference` capture."""
+        return self.wait_for(
+            name, region, lambda frame: frame_difference(frame, reference) > self.threshold,
+            default_timeout, start)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/timeout/timeouts per transition, for logging."""
+        return {
+            name: {
+                "p50": tracker.quantile(0.50),
+                "p95": tracker.quantile(0.95),
+                "timeout": tracker.timeout,
+                "timeouts": tracker.timeouts,
+            }
+            for name, tracker in self.trackers.items()
+        }
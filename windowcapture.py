@@ -1,5 +1,10 @@
+import os
+import sys
 import numpy as np
-import win32gui, win32ui, win32con
+import win32gui
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from frames import GdiFrameSource
 
 class WindowCapture:
 
@@ -11,6 +16,7 @@ class WindowCapture:
     cropped_y = 0
     offset_x = 0
     offset_y = 0
+    frames = None
 
     # constructor
     def __init__(self, window_name):
@@ -39,31 +45,11 @@ class WindowCapture:
 
     def get_screenshot(self):
 
-        # get the window image data
-        wDC = win32gui.GetWindowDC(self.hwnd)
-        dcObj = win32ui.CreateDCFromHandle(wDC)
-        cDC = dcObj.CreateCompatibleDC()
-        dataBitMap = win32ui.CreateBitmap()
-        dataBitMap.CreateCompatibleBitmap(dcObj, self.w, self.h)
-        cDC.SelectObject(dataBitMap)
-        cDC.BitBlt((0, 0), (self.w, self.h), dcObj, (self.cropped_x, self.cropped_y), win32con.SRCCOPY)
-
-        # convert the raw data into a format opencv can read
-        #dataBitMap.SaveBitmapFile(cDC, 'debug.bmp')
-        signedIntsArray = dataBitMap.GetBitmapBits(True)
-        img = np.fromstring(signedIntsArray, dtype='uint8')
-        img.shape = (self.h, self.w, 4)
-
-        # free resources
-        dcObj.DeleteDC()
-        cDC.DeleteDC()
-        win32gui.ReleaseDC(self.hwnd, wDC)
-        win32gui.DeleteObject(dataBitMap.GetHandle())
-
-        # drop the alpha channel, or cv.matchTemplate() will throw an error like:
-        #   error: (-215:Assertion failed) (depth == CV_8U || depth == CV_32F) && type == _templ.type() 
-        #   && _img.dims() <= 2 in function 'cv::matchTemplate'
-        img = img[...,:3]
+        # the window DC, memory bitmap and pixel buffer are created on the
+        # first call and reused afterwards (see utils/frames.py)
+        if self.frames is None:
+            self.frames = GdiFrameSource(self.hwnd)
+        img = self.frames.grab((self.cropped_x, self.cropped_y, self.w, self.h))
 
         # make image C_CONTIGUOUS to avoid errors that look like:
         #   File ... in draw_rectangles
@@ -74,6 +60,19 @@ class WindowCapture:
 
         return img
 
+    # zero-copy view of a region of the window (client coordinates), valid
+    # until the next capture of the same size
+    def grab(self, region):
+        if self.frames is None:
+            self.frames = GdiFrameSource(self.hwnd)
+        x, y, w, h = region
+        return self.frames.grab((x + self.cropped_x, y + self.cropped_y, w, h))
+
+    def close(self):
+        if self.frames is not None:
+            self.frames.close()
+            self.frames = None
+
     # find the name of the window you're interested in.
     # once you have it, update window_capture()
     # https://stackoverflow.com/questions/55547940/how-to-get-a-list-of-the-name-of-every-open-window